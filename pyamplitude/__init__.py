@@ -0,0 +1,64 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" pyamplitude: a Python connector for Amplitude Analytics.
+
+    The public classes are importable from the package, e.g.
+    from pyamplitude import AmplitudeRestApi, ProjectsHandler. Their modules
+    are imported on first access (PEP 562), and requests, simplejson and
+    psycopg2 only when first used, so importing pyamplitude stays cheap.
+
+    Classes whose module needs an optional dependency at import time are
+    left out of __all__, so that from pyamplitude import * works without it.
+"""
+
+import importlib
+
+_EXPORTS = {
+    'AmplitudeRestApi': 'amplituderestapi',
+    'AsyncAmplitudeRestApi': 'asyncamplituderestapi',
+    'AmplitudeExportApi': 'exportapi',
+    'ShardedExport': 'exportshards',
+    'ShardManifest': 'exportshards',
+    'ExportConverter': 'exportconverter',
+    'BehavioralCohortsApi': 'behavioralcohortsapi',
+    'AmplitudeRedshift': 'amplituderedshift',
+    'ProjectsHandler': 'projectshandler',
+    'Segment': 'apiresources',
+    'Event': 'apiresources',
+    'FrozenSegment': 'apiresources',
+    'FrozenEvent': 'apiresources',
+    'PreparedQuery': 'apiresources',
+    'BatchExecutor': 'batch',
+    'QuerySpec': 'batch',
+    'ProjectFanOut': 'fanout',
+    'UserActivityCrawler': 'crawler',
+    'LocalRetention': 'localretention',
+    'LocalFunnel': 'localfunnel',
+    'ResponseCache': 'responsecache',
+    'DiskCache': 'diskcache',
+    'QueryRateLimiter': 'ratelimiter',
+    'RateLimitExceeded': 'ratelimiter',
+    'RetryPolicy': 'retry',
+    'MetricsHook': 'metrics',
+    'InMemoryCollector': 'metrics',
+}
+
+# Exports whose module imports an optional dependency (see setup.py extras).
+_OPTIONAL_EXPORTS = ['AsyncAmplitudeRestApi']
+
+__all__ = sorted(name for name in _EXPORTS if name not in _OPTIONAL_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError('module ' + __name__ + ' has no attribute ' + name)
+
+    value = getattr(importlib.import_module('.' + _EXPORTS[name], __name__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -2,9 +2,20 @@
 # -*- coding: utf-8 -*-
 
 
-import psycopg2
 import logging
 import sys
+from .metrics import MetricsHook
+
+
+def _psycopg2():
+    # Imported on the first query, the rest of pyamplitude does not need it.
+    try:
+        import psycopg2
+    except ImportError:
+        raise ImportError('Pyamplitude Error: AmplitudeRedshift requires psycopg2, '
+                          'install it with: pip install "pyamplitude[redshift]"')
+    return psycopg2
+
 
 class AmplitudeRedshift(object):
     """ A  python connector to query data from yours Amplitude Redshift.
@@ -13,17 +24,22 @@ class AmplitudeRedshift(object):
     datasets. Please refer to the following link for more information:
 
     https://amplitude.zendesk.com/hc/en-us/articles/206240328-Redshift-Best-Practices
+
+    An optional metrics hook (see metrics.py) receives the latency ('query'
+    phase) and the number of rows of every query.
     """
     def __init__(self, host='', user='' ,port='', password='', dbname='',
-                 schema='', table='', show_logs=True):
+                 schema='', table='', show_logs=True, metrics=None):
 
         self.host = host
         self.user = user
-        self.port = port.password = password
+        self.port = port
+        self.password = password
         self.dbname = dbname
         self.schema = schema
         self.table = table
         self.logger = self._logger_config(show_logs)
+        self.metrics = metrics if metrics is not None else MetricsHook()
 
     @staticmethod
     def _logger_config(show_logs):
@@ -36,20 +52,26 @@ class AmplitudeRedshift(object):
             formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
             logger.disabled = False
         else:
+            logger = logging.getLogger()
             logger.disable = True
 
         return logger
 
     def execute_query(self, query=''):
-        cur = psycopg2.connect(host=self.host, user=self.user, port=self.port,
-                               password=self.password, dbname=self.dbname)
+        labels = {'client': 'redshift', 'endpoint': 'query'}
+
+        with self.metrics.timer('latency_seconds', phase='query', **labels):
+            cur = _psycopg2().connect(host=self.host, user=self.user, port=self.port,
+                                      password=self.password, dbname=self.dbname)
+
+            self.logger.info('redshiftplaybook: executed query: ' + query)
 
-        self.logger.info('redshiftplaybook: executed query: ' + query)
+            cur = cur.cursor()
+            cur.execute(query)
+            data = cur.fetchall()
+            cur.close()
 
-        cur = cur.cursor()
-        cur.execute(query)
-        data = cur.fetchall()
-        cur.close()
+        self.metrics.increment('rows_received', len(data), **labels)
 
         return data
 
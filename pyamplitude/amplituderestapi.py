@@ -1,22 +1,30 @@
 # !/usr/bin/python
 # -*- coding: utf-8 -*-
 
-import requests
 import logging
 import sys
-import simplejson as json
+import threading
 from datetime import datetime
-from .apiresources import Segment, Event
-from cachetools import TTLCache, cached
+from .apiresources import Segment, Event, PreparedQuery
+from .httpsession import build_session, DEFAULT_POOL_SIZE
+from .responsecache import ResponseCache, CACHE_TTL_SEC
+from .ratelimiter import USER_ENDPOINTS
+from .singleflight import SingleFlight
+from .retry import RetryPolicy
+from .metrics import MetricsHook
+from . import incremental
+from . import columnar
+from . import streamjson
+from .lazyimport import LazyModule
 
-CACHE_TTL_SEC = 60
+json = LazyModule('simplejson')
 
+# Endpoints and modes (m) whose daily values add up, so that a range can be
+# assembled from per-day responses, seriesCollapsed totals included.
+INCREMENTAL_MODES = {'users': ['new'], 'events/segmentation': ['totals', 'sums']}
 
-@cached(TTLCache(1, CACHE_TTL_SEC))
-def cached_request(url, json_params=None, auth=None):
-    """ params must be encoded to json so they can be hashed """
-    params = json.loads(json_params)
-    return requests.get(url, params=params, auth=auth)
+# The User Activity and User Search endpoints only allow 5 concurrent requests.
+USER_ENDPOINTS_CONCURRENCY = 5
 
 
 class AmplitudeRestApi(object):
@@ -29,14 +37,98 @@ class AmplitudeRestApi(object):
 
          cast-parameters -> calculate query cost -> execute requests
 
+        Every request of an instance goes through the same pooled keep-alive
+        session, so consecutive queries reuse open connections instead of
+        paying for a new TCP+TLS handshake. Use pool_size, keep_alive and
+        http2 to tune it, or pass your own session.
+
+        Parsed responses are kept in a ResponseCache (LRU with per-endpoint
+        TTLs). Pass your own cache to tune its limits or to share it between
+        instances, or cache=False to disable caching.
+
+        An optional DiskCache persists date-ranged responses across restarts:
+        closed historical ranges are kept for a long time, ranges touching
+        today for a few minutes only.
+
+        With incremental=True, daily-interval get_events (m='totals' or
+        'sums') and get_active_and_new_user_count (m='new') queries, whose
+        daily values add up, are cached day by day: a query
+        over a window that overlaps previous queries only fetches the missing
+        days and merges xValues/series back into the usual response shape.
+        Pair it with a DiskCache, as a long window needs one cache entry
+        per day.
+
+        An optional QueryRateLimiter debits the computed query cost of every
+        request actually sent (cache hits are free) from an hourly budget,
+        blocking, queueing or raising once it is exhausted.
+
+        Concurrent identical requests (same project, url and params) from
+        several threads are coalesced: one of them is sent and the others
+        wait for and share its response. single_flight.stats() counts them.
+
+        Throttled (429) and failed (5xx) requests are retried according to a
+        RetryPolicy (exponential backoff with jitter, Retry-After honored).
+        Pass retry_policy=False to disable retries.
+
+        With result_format='numpy' (or 'pandas'), time-series endpoints
+        (get_events, get_active_and_new_user_count, get_revenue_analysis,
+        get_revenue_ltv, get_retention and the session averages) return a
+        columnar.ColumnarResult (or a DataFrame) decoded straight from the
+        response body instead of nested lists.
+
+        An optional metrics hook (see metrics.py, e.g. an InMemoryCollector)
+        receives per-endpoint latency histograms (throttle, network, decode
+        and total), bytes received, cache hits and misses, the cost spent,
+        responses by status (429 included) and retries.
     """
 
-    def __init__(self, project_handler, show_logs, log_query_cost, api_url='https://amplitude.com/api/2/'):
+    METRICS_CLIENT = 'rest'
+
+    def __init__(self, project_handler, show_logs, log_query_cost, api_url='https://amplitude.com/api/2/',
+                 pool_size=DEFAULT_POOL_SIZE, keep_alive=True, http2=False, session=None,
+                 cache=None, disk_cache=None, incremental=False, rate_limiter=None,
+                 single_flight=None, retry_policy=None, result_format=None, metrics=None):
 
         self.project_handler = project_handler
         self.api_url = api_url
         self.logger = self._logger_config(show_logs)
-        self.log_query_cost = log_query_cost
+        self._log_cost = log_query_cost
+
+        if session is None:
+            session = self._build_session(pool_size, keep_alive, http2)
+        self.session = session
+
+        if cache is None:
+            cache = ResponseCache(ttl=CACHE_TTL_SEC)
+        elif cache is False:
+            cache = None
+        self.cache = cache
+        self.disk_cache = disk_cache
+        self.incremental = incremental
+        self.rate_limiter = rate_limiter
+
+        if single_flight is None:
+            single_flight = SingleFlight()
+        elif single_flight is False:
+            single_flight = None
+        self.single_flight = single_flight
+
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+        elif retry_policy is False:
+            retry_policy = None
+        self.retry_policy = retry_policy
+
+        if result_format not in [None, 'json', 'numpy', 'pandas']:
+            raise ValueError('Pyamplitude Error: result_format must be "json", "numpy" or "pandas"')
+        self.result_format = None if result_format == 'json' else result_format
+        self.metrics = metrics if metrics is not None else MetricsHook()
+
+        self._local = threading.local()
+        self._user_semaphore = threading.BoundedSemaphore(USER_ENDPOINTS_CONCURRENCY)
+
+    def _build_session(self, pool_size, keep_alive, http2):
+        return build_session(pool_size=pool_size, keep_alive=keep_alive, http2=http2)
 
     @staticmethod
     def _logger_config(show_logs):
@@ -122,26 +214,324 @@ class AmplitudeRestApi(object):
                 number_of_conditions += s.filter_count()
 
         if group_by is not None:
-            if isinstance(group_by, (list,)):
+            if isinstance(group_by, (list, tuple)):
                 number_of_conditions += (4 * len(group_by))
             else:
                 number_of_conditions += 4
 
         return number_of_conditions
 
-    def _make_request(self, url, params=None):
+    def _endpoint_from_url(self, url):
+        """ Endpoint path of url relative to api_url, e.g. 'sessions/length'"""
+        if url.startswith(self.api_url):
+            return url[len(self.api_url):]
+
+        return url
+
+    def prepare(self, method, *args, **kwargs):
+        """ Build the request of a get_* method without sending it.
+
+            The method runs its usual validation and cost calculation, and the
+            request it would send is returned as a PreparedQuery (url, params
+            and cost) that can be sent later with execute:
+
+                query = api.prepare('get_events', start='20170801',
+                                    end='20170831', events=[Event('open_app')])
+                data = api.execute(query)
+        """
+        self._local.preparing = True
+        try:
+            return getattr(self, method)(*args, **kwargs)
+        finally:
+            self._local.preparing = False
+
+    def execute(self, query):
+        """ Send a PreparedQuery, returns the parsed response. The query
+            keeps its encoding: executing it again costs no serialization."""
+        return self._execute(query)
+
+    def _make_request(self, url, params=None, cost=1):
         """ Each AmplitudeRestAPI method return data by using _make_request"""
-        response = cached_request(url,
-                                  json_params=json.dumps(params),
-                                  auth=(self.project_handler.api_key,
-                                        self.project_handler.secret_key))
+        query = PreparedQuery(url, params, cost)
 
-        error_message = 'Pyamplitude Error: ' + str(response.text)
+        if getattr(self._local, 'preparing', False):
+            return query
+
+        return self._execute(query)
+
+    def _execute(self, query):
+        with self.metrics.timer('latency_seconds', phase='total', **self._metric_labels(query.url)):
+            if self.single_flight is not None:
+                return self.single_flight.do(self._cache_key(query),
+                                             lambda: self._get_response(query))
+
+            return self._get_response(query)
+
+    def _metric_labels(self, url):
+        return {'client': self.METRICS_CLIENT, 'endpoint': self._endpoint_from_url(url)}
+
+    def _record_cache(self, url, cache, hit):
+        self.metrics.increment('cache_hits' if hit else 'cache_misses', cache=cache,
+                               **self._metric_labels(url))
+
+    def _get_response(self, query):
+        """ Response from the caches, or from the api on a miss"""
+        kind = self._columnar_kind(query.url)
+
+        if kind is not None:
+            return self._get_columnar_response(query, kind)
+
+        return self._get_json_response(query)
+
+    def _columnar_kind(self, url):
+        if self.result_format is None:
+            return None
+
+        return columnar.kind_for_endpoint(self._endpoint_from_url(url))
+
+    def _get_columnar_response(self, query, kind):
+        url, params = query.url, query.params
+        key = self._cache_key(query) + (self.result_format,)
+
+        if self.cache is not None:
+            result = self.cache.get(key)
+            self._record_cache(url, 'memory', result is not None)
+            if result is not None:
+                return result
+
+        if self.disk_cache is None and not self._is_incremental(url, params):
+            # Decode straight from the body, no JSON object is ever built
+            # for the series values.
+            response = self._fetch_response(url, params, query.cost)
+            with self.metrics.timer('latency_seconds', phase='decode', **self._metric_labels(url)):
+                result = columnar.decode_text(response.text, kind)
+        else:
+            result = columnar.decode(self._get_json_response(query), kind)
+
+        size = result.nbytes
+
+        if self.result_format == 'pandas':
+            result = result.to_dataframe()
+
+        if self.cache is not None:
+            self.cache.set(key, result, size, self._endpoint_from_url(url))
+
+        return result
+
+    def _get_json_response(self, query):
+        if self._is_incremental(query.url, query.params):
+            return self._make_incremental_request(query.url, query.params, query.cost)
+
+        data = self._cache_lookup(query)
+
+        if data is None:
+            data, size = self._fetch(query.url, query.params, query.cost)
+            self._cache_store(query, data, size)
 
-        response.raise_for_status()
-        data = json.loads(response.text)
         return data
 
+    def _cache_key(self, query):
+        # The api key identifies the project, so a cache can be shared
+        # between instances without mixing up their responses.
+        return (self.project_handler.api_key, query.key())
+
+    def _cache_lookup(self, query):
+        """ Cached response for a request (memory first, then disk), or None"""
+        url, params = query.url, query.params
+
+        if self.cache is not None:
+            data = self.cache.get(self._cache_key(query))
+            self._record_cache(url, 'memory', data is not None)
+            if data is not None:
+                return data
+
+        if self.disk_cache is not None:
+            endpoint = self._endpoint_from_url(url)
+            disk_key = self.disk_cache.make_key(self.project_handler.api_key, endpoint, params)
+            data = self.disk_cache.get(disk_key)
+            self._record_cache(url, 'disk', data is not None)
+            if data is not None:
+                if self.cache is not None:
+                    self.cache.set(self._cache_key(query), data,
+                                   len(json.dumps(data)), endpoint)
+                return data
+
+        return None
+
+    def _cache_store(self, query, data, size):
+        url, params = query.url, query.params
+        endpoint = self._endpoint_from_url(url)
+
+        if self.cache is not None:
+            self.cache.set(self._cache_key(query), data, size, endpoint)
+
+        if self.disk_cache is not None:
+            disk_key = self.disk_cache.make_key(self.project_handler.api_key, endpoint, params)
+            self.disk_cache.set(disk_key, data, params)
+
+    def _fetch(self, url, params=None, cost=1):
+        """ Send the request, returns the parsed response and its size"""
+        response = self._fetch_response(url, params, cost)
+
+        with self.metrics.timer('latency_seconds', phase='decode', **self._metric_labels(url)):
+            data = json.loads(response.text)
+
+        return data, len(response.content)
+
+    def _fetch_response(self, url, params=None, cost=1, stream=False):
+        """ Send the request, returns the successful response. A streamed
+            response is left unread, its caller holds the user endpoints
+            semaphore until the body is consumed."""
+        endpoint = self._endpoint_from_url(url)
+        labels = self._metric_labels(url)
+
+        if self.rate_limiter is not None:
+            with self.metrics.timer('latency_seconds', phase='throttle', **labels):
+                self.rate_limiter.acquire(endpoint, cost)
+
+        def send():
+            if stream:
+                response = self._send(url, params, stream=True)
+                if response.status_code >= 400:
+                    response.close()
+            elif endpoint in USER_ENDPOINTS:
+                with self._user_semaphore:
+                    response = self._send(url, params)
+            else:
+                response = self._send(url, params)
+
+            self.metrics.increment('responses', status=response.status_code, **labels)
+            return response
+
+        def on_retry(status, delay):
+            self.metrics.increment('retries', status=status, **labels)
+            self.metrics.observe('backoff_seconds', delay, status=status, **labels)
+
+        with self.metrics.timer('latency_seconds', phase='network', **labels):
+            if self.retry_policy is not None:
+                response = self.retry_policy.call(endpoint, send, on_retry=on_retry)
+            else:
+                response = send()
+
+        self.metrics.increment('cost_spent', cost, **labels)
+        if not stream:
+            self.metrics.increment('bytes_received', len(response.content), **labels)
+
+        response.raise_for_status()
+
+        return response
+
+    def _send(self, url, params, stream=False):
+        auth = (self.project_handler.api_key, self.project_handler.secret_key)
+
+        if not stream:
+            return self.session.get(url, params=params, auth=auth)
+
+        if hasattr(self.session, 'build_request'):
+            # httpx.Client streams with send(..., stream=True).
+            request = self.session.build_request('GET', url, params=params)
+            return self.session.send(request, auth=auth, stream=True)
+
+        return self.session.get(url, params=params, auth=auth, stream=True)
+
+    def _stream_request(self, url, params=None, cost=1):
+        """ Send the request and yield the (key, value) members of the JSON
+            response as its body is received, see streamjson.MemberParser."""
+        endpoint = self._endpoint_from_url(url)
+        semaphore = self._user_semaphore if endpoint in USER_ENDPOINTS else None
+
+        if semaphore is not None:
+            semaphore.acquire()
+        try:
+            response = self._fetch_response(url, params, cost, stream=True)
+            try:
+                chunks = self._count_bytes(streamjson.iter_body(response), url)
+                for member in streamjson.iter_members(chunks):
+                    yield member
+            finally:
+                response.close()
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+    def _count_bytes(self, chunks, url):
+        labels = self._metric_labels(url)
+
+        for chunk in chunks:
+            self.metrics.increment('bytes_received', len(chunk), **labels)
+            yield chunk
+
+    def _is_incremental(self, url, params):
+        """ Daily-interval queries in an additive mode (see
+            INCREMENTAL_MODES) can be assembled from per-day cache entries."""
+        if not self.incremental or not params:
+            return False
+
+        params = dict(params)
+
+        return (params.get('m') in INCREMENTAL_MODES.get(self._endpoint_from_url(url), []) and
+                params.get('i') == '1' and
+                'start' in params and 'end' in params)
+
+    def _make_incremental_request(self, url, params, cost=1):
+        """ Serve a daily query from per-day cache entries, fetching only the
+            missing days (grouped in contiguous runs) from the api."""
+        days, responses, runs = self._plan_incremental_request(url, params)
+
+        for run in runs:
+            data, size = self._fetch(url, incremental.with_dates(params, *run),
+                                     self._incremental_run_cost(cost, days, run))
+            if not incremental.is_daily(data):
+                return self._incremental_fallback(url, params, cost, days, run, data)
+            self._store_incremental_run(url, params, data, size, responses)
+
+        return self._merge_incremental_request(days, responses, runs)
+
+    def _incremental_fallback(self, url, params, cost, days, run, data):
+        """ A run answered without daily xValues can not be split: the query
+            is answered as a normal request."""
+        self.logger.debug('Pyamplitude: incremental request answered without daily xValues, '
+                          'falling back to a normal request')
+
+        if run == (days[0], days[-1]):
+            return data
+
+        return self._fetch(url, params, cost)[0]
+
+    def _plan_incremental_request(self, url, params):
+        """ Returns the days of the query, the cached per-day responses and
+            the (start, end) runs of days that must be fetched."""
+        params_dict = dict(params)
+        days = incremental.date_range(params_dict['start'], params_dict['end'])
+        responses = {}
+
+        for day in days:
+            data = self._cache_lookup(PreparedQuery(url, incremental.with_dates(params, day, day), 1))
+            if data is not None:
+                responses[day] = data
+
+        return days, responses, incremental.missing_runs(days, responses)
+
+    @staticmethod
+    def _incremental_run_cost(cost, days, run):
+        """ Share of the query cost spent on a run of days."""
+        return float(cost) * len(incremental.date_range(*run)) / len(days)
+
+    def _store_incremental_run(self, url, params, data, size, responses):
+        """ Split a fetched run into per-day cache entries."""
+        day_responses = incremental.split_daily(data)
+        day_size = size // max(len(day_responses), 1)
+
+        for day, day_data in day_responses.items():
+            self._cache_store(PreparedQuery(url, incremental.with_dates(params, day, day), 1),
+                              day_data, day_size)
+            responses[day] = day_data
+
+    def _merge_incremental_request(self, days, responses, runs):
+        self.logger.debug('Pyamplitude: incremental request fetched {} of {} days in {} requests'.format(
+            sum([len(incremental.date_range(*run)) for run in runs]), len(days), len(runs)))
+
+        return incremental.merge_daily([responses[day] for day in days if day in responses])
 
     def _validate_group_by_clause(self, segment_definitions, group_by):
         """ Group by clause validation """
@@ -245,13 +635,13 @@ class AmplitudeRestApi(object):
 
         endpoint = 'users'
 
-        if self.log_query_cost:
-            query_cost = self._calculate_query_cost(start_date=start,
-                                                    end_date=end,
-                                                    endpoint=endpoint,
-                                                    segment_definitions=segment_definitions,
-                                                    group_by=group_by)
+        query_cost = self._calculate_query_cost(start_date=start,
+                                                end_date=end,
+                                                endpoint=endpoint,
+                                                segment_definitions=segment_definitions,
+                                                group_by=group_by)
 
+        if self._log_cost:
             self.log_query_cost(query_cost)
 
         url = self.api_url + endpoint
@@ -264,7 +654,7 @@ class AmplitudeRestApi(object):
             for prop in group_by:
                 params.append(('g', str(prop)))
 
-        api_response = self._make_request(url, params)
+        api_response = self._make_request(url, params, cost=query_cost)
 
         return api_response
 
@@ -290,15 +680,15 @@ class AmplitudeRestApi(object):
         if not self._check_date_parameters(start=start, end=end):
             raise ValueError('Pyamplitude Error: Check start & end date parameters...')
 
-        if self.log_query_cost:
-            query_cost = self._calculate_query_cost(start_date=start,
-                                                    end_date=end,
-                                                    endpoint=endpoint,
-                                                    segment_definitions=None)
+        query_cost = self._calculate_query_cost(start_date=start,
+                                                end_date=end,
+                                                endpoint=endpoint,
+                                                segment_definitions=None)
 
+        if self._log_cost:
             self.log_query_cost(query_cost)
 
-        api_response = self._make_request(url, params)
+        api_response = self._make_request(url, params, cost=query_cost)
 
         return api_response
 
@@ -316,15 +706,15 @@ class AmplitudeRestApi(object):
         if not self._check_date_parameters(start=start, end=end):
             raise ValueError('Pyamplitude Error:  Wrong date parameters...')
 
-        if self.log_query_cost:
-            query_cost = self._calculate_query_cost(start_date=start,
-                                                    end_date=end,
-                                                    endpoint=endpoint,
-                                                    segment_definitions=None)
+        query_cost = self._calculate_query_cost(start_date=start,
+                                                end_date=end,
+                                                endpoint=endpoint,
+                                                segment_definitions=None)
 
+        if self._log_cost:
             self.log_query_cost(query_cost)
 
-        api_response = self._make_request(url, params)
+        api_response = self._make_request(url, params, cost=query_cost)
 
         return api_response
 
@@ -340,15 +730,15 @@ class AmplitudeRestApi(object):
         if not self._check_date_parameters(start=start, end=end):
             raise ValueError('Pyamplitude Error:  Wrong date parameters...')
 
-        if self.log_query_cost:
-            query_cost = self._calculate_query_cost(start_date=start,
-                                                    end_date=end,
-                                                    endpoint=endpoint,
-                                                    segment_definitions=None)
+        query_cost = self._calculate_query_cost(start_date=start,
+                                                end_date=end,
+                                                endpoint=endpoint,
+                                                segment_definitions=None)
 
+        if self._log_cost:
             self.log_query_cost(query_cost)
 
-        api_response = self._make_request(url, params)
+        api_response = self._make_request(url, params, cost=query_cost)
 
         return api_response
 
@@ -383,16 +773,16 @@ class AmplitudeRestApi(object):
         if segment_definitions is not None:
             params.append(('s', self._segments_definition_str(segment_definitions)))
 
-        if self.log_query_cost:
-            query_cost = self._calculate_query_cost(start_date=start,
-                                                    end_date=end,
-                                                    endpoint=endpoint,
-                                                    segment_definitions=segment_definitions)
-            query_cost = query_cost * len(events)
+        query_cost = self._calculate_query_cost(start_date=start,
+                                                end_date=end,
+                                                endpoint=endpoint,
+                                                segment_definitions=segment_definitions)
+        query_cost = query_cost * len(events)
 
+        if self._log_cost:
             self.log_query_cost(query_cost)
 
-        api_response = self._make_request(url, params)
+        api_response = self._make_request(url, params, cost=query_cost)
 
         return api_response
 
@@ -446,17 +836,17 @@ class AmplitudeRestApi(object):
         if segment_definitions is not None:
             params.append(('s', self._segments_definition_str(segment_definitions)))
 
-        if self.log_query_cost:
-            query_cost = self._calculate_query_cost(start_date=start,
-                                                    end_date=end,
-                                                    endpoint=endpoint,
-                                                    segment_definitions=segment_definitions,
-                                                    group_by=events[0].groupby)
-            query_cost = query_cost * len(events)
+        query_cost = self._calculate_query_cost(start_date=start,
+                                                end_date=end,
+                                                endpoint=endpoint,
+                                                segment_definitions=segment_definitions,
+                                                group_by=events[0].groupby)
+        query_cost = query_cost * len(events)
 
+        if self._log_cost:
             self.log_query_cost(query_cost)
 
-        api_response = self._make_request(url, params)
+        api_response = self._make_request(url, params, cost=query_cost)
 
         return api_response
 
@@ -501,15 +891,15 @@ class AmplitudeRestApi(object):
         for x in proper:
             params.append(('p', x))
 
-        if self.log_query_cost:
-            query_cost = self._calculate_query_cost(start_date=start,
-                                                    end_date=end,
-                                                    endpoint=endpoint,
-                                                    segment_definitions=None)
+        query_cost = self._calculate_query_cost(start_date=start,
+                                                end_date=end,
+                                                endpoint=endpoint,
+                                                segment_definitions=None)
 
+        if self._log_cost:
             self.log_query_cost(query_cost)
 
-        api_response = self._make_request(url, params)
+        api_response = self._make_request(url, params, cost=query_cost)
 
         return api_response
 
@@ -532,7 +922,12 @@ class AmplitudeRestApi(object):
         endpoint = 'events'
         url = self.api_url + endpoint + '/list'
 
-        api_response = self._make_request(url)
+        query_cost = self._calculate_cost_for_query_type(endpoint)
+
+        if self._log_cost:
+            self.log_query_cost(query_cost)
+
+        api_response = self._make_request(url, cost=query_cost)
 
         return api_response
 
@@ -563,21 +958,61 @@ class AmplitudeRestApi(object):
 
         endpoint = 'useractivity'
 
-        if self.log_query_cost:
-            query_cost = self._calculate_query_cost(start_date=start,
-                                                    end_date=end,
-                                                    endpoint=endpoint,
-                                                    segment_definitions=None)
+        # User Activity and User Search are limited in queries, not cost.
+        query_cost = 1
 
+        if self._log_cost:
             self.log_query_cost(query_cost)
 
         url = self.api_url + endpoint
         params = [('user', user)]
 
-        api_response = self._make_request(url, params)
+        if offset != '':
+            params.append(('offset', offset))
+        if limit != '':
+            params.append(('limit', limit))
+
+        api_response = self._make_request(url, params, cost=query_cost)
 
         return api_response
 
+    def iter_user_activity(self,
+                           user='',
+                           offset='',
+                           limit=''):
+        """ Streaming version of get_user_activity for large activities.
+
+        The response body is parsed as it is received instead of being loaded
+        in memory, and its members are yielded as (key, value) pairs: one
+        ('userData', {...}) pair, and one ('events', event) pair per event.
+
+        Args:
+            Same as get_user_activity.
+
+        Returns:
+            A generator of (key, value) pairs. The request is sent on the
+            first iteration; consume or close the generator to release the
+            connection. Responses are not cached.
+        """
+
+        endpoint = 'useractivity'
+
+        # User Activity and User Search are limited in queries, not cost.
+        query_cost = 1
+
+        if self._log_cost:
+            self.log_query_cost(query_cost)
+
+        url = self.api_url + endpoint
+        params = [('user', user)]
+
+        if offset != '':
+            params.append(('offset', offset))
+        if limit != '':
+            params.append(('limit', limit))
+
+        return self._stream_request(url, params, cost=query_cost)
+
     def get_user_search(self, user=''):
         """ Search for a user with a specified Amplitude ID, Device ID, User ID,
          or User ID prefix.
@@ -594,10 +1029,16 @@ class AmplitudeRestApi(object):
 
         endpoint = 'usersearch'
 
+        # User Activity and User Search are limited in queries, not cost.
+        query_cost = 1
+
+        if self._log_cost:
+            self.log_query_cost(query_cost)
+
         url = self.api_url + endpoint
         params = [('user', user)]
 
-        api_response = self._make_request(url, params)
+        api_response = self._make_request(url, params, cost=query_cost)
 
         return api_response
 
@@ -626,18 +1067,15 @@ class AmplitudeRestApi(object):
 
         endpoint = 'realtime'
 
-        if self.log_query_cost:
-            query_cost = self._calculate_query_cost(start_date=start,
-                                                    end_date=end,
-                                                    endpoint=endpoint,
-                                                    segment_definitions=None)
+        query_cost = self._calculate_cost_for_query_type(endpoint)
 
+        if self._log_cost:
             self.log_query_cost(query_cost)
 
         url = self.api_url + endpoint
         params = [('i', str(interval))]
 
-        api_response = self._make_request(url, params)
+        api_response = self._make_request(url, params, cost=query_cost)
 
         return api_response
 
@@ -693,13 +1131,13 @@ class AmplitudeRestApi(object):
         self._validate_group_by_clause(segment_definitions, group_by)
         self._validate_segments_definition(segment_definitions)
 
-        if self.log_query_cost:
-            query_cost = self._calculate_query_cost(start_date=start,
-                                                    end_date=end,
-                                                    endpoint=endpoint,
-                                                    segment_definitions=None,
-                                                    group_by=group_by)
+        query_cost = self._calculate_query_cost(start_date=start,
+                                                end_date=end,
+                                                endpoint=endpoint,
+                                                segment_definitions=None,
+                                                group_by=group_by)
 
+        if self._log_cost:
             self.log_query_cost(query_cost)
 
         url = self.api_url + endpoint + '/day'
@@ -712,7 +1150,7 @@ class AmplitudeRestApi(object):
             for prop in group_by:
                 params.append(('g', str(prop)))
 
-        api_response = self._make_request(url, params)
+        api_response = self._make_request(url, params, cost=query_cost)
 
         return api_response
 
@@ -764,13 +1202,13 @@ class AmplitudeRestApi(object):
         endpoint = 'revenue'
         m_options = ['0', '1', '2', '3']
 
-        if self.log_query_cost:
-            query_cost = self._calculate_query_cost(start_date=start,
-                                                    end_date=end,
-                                                    endpoint=endpoint,
-                                                    segment_definitions=None,
-                                                    group_by=group_by)
+        query_cost = self._calculate_query_cost(start_date=start,
+                                                end_date=end,
+                                                endpoint=endpoint,
+                                                segment_definitions=None,
+                                                group_by=group_by)
 
+        if self._log_cost:
             self.log_query_cost(query_cost)
 
         if m not in m_options:
@@ -794,7 +1232,7 @@ class AmplitudeRestApi(object):
             for prop in group_by:
                 params.append(('g', str(prop)))
 
-        api_response = self._make_request(url, params)
+        api_response = self._make_request(url, params, cost=query_cost)
 
         return api_response
 
@@ -873,16 +1311,16 @@ class AmplitudeRestApi(object):
         if group_by is not None:
             params.append(('g', str(group_by)))
 
-        if self.log_query_cost:
-            query_cost = self._calculate_query_cost(start_date=start,
-                                                    end_date=end,
-                                                    endpoint=endpoint,
-                                                    segment_definitions=segment_definitions,
-                                                    group_by=group_by)
+        query_cost = self._calculate_query_cost(start_date=start,
+                                                end_date=end,
+                                                endpoint=endpoint,
+                                                segment_definitions=segment_definitions,
+                                                group_by=group_by)
 
+        if self._log_cost:
             self.log_query_cost(query_cost)
 
-        api_response = self._make_request(url, params)
+        api_response = self._make_request(url, params, cost=query_cost)
 
         return api_response
 
@@ -945,17 +1383,17 @@ class AmplitudeRestApi(object):
         if group_by is not None:
             params.append(('g', str(group_by)))
 
-        if self.log_query_cost:
-            query_cost = self._calculate_query_cost(start_date=start,
-                                                    end_date=end,
-                                                    endpoint=endpoint,
-                                                    segment_definitions=segment_definitions,
-                                                    group_by=group_by)
-            query_cost = query_cost * len(e)
+        query_cost = self._calculate_query_cost(start_date=start,
+                                                end_date=end,
+                                                endpoint=endpoint,
+                                                segment_definitions=segment_definitions,
+                                                group_by=group_by)
+        query_cost = query_cost * len(e)
 
+        if self._log_cost:
             self.log_query_cost(query_cost)
 
-        api_response = self._make_request(url, params)
+        api_response = self._make_request(url, params, cost=query_cost)
 
         return api_response
 
@@ -977,19 +1415,20 @@ class AmplitudeRestApi(object):
 
         endpoint = 'annotations'
 
-        if self.log_query_cost:
-            query_cost = self._calculate_query_cost(start_date=start,
-                                                    end_date=end,
-                                                    endpoint=endpoint,
-                                                    segment_definitions=None)
+        query_cost = self._calculate_cost_for_query_type(endpoint)
 
+        if self._log_cost:
             self.log_query_cost(query_cost)
 
         url = self.api_url + endpoint
 
-        api_response = self._make_request(url)
+        api_response = self._make_request(url, cost=query_cost)
 
         return api_response
 
+    def close(self):
+        """ Close the pooled connections held by this instance."""
+        self.session.close()
+
     def log_query_cost(self, query_cost):
         print('Calculated cost ' + str(query_cost))
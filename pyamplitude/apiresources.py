@@ -1,6 +1,7 @@
 # !/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import copy
 import json
 
 
@@ -32,6 +33,10 @@ class Segment(object):
 
     def filter_count(self):
         return len(self.filters)
+
+    def freeze(self):
+        """Immutable copy of the segment, see FrozenSegment"""
+        return FrozenSegment(self.filters)
     
 class Event(object):
     """Creates an event object for the AmplitudeRestApi class"""
@@ -97,6 +102,95 @@ class Event(object):
     def groupby_count(self):
         return len(self.groupby)
 
+    def freeze(self):
+        """Immutable copy of the event, see FrozenEvent"""
+        return FrozenEvent(self.event_type, self.filters, self.groupby)
+
+
+class _Frozen(object):
+    """Base of the immutable resources: attributes are set once, the wire
+       encoding is computed once and identifies the object (hash, equality)"""
+    def __setattr__(self, name, value):
+        self._immutable()
+
+    def _immutable(self):
+        raise AttributeError('Pyamplitude Error: ' + type(self).__name__ + ' can not be modified')
+
+    def _set(self, **attributes):
+        for name, value in attributes.items():
+            object.__setattr__(self, name, value)
+
+    def __str__(self):
+        return self._encoded
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other._encoded == self._encoded
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((type(self).__name__, self._encoded))
+
+    def __repr__(self):
+        return type(self).__name__ + '(' + self._encoded + ')'
+
+
+class FrozenSegment(_Frozen, Segment):
+    """An immutable Segment (see Segment.freeze). Its filters are copied and
+       encoded once, so it can be shared by any number of queries and used
+       as a dict key"""
+    def __init__(self, filters):
+        filters = tuple(copy.deepcopy(list(filters)))
+        self._set(filters=filters, _encoded=json.dumps(list(filters)))
+
+    def add_filter(self, prop, op, values):
+        self._immutable()
+
+    def freeze(self):
+        return self
+
+
+class FrozenEvent(_Frozen, Event):
+    """An immutable Event (see Event.freeze), encoded once"""
+    def __init__(self, event_type, filters, groupby):
+        filters = tuple(copy.deepcopy(list(filters)))
+        groupby = tuple(copy.deepcopy(list(groupby)))
+        self._set(event_type=event_type, filters=filters, groupby=groupby,
+                  _encoded=json.dumps({"event_type": event_type,
+                                       "filters": list(filters),
+                                       "group_by": list(groupby)}))
+
+    def add_filter(self, subprop_type, subprop_key, subprop_op, subprop_values):
+        self._immutable()
+
+    def add_groupby(self, groupby_type, groupby_value):
+        self._immutable()
+
+    def add_measured_property(self, property_type, property_value):
+        self._immutable()
+
+    def freeze(self):
+        return self
+
+
+class PreparedQuery(_Frozen):
+    """A request built by an AmplitudeRestApi get_* method but not sent yet,
+       see AmplitudeRestApi.prepare. Immutable: its params are stored as a
+       tuple and its canonical key is computed once, a query can be executed
+       any number of times and used as a cache or deduplication key"""
+    def __init__(self, url, params, cost):
+        params = tuple([tuple(param) for param in params or ()])
+        self._set(url=url, params=params, cost=cost,
+                  _encoded=json.dumps([url, params]))
+
+    def __repr__(self):
+        return 'PreparedQuery(' + self.url + ', cost=' + str(self.cost) + ')'
+
+    def key(self):
+        """Canonical string identifying the request"""
+        return self._encoded
+
 
 class ProjectsHandler(object):
     """ A simple access handler for Amplitude Projects"""
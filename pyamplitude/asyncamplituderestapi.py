@@ -0,0 +1,268 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import base64
+
+try:
+    import aiohttp
+except ImportError:
+    raise ImportError('Pyamplitude Error: AsyncAmplitudeRestApi requires aiohttp, '
+                      'install it with: pip install "pyamplitude[async]"')
+
+from . import incremental
+from . import columnar
+from . import streamjson
+from .httpsession import DEFAULT_POOL_SIZE
+from .amplituderestapi import AmplitudeRestApi, USER_ENDPOINTS_CONCURRENCY
+from .ratelimiter import USER_ENDPOINTS
+from .lazyimport import LazyModule
+
+json = LazyModule('simplejson')
+
+
+class _Response(object):
+    """ Status, headers and body of an aiohttp response, read before its
+        connection is released."""
+
+    def __init__(self, response, body):
+        self.status_code = response.status
+        self.headers = response.headers
+        self.content = body
+        self._response = response
+
+    def raise_for_status(self):
+        self._response.raise_for_status()
+
+
+class AsyncAmplitudeRestApi(AmplitudeRestApi):
+    """ asyncio version of AmplitudeRestApi, built on aiohttp.
+
+        Every get_* method takes the same arguments as in AmplitudeRestApi and
+        runs the same validation and cost calculation when called, then
+        returns a coroutine to await for the response (prepare returns the
+        PreparedQuery directly, execute a coroutine):
+
+            api = AsyncAmplitudeRestApi(project_handler, show_logs=False,
+                                        log_query_cost=False)
+            data = await api.get_events(start='20170801', end='20170831',
+                                        events=[Event('open_app')])
+            await api.close()
+
+        Requests share a pooled aiohttp session created on first use, and at
+        most user_concurrency User Activity / User Search requests (5 per
+        Amplitude's documented limit) run concurrently. A rate_limiter is
+        waited on with asyncio.sleep, so 'queue' mode behaves as 'block'.
+
+        iter_user_activity returns an async generator:
+
+            async for key, value in api.iter_user_activity(user=amplitude_id):
+                ...
+    """
+
+    def __init__(self, project_handler, show_logs, log_query_cost, api_url='https://amplitude.com/api/2/',
+                 pool_size=DEFAULT_POOL_SIZE, keep_alive=True, session=None, cache=None,
+                 disk_cache=None, incremental=False, rate_limiter=None, retry_policy=None,
+                 result_format=None, metrics=None, user_concurrency=USER_ENDPOINTS_CONCURRENCY):
+
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.user_concurrency = user_concurrency
+        self._async_user_semaphore = None
+
+        super(AsyncAmplitudeRestApi, self).__init__(project_handler, show_logs, log_query_cost,
+                                                    api_url=api_url, session=session, cache=cache,
+                                                    disk_cache=disk_cache, incremental=incremental,
+                                                    rate_limiter=rate_limiter,
+                                                    retry_policy=retry_policy,
+                                                    result_format=result_format,
+                                                    metrics=metrics)
+
+    def _build_session(self, pool_size, keep_alive, http2):
+        # aiohttp sessions must be created inside the running event loop.
+        return None
+
+    def _get_session(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size,
+                                             force_close=not self.keep_alive)
+            self.session = aiohttp.ClientSession(connector=connector)
+
+        return self.session
+
+    def _execute(self, query):
+        """ Unless the request is being prepared, _make_request (and execute)
+            return this coroutine."""
+        return self._request(query)
+
+    async def _request(self, query):
+        with self.metrics.timer('latency_seconds', phase='total', **self._metric_labels(query.url)):
+            return await self._get_result(query)
+
+    async def _get_result(self, query):
+        kind = self._columnar_kind(query.url)
+
+        if kind is None:
+            return await self._get_json_response_async(query)
+
+        data = await self._get_json_response_async(query)
+
+        with self.metrics.timer('latency_seconds', phase='decode', **self._metric_labels(query.url)):
+            result = columnar.decode(data, kind)
+
+        if self.result_format == 'pandas':
+            result = result.to_dataframe()
+
+        return result
+
+    async def _get_json_response_async(self, query):
+        url, params, cost = query.url, query.params, query.cost
+
+        if self._is_incremental(url, params):
+            days, responses, runs = self._plan_incremental_request(url, params)
+            fetched = await asyncio.gather(*[self._fetch(url, incremental.with_dates(params, *run),
+                                                         self._incremental_run_cost(cost, days, run))
+                                             for run in runs])
+
+            for run, (data, size) in zip(runs, fetched):
+                if not incremental.is_daily(data):
+                    if run == (days[0], days[-1]):
+                        return data
+                    return (await self._fetch(url, params, cost))[0]
+                self._store_incremental_run(url, params, data, size, responses)
+
+            return self._merge_incremental_request(days, responses, runs)
+
+        data = self._cache_lookup(query)
+
+        if data is None:
+            data, size = await self._fetch(url, params, cost)
+            self._cache_store(query, data, size)
+
+        return data
+
+    async def _fetch(self, url, params=None, cost=1):
+        """ Send the request, returns the parsed response and its size"""
+        endpoint = self._endpoint_from_url(url)
+        labels = self._metric_labels(url)
+        await self._acquire_budget(endpoint, cost)
+
+        async def send():
+            if endpoint in USER_ENDPOINTS:
+                async with self._get_user_semaphore():
+                    response = await self._send(url, params)
+            else:
+                response = await self._send(url, params)
+
+            self.metrics.increment('responses', status=response.status_code, **labels)
+            return response
+
+        with self.metrics.timer('latency_seconds', phase='network', **labels):
+            response = await self._call(endpoint, send, labels)
+
+        self.metrics.increment('cost_spent', cost, **labels)
+        self.metrics.increment('bytes_received', len(response.content), **labels)
+        response.raise_for_status()
+
+        with self.metrics.timer('latency_seconds', phase='decode', **labels):
+            data = json.loads(response.content)
+
+        return data, len(response.content)
+
+    async def _call(self, endpoint, send, labels):
+        """ await send(), retried according to retry_policy"""
+        if self.retry_policy is None:
+            return await send()
+
+        def on_retry(status, delay):
+            self.metrics.increment('retries', status=status, **labels)
+            self.metrics.observe('backoff_seconds', delay, status=status, **labels)
+
+        return await self.retry_policy.call_async(endpoint, send, on_retry=on_retry)
+
+    async def _stream_request(self, url, params=None, cost=1):
+        """ Async generator version of AmplitudeRestApi._stream_request."""
+        endpoint = self._endpoint_from_url(url)
+        labels = self._metric_labels(url)
+        await self._acquire_budget(endpoint, cost)
+
+        async def send():
+            response = await self._get_session().get(url, params=params,
+                                                     headers=self._auth_headers())
+            self.metrics.increment('responses', status=response.status, **labels)
+
+            if response.status < 400:
+                return response
+
+            body = await response.read()
+            response.release()
+
+            return _Response(response, body)
+
+        if endpoint in USER_ENDPOINTS:
+            semaphore = self._get_user_semaphore()
+            await semaphore.acquire()
+        else:
+            semaphore = None
+
+        try:
+            response = await self._call(endpoint, send, labels)
+            self.metrics.increment('cost_spent', cost, **labels)
+            response.raise_for_status()
+            parser = streamjson.MemberParser()
+
+            try:
+                async for chunk in response.content.iter_chunked(streamjson.CHUNK_SIZE):
+                    self.metrics.increment('bytes_received', len(chunk), **labels)
+                    for member in parser.feed(chunk):
+                        yield member
+
+                for member in parser.close():
+                    yield member
+            finally:
+                response.release()
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+    async def _acquire_budget(self, endpoint, cost):
+        if self.rate_limiter is None:
+            return
+
+        with self.metrics.timer('latency_seconds', phase='throttle',
+                                client=self.METRICS_CLIENT, endpoint=endpoint):
+            wait = self.rate_limiter.try_acquire(endpoint, cost)
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self.rate_limiter.try_acquire(endpoint, cost)
+
+    def _get_user_semaphore(self):
+        if self._async_user_semaphore is None:
+            self._async_user_semaphore = asyncio.Semaphore(self.user_concurrency)
+
+        return self._async_user_semaphore
+
+    def _auth_headers(self):
+        credentials = self.project_handler.api_key + ':' + self.project_handler.secret_key
+        token = base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+
+        return {'Authorization': 'Basic ' + token}
+
+    async def _send(self, url, params):
+        async with self._get_session().get(url, params=params,
+                                           headers=self._auth_headers()) as response:
+            body = await response.read()
+
+        return _Response(response, body)
+
+    async def close(self):
+        """ Close the pooled connections held by this instance."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,223 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .apiresources import PreparedQuery
+
+DEFAULT_MAX_WORKERS = 5
+
+# get_* methods sending one or two events (e and e2) in a request.
+MERGEABLE_METHODS = ['get_events', 'get_property_metrics']
+
+# Keys of an events/segmentation response holding one item per series.
+SERIES_KEYS = ['series', 'seriesLabels', 'seriesCollapsed', 'seriesMeta']
+
+
+class QuerySpec(object):
+    """ One query of a batch: the AmplitudeRestApi get_* method to call and
+        its keyword arguments.
+
+        Args:
+            name (required)       Key of the query result.
+            method (required)     Name of the get_* method, e.g. 'get_funnel'.
+            kwargs (optional)     Keyword arguments of the method.
+            priority (optional)   Higher priority queries are sent first
+            (default: 0).
+    """
+
+    def __init__(self, name, method, kwargs=None, priority=0):
+        self.name = name
+        self.method = method
+        self.kwargs = kwargs or {}
+        self.priority = priority
+
+    def __repr__(self):
+        return 'QuerySpec(' + str(self.name) + ', ' + self.method + ')'
+
+
+class PlannedQuery(object):
+    """ A unique request of a batch and the names of the specs sharing it.
+
+        A request merging the single-event queries of two specs has parts:
+        the names answered by its first (e) and second (e2) event.
+    """
+
+    def __init__(self, query, names, priority, method=None, parts=None):
+        self.query = query
+        self.names = names
+        self.priority = priority
+        self.method = method
+        self.parts = parts
+
+
+class BatchExecutor(object):
+    """ Plans and runs batches of AmplitudeRestApi queries.
+
+        Each spec is prepared (validated, cost calculated, request built)
+        without being sent. Specs producing the same request are deduplicated,
+        and with merge_events (default) single-event get_events and
+        get_property_metrics queries that only differ by their event are
+        packed pairwise into one request (e and e2) whose response is split
+        back per event. The unique requests are ordered by priority and then by cost (cheapest
+        first, so that the most queries complete within the cost budget), and
+        are sent from a bounded thread pool. The api instance enforces the
+        concurrency limit of User Activity / User Search and, when it has a
+        rate_limiter, the cost budget.
+
+        Usage:
+
+            executor = BatchExecutor(api, max_workers=5)
+            results = executor.run([QuerySpec('dau', 'get_active_and_new_user_count',
+                                              {'start': '20170801', 'end': '20170831'}),
+                                    QuerySpec('signup', 'get_funnel', {...}, priority=1)])
+    """
+
+    def __init__(self, api, max_workers=DEFAULT_MAX_WORKERS, merge_events=True):
+        self.api = api
+        self.max_workers = max_workers
+        self.merge_events = merge_events
+
+        self.submitted = 0
+        self.deduplicated = 0
+        self.merged = 0
+
+    def plan(self, specs):
+        """ Returns the list of PlannedQuery in the order they will be sent."""
+        planned = {}
+        names = set()
+
+        for spec in specs:
+            if spec.name in names:
+                raise ValueError('Pyamplitude Error: BatchExecutor: duplicated query name ' + str(spec.name))
+            names.add(spec.name)
+
+            # Prepared queries are hashable on their canonical key.
+            query = self.api.prepare(spec.method, **spec.kwargs)
+
+            if query in planned:
+                planned[query].names.append(spec.name)
+                planned[query].priority = max(planned[query].priority, spec.priority)
+                self.deduplicated += 1
+            else:
+                planned[query] = PlannedQuery(query, [spec.name], spec.priority, spec.method)
+
+        plan = list(planned.values())
+
+        if self.merge_events:
+            plan = self._merge_events(plan)
+
+        return sorted(plan, key=lambda p: (-p.priority, p.query.cost))
+
+    def _merge_events(self, plan):
+        """ Pair the mergeable single-event queries sharing everything but
+            their event, in the order they were planned."""
+        merged = []
+        waiting = {}
+
+        for planned in plan:
+            key = self._merge_key(planned)
+
+            if key is None:
+                merged.append(planned)
+            elif key in waiting:
+                merged.append(self._merged(waiting.pop(key), planned))
+                self.merged += 1
+            else:
+                waiting[key] = planned
+
+        return merged + list(waiting.values())
+
+    def _merge_key(self, planned):
+        # Columnar results can not be split per event, nor can histograms
+        # whose response is not a list of series.
+        if planned.method not in MERGEABLE_METHODS or getattr(self.api, 'result_format', None) is not None:
+            return None
+
+        names = [name for name, value in planned.query.params]
+        if names.count('e') != 1 or 'e2' in names or ('m', 'histogram') in planned.query.params:
+            return None
+
+        return (planned.method, planned.query.url,
+                tuple([param for param in planned.query.params if param[0] != 'e']))
+
+    @staticmethod
+    def _merged(first, second):
+        params = []
+        for name, value in first.query.params:
+            params.append((name, value))
+            if name == 'e':
+                params.append(('e2', dict(second.query.params)['e']))
+
+        query = PreparedQuery(first.query.url, params, first.query.cost + second.query.cost)
+
+        return PlannedQuery(query, first.names + second.names, max(first.priority, second.priority),
+                            first.method, parts=[first.names, second.names])
+
+    def iter_completed(self, specs, return_exceptions=False):
+        """ Yields (name, result) pairs in completion order.
+
+            A failed query raises its exception when it is reached, unless
+            return_exceptions is True, in which case the exception is yielded
+            as its result.
+        """
+        plan = self.plan(specs)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {}
+            for planned in plan:
+                futures[pool.submit(self.api.execute, planned.query)] = planned
+                self.submitted += 1
+
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if not return_exceptions:
+                        for pending in futures:
+                            pending.cancel()
+                        raise
+                    result = e
+
+                planned = futures[future]
+
+                if planned.parts is None or isinstance(result, Exception):
+                    for name in planned.names:
+                        yield name, result
+                    continue
+
+                for index, names in enumerate(planned.parts):
+                    part = split_events_response(result, index)
+                    for name in names:
+                        yield name, part
+
+    def run(self, specs, return_exceptions=False):
+        """ Run the batch, returns a dict of name -> result."""
+        return dict(self.iter_completed(specs, return_exceptions=return_exceptions))
+
+
+def split_events_response(response, index):
+    """ Response of the index-th event (0 for e, 1 for e2) of an
+        events/segmentation response, shaped as if it had been queried
+        alone: its series (and their labels, collapsed values and meta)
+        only, labelled with event index 0.
+    """
+    data = response['data']
+    labels = data.get('seriesLabels', list(range(len(data['series']))))
+    rows = [n for n, label in enumerate(labels) if _event_index(label) == index]
+
+    part = dict(data)
+    for key in SERIES_KEYS:
+        if key in data:
+            part[key] = [data[key][n] for n in rows]
+
+    if 'seriesLabels' in data:
+        part['seriesLabels'] = [[0] + list(label[1:]) if isinstance(label, list) else 0
+                                for label in part['seriesLabels']]
+
+    return dict(response, data=part)
+
+
+def _event_index(label):
+    # A series is labelled with its event index, or with [event index,
+    # group by value] when the events are grouped.
+    return label[0] if isinstance(label, list) else label
@@ -3,10 +3,15 @@
 
 
 import sys
-import requests
 import logging
-import simplejson as json
 from  datetime import date
+from .retry import RetryPolicy
+from .metrics import MetricsHook
+from . import streamjson
+from .lazyimport import LazyModule
+
+requests = LazyModule('requests')
+json = LazyModule('simplejson')
 
 class BehavioralCohortsApi(object):
     """ BehaivioralCohortsApi class.
@@ -18,11 +23,14 @@ class BehavioralCohortsApi(object):
     https://amplitude.zendesk.com/hc/en-us/articles/206214068- \
     Behavioral-Cohorts-API
 
+    An optional metrics hook (see metrics.py) receives the latency, bytes,
+    responses and retries of the 'cohorts/list', 'cohorts/get' and
+    'cohorts/upload' endpoints.
     """
 
     ERROR_CODES = ['401','400','429','500']
 
-    def __init__(self, projects_handler, show_logs=False):
+    def __init__(self, projects_handler, show_logs=False, retry_policy=None, metrics=None):
 
         self.logger = self._logger_config(show_logs)
         self.projects_handler = projects_handler
@@ -30,6 +38,13 @@ class BehavioralCohortsApi(object):
         self.auth = (self.projects_handler.api_key,
                      self.projects_handler.secret_key)
 
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+        elif retry_policy is False:
+            retry_policy = None
+        self.retry_policy = retry_policy
+        self.metrics = metrics if metrics is not None else MetricsHook()
+
     @staticmethod
     def _logger_config(show_logs):
         """A static method configuring logs"""
@@ -48,6 +63,38 @@ class BehavioralCohortsApi(object):
 
         return logger
 
+    def _request(self, method, url, idempotent=True, endpoint='cohorts', **kwargs):
+        """ Send a request, retried on 429 and 5xx according to retry_policy.
+            Non idempotent requests are only retried on 429."""
+        labels = {'client': 'cohorts', 'endpoint': endpoint}
+
+        def send():
+            response = requests.request(method, url, auth=self.auth, **kwargs)
+            if kwargs.get('stream') and response.status_code >= 400:
+                response.close()
+            self.metrics.increment('responses', status=response.status_code, **labels)
+            return response
+
+        def on_retry(status, delay):
+            self.metrics.increment('retries', status=status, **labels)
+            self.metrics.observe('backoff_seconds', delay, status=status, **labels)
+
+        with self.metrics.timer('latency_seconds', phase='network', **labels):
+            if self.retry_policy is None:
+                response = send()
+            else:
+                response = self.retry_policy.call('cohorts', send, idempotent=idempotent,
+                                                  on_retry=on_retry)
+
+        if not kwargs.get('stream'):
+            self.metrics.increment('bytes_received', len(response.content), **labels)
+
+        return response
+
+    def _decode(self, response, endpoint):
+        with self.metrics.timer('latency_seconds', phase='decode', client='cohorts', endpoint=endpoint):
+            return json.loads(response.text)
+
     def get_cohort(self, cohort_id, props=0, propKeys=[]):
         """ Get a discoverable cohort using its string ID.
 
@@ -72,12 +119,9 @@ class BehavioralCohortsApi(object):
             no propKeys defined')
         else:
             try:
-                url = self.api_url + '/{}?props={}'.format(cohort_id, props)
-                if props == 1 and propKeys != []:
-                    propKeys = [''] + propKeys
-                    url +=  '&propKeys='.join(propKeys)
-                response = requests.get(url, auth=self.auth)
-                cohort = json.loads(response.text)
+                response = self._request('GET', self._cohort_url(cohort_id, props, propKeys),
+                                         endpoint='cohorts/get')
+                cohort = self._decode(response, 'cohorts/get')
 
                 return cohort
 
@@ -86,6 +130,47 @@ class BehavioralCohortsApi(object):
 
                 return None
 
+    def iter_cohort(self, cohort_id, props=0, propKeys=[]):
+        """ Streaming version of get_cohort for large cohorts.
+
+           The response body is parsed as it is received instead of being
+           loaded in memory, and its members are yielded as (key, value)
+           pairs: one ('cohort', {...}) pair, and one pair per item of the
+           member arrays, e.g. ('user_ids', user_id), ('amplitude_ids', id).
+
+           Args:
+                Same as get_cohort.
+
+            Returns:
+                A generator of (key, value) pairs. The request is sent on the
+                first iteration; consume or close the generator to release
+                the connection.
+
+            Raises:
+                requests.HTTPError if the cohort can not be fetched.
+        """
+        response = self._request('GET', self._cohort_url(cohort_id, props, propKeys),
+                                 endpoint='cohorts/get', stream=True)
+
+        try:
+            response.raise_for_status()
+            for member in streamjson.iter_members(self._count_bytes(response, 'cohorts/get')):
+                yield member
+        finally:
+            response.close()
+
+    def _count_bytes(self, response, endpoint):
+        for chunk in response.iter_content(streamjson.CHUNK_SIZE):
+            self.metrics.increment('bytes_received', len(chunk), client='cohorts', endpoint=endpoint)
+            yield chunk
+
+    def _cohort_url(self, cohort_id, props, propKeys):
+        url = self.api_url + '/{}?props={}'.format(cohort_id, props)
+        if props == 1 and propKeys != []:
+            propKeys = [''] + propKeys
+            url +=  '&propKeys='.join(propKeys)
+        return url
+
     def list_all_cohorts(self):
         """ Get all cohorts for specific app.
 
@@ -93,8 +178,8 @@ class BehavioralCohortsApi(object):
             A list with all created cohorts.
         """
         try:
-            response = requests.get(self.api_url, auth=self.auth)
-            cohorts = json.loads(response.text)
+            response = self._request('GET', self.api_url, endpoint='cohorts/list')
+            cohorts = self._decode(response, 'cohorts/list')
 
             return cohorts['cohorts']
 
@@ -175,9 +260,10 @@ class BehavioralCohortsApi(object):
 
         headers = {"Content-Type": "application/json"}
 
-        new_cohort = requests.post(url
-                                   ,data=data
-                                   ,auth=self.auth,
+        new_cohort = self._request('POST', url,
+                                   idempotent=False,
+                                   endpoint='cohorts/upload',
+                                   data=data,
                                    headers=headers)
         confirmation = new_cohort.text
 
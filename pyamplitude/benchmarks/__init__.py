@@ -0,0 +1,14 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Offline benchmarks for pyamplitude, run against a local stub server.
+
+    Each benchmark module can be run on its own, e.g.:
+
+        python -m pyamplitude.benchmarks.bench_session
+
+    The suite module runs every scenario against a MockAmplitudeServer and
+    writes machine-readable results to compare between versions:
+
+        python -m pyamplitude.benchmarks.suite --json results.json
+"""
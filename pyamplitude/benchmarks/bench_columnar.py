@@ -0,0 +1,75 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Decoding time of a large synthetic group-by events response.
+
+    element_by_element  json.loads then one Python loop per cell, the way
+                        the nested lists were consumed so far.
+    decode              json.loads then columnar.decode (numpy.asarray).
+    decode_text         columnar.decode_text, numbers parsed by NumPy
+                        straight from the body.
+
+    Run with: python -m pyamplitude.benchmarks.bench_columnar [labels] [days]
+"""
+
+import random
+import sys
+import time
+import simplejson as json
+from datetime import date, timedelta
+
+from pyamplitude import columnar
+
+
+def synthetic_payload(labels=1000, days=365, seed=0):
+    """ Body of an events/segmentation response with labels series."""
+    rng = random.Random(seed)
+    first = date(2017, 1, 1)
+    x_values = [(first + timedelta(days=n)).isoformat() for n in range(days)]
+    series = [[rng.randint(0, 100000) for _ in range(days)] for _ in range(labels)]
+
+    return json.dumps({'data': {'series': series,
+                                'seriesLabels': [[0, 'value %d' % n] for n in range(labels)],
+                                'xValues': x_values}})
+
+
+def _element_by_element(text):
+    data = json.loads(text)['data']
+    table = {}
+    for label, row in zip(data['seriesLabels'], data['series']):
+        column = table.setdefault(str(label), {})
+        for x_value, value in zip(data['xValues'], row):
+            column[x_value] = float(value)
+    return table
+
+
+def _best_of(function, text, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(text)
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000.0
+
+
+def run(labels=1000, days=365, repeat=5):
+    text = synthetic_payload(labels, days)
+
+    results = {'labels': labels, 'days': days, 'bytes': len(text),
+               'element_by_element_ms': _best_of(_element_by_element, text, repeat),
+               'decode_ms': _best_of(lambda t: columnar.decode(json.loads(t)), text, repeat),
+               'decode_text_ms': _best_of(columnar.decode_text, text, repeat)}
+    results['speedup'] = results['element_by_element_ms'] / results['decode_text_ms']
+
+    return results
+
+
+if __name__ == '__main__':
+    labels = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 365
+    results = run(labels, days)
+    print('{} labels x {} days, {:.1f} MB'.format(labels, days, results['bytes'] / 1e6))
+    print('element by element : {:.1f} ms'.format(results['element_by_element_ms']))
+    print('decode             : {:.1f} ms'.format(results['decode_ms']))
+    print('decode_text        : {:.1f} ms'.format(results['decode_text_ms']))
+    print('speedup            : {:.1f}x'.format(results['speedup']))
@@ -0,0 +1,135 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Decoding throughput of export archives, single process against the
+    process pool of exportdecode, on a synthetic archive.
+
+    serial          exportedevents.iter_archive, one core.
+    events/<n>      exportdecode.iter_events with n workers.
+    arrow/<n>       exportdecode.iter_batches(format='arrow') with n workers
+                    (skipped without pyarrow).
+
+    Worker counts go from 1 to the number of cores, doubling. Each mode
+    reports events per second and its speedup over serial.
+
+    Run with: python -m pyamplitude.benchmarks.bench_decode [events_per_hour] [hours]
+"""
+
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+import simplejson as json
+from datetime import datetime, timedelta
+
+from pyamplitude import exportdecode
+from pyamplitude.exportedevents import iter_archive
+
+
+def synthetic_event(n, hour):
+    """ An exported event with the fields and properties of a real one,
+        uploaded in hour (a datetime)."""
+    return {'event_id': n,
+            'event_type': 'event %d' % (n % 40),
+            'event_time': hour.strftime('%Y-%m-%d %H:') + '%02d:%02d.%06d' % (n % 60, n % 59, n % 999983),
+            'server_upload_time': hour.strftime('%Y-%m-%d %H:59:59.000000'),
+            'amplitude_id': 100000 + n % 5000,
+            'user_id': 'user %d' % (n % 5000),
+            'device_id': 'a8e5b3c4-%08d' % (n % 5000),
+            'session_id': 1501545600000 + n,
+            'platform': ['iOS', 'Android', 'Web'][n % 3],
+            'os_name': 'ios',
+            'os_version': '10.3',
+            'country': ['Spain', 'Argentina', 'Uruguay', 'Chile'][n % 4],
+            'city': 'Madrid',
+            'language': 'Spanish',
+            'version_name': '2.%d.0' % (n % 10),
+            'event_properties': {'screen': 'home', 'position': n % 7, 'price': n % 100 / 4.0,
+                                 'tags': ['a', 'b'], 'first': n % 2 == 0},
+            'user_properties': {'plan': ['free', 'pro'][n % 2], 'age': 20 + n % 40,
+                                'referrer': 'campaign %d' % (n % 12)}}
+
+
+def synthetic_archive(path, events_per_hour=20000, hours=24):
+    """ Write an export archive of hours gzipped hourly members to path.
+        Returns its size in bytes."""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as archive:
+        for h in range(hours):
+            hour = datetime(2017, 8, 1) + timedelta(hours=h)
+            lines = [json.dumps(synthetic_event(h * events_per_hour + n, hour))
+                     for n in range(events_per_hour)]
+            name = '123/123_{}#0.json.gz'.format(hour.strftime('%Y-%m-%d_%H'))
+            archive.writestr(name, gzip.compress(('\n'.join(lines) + '\n').encode('utf-8'), 6))
+
+    return os.path.getsize(path)
+
+
+def _worker_counts():
+    counts, n = [], 1
+    cores = os.cpu_count() or 1
+
+    while n < cores:
+        counts.append(n)
+        n *= 2
+
+    return counts + [cores]
+
+
+def _rate(function):
+    started = time.perf_counter()
+    events = function()
+    elapsed = time.perf_counter() - started
+
+    return events, events / elapsed
+
+
+def run(events_per_hour=20000, hours=24, worker_counts=None):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'export.zip')
+
+    try:
+        size = synthetic_archive(path, events_per_hour, hours)
+        expected = events_per_hour * hours
+        modes = [('serial', lambda: sum(1 for _ in iter_archive(path)))]
+
+        for workers in worker_counts or _worker_counts():
+            modes.append(('events/%d' % workers,
+                          lambda workers=workers: sum(1 for _ in exportdecode.iter_events(path, workers))))
+
+        try:
+            import pyarrow
+        except ImportError:
+            pyarrow = None
+
+        if pyarrow is not None:
+            for workers in worker_counts or _worker_counts():
+                modes.append(('arrow/%d' % workers,
+                              lambda workers=workers: sum(batch.num_rows for batch in
+                                                          exportdecode.iter_batches(path, workers, 'arrow'))))
+
+        results = {}
+        for name, function in modes:
+            events, rate = _rate(function)
+            assert events == expected, (name, events)
+            results[name] = {'events_per_sec': rate}
+
+        for result in results.values():
+            result['speedup'] = result['events_per_sec'] / results['serial']['events_per_sec']
+    finally:
+        shutil.rmtree(directory)
+
+    return {'events': expected, 'archive_bytes': size, 'cores': os.cpu_count(), 'results': results}
+
+
+if __name__ == '__main__':
+    events_per_hour = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    hours = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    report = run(events_per_hour, hours)
+
+    print('{} events, {:.1f} MB archive, {} cores'.format(report['events'], report['archive_bytes'] / 1e6,
+                                                           report['cores']))
+    for name, result in sorted(report['results'].items(), key=lambda item: (item[0] != 'serial', item[0])):
+        print('{:<12} {:>10.0f} events/s  x{:.2f}'.format(name, result['events_per_sec'], result['speedup']))
@@ -0,0 +1,78 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Cold import time of pyamplitude, measured with python -X importtime in
+    fresh interpreters (the best of several runs is kept), and the heavy
+    dependencies each import pulls in.
+
+    Run with: python -m pyamplitude.benchmarks.bench_importtime [runs]
+
+    Bytecode is written by a first, discarded run (as for an installed
+    package), so source compilation is not measured.
+
+    Exits with status 1 if an import is slower than its target or loads one
+    of the deferred dependencies (requests, simplejson, psycopg2, asyncio,
+    aiohttp, numpy).
+"""
+
+import os
+import subprocess
+import sys
+
+# Cumulative import time targets, in milliseconds.
+TARGETS_MS = {'pyamplitude': 5.0,
+              'pyamplitude.amplituderestapi': 30.0}
+
+DEFERRED = ['requests', 'simplejson', 'psycopg2', 'asyncio', 'aiohttp', 'numpy']
+
+
+def import_time(module):
+    """ Cumulative import time of module in a fresh interpreter, in
+        milliseconds, and the deferred dependencies it loaded."""
+    code = ('import sys, {0}\n'
+            'print(",".join(m for m in {1!r} if m in sys.modules))').format(module, DEFERRED)
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True, check=True, env=env)
+
+    cumulative = None
+    for line in process.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative = int(fields[1]) / 1000.0
+
+    loaded = [name for name in process.stdout.strip().split(',') if name]
+
+    return cumulative, loaded
+
+
+def run(runs=5):
+    results = {}
+
+    for module, target in sorted(TARGETS_MS.items()):
+        times = []
+        import_time(module)
+        for _ in range(runs):
+            cumulative, loaded = import_time(module)
+            times.append(cumulative)
+
+        results[module] = {'ms': min(times), 'target_ms': target, 'loaded': loaded}
+
+    return results
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    failed = False
+
+    for module, result in sorted(run(runs).items()):
+        slow = result['ms'] > result['target_ms']
+        failed = failed or slow or bool(result['loaded'])
+        print('{:<32} {:8.2f} ms (target {:.0f} ms){}{}'.format(
+            module, result['ms'], result['target_ms'], '  TOO SLOW' if slow else '',
+            '  loads ' + ', '.join(result['loaded']) if result['loaded'] else ''))
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,63 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Per-call latency of AmplitudeRestApi._make_request with a pooled
+    keep-alive session versus a bare requests.get per call.
+
+    Run with: python -m pyamplitude.benchmarks.bench_session [calls]
+"""
+
+import sys
+import time
+import requests
+
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.benchmarks.stubserver import StubServer
+
+
+class _BareRequests(object):
+    """ Session stand-in issuing a new connection for every call."""
+
+    def get(self, url, **kwargs):
+        return requests.get(url, **kwargs)
+
+    def close(self):
+        pass
+
+
+def _time_calls(api, calls):
+    """ Mean latency in milliseconds. Each call uses distinct params so the
+        response cache never answers it."""
+    started = time.perf_counter()
+    for i in range(calls):
+        api._make_request(api.api_url + 'events/list', [('n', str(i))])
+
+    return (time.perf_counter() - started) * 1000.0 / calls
+
+
+def run(calls=500):
+    project = ProjectsHandler(project_name='bench', api_key='key', secret_key='secret')
+
+    with StubServer() as server:
+        bare = AmplitudeRestApi(project, show_logs=False, log_query_cost=False,
+                                api_url=server.url, session=_BareRequests())
+        pooled = AmplitudeRestApi(project, show_logs=False, log_query_cost=False,
+                                  api_url=server.url)
+
+        results = {'calls': calls,
+                   'bare_ms_per_call': _time_calls(bare, calls),
+                   'pooled_ms_per_call': _time_calls(pooled, calls)}
+        pooled.close()
+
+    results['speedup'] = results['bare_ms_per_call'] / results['pooled_ms_per_call']
+
+    return results
+
+
+if __name__ == '__main__':
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    results = run(calls)
+    print('bare requests.get : {:.3f} ms/call'.format(results['bare_ms_per_call']))
+    print('pooled session    : {:.3f} ms/call'.format(results['pooled_ms_per_call']))
+    print('speedup           : {:.2f}x'.format(results['speedup']))
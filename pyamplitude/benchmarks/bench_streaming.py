@@ -0,0 +1,80 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Peak memory of get_user_activity against iter_user_activity on a large
+    synthetic User Activity response served by a local stub server.
+
+    get_user_activity   Body read in full, then json.loads: the body, its
+                        text and every event object are in memory at once.
+    iter_user_activity  Body parsed as it is received, events counted and
+                        dropped one by one.
+
+    Peaks are measured with tracemalloc (Python allocations only).
+
+    Run with: python -m pyamplitude.benchmarks.bench_streaming [events]
+"""
+
+import sys
+import time
+import tracemalloc
+
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.benchmarks.stubserver import StubServer
+
+
+def synthetic_activity(events=100000):
+    """ A User Activity response with events events."""
+    return {'userData': {'user_id': 'user', 'num_events': events},
+            'events': [{'event_id': n,
+                        'event_type': 'event %d' % (n % 20),
+                        'event_time': '2017-08-01 00:00:00.000000',
+                        'event_properties': {'screen': 'home', 'position': n % 7},
+                        'user_properties': {'country': 'Spain', 'plan': 'free'}}
+                       for n in range(events)]}
+
+
+def _measure(function):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return result, peak / 1e6, elapsed * 1000.0
+
+
+def run(events=100000):
+    project = ProjectsHandler(project_name='bench', api_key='key', secret_key='secret')
+    server = StubServer(payload=synthetic_activity(events)).start()
+
+    try:
+        api = AmplitudeRestApi(project, show_logs=False, log_query_cost=False,
+                               api_url=server.url, cache=False)
+
+        def load():
+            return len(api.get_user_activity(user='user')['events'])
+
+        def stream():
+            return sum(1 for key, value in api.iter_user_activity(user='user') if key == 'events')
+
+        loaded, load_mb, load_ms = _measure(load)
+        streamed, stream_mb, stream_ms = _measure(stream)
+        api.close()
+    finally:
+        server.stop()
+
+    assert loaded == streamed == events
+
+    return {'events': events, 'bytes': len(server.httpd.body),
+            'load_peak_mb': load_mb, 'load_ms': load_ms,
+            'stream_peak_mb': stream_mb, 'stream_ms': stream_ms}
+
+
+if __name__ == '__main__':
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    results = run(events)
+    print('{} events, {:.1f} MB'.format(results['events'], results['bytes'] / 1e6))
+    print('get_user_activity  : peak {:.1f} MB, {:.0f} ms'.format(results['load_peak_mb'], results['load_ms']))
+    print('iter_user_activity : peak {:.1f} MB, {:.0f} ms'.format(results['stream_peak_mb'], results['stream_ms']))
@@ -0,0 +1,274 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" A local mock of the Amplitude endpoints used by pyamplitude.
+
+    Dashboard REST (api/2/<endpoint>), realtime (api/2/realtime), export
+    (api/2/export, a zip of gzipped JSON files, one per hour) and the
+    behavioral cohorts api (api/3/cohorts, api/3/cohorts/<id>,
+    api/3/cohorts/upload), with synthetic payloads of configurable size,
+    artificial latency and injected 429 responses.
+
+    Usage:
+
+        with MockAmplitudeServer(labels=10, days=30, latency=0.005,
+                                 throttle_rate=0.1) as server:
+            api = AmplitudeRestApi(..., api_url=server.rest_url)
+            export = AmplitudeExportApi(...)
+            export.api_url = server.export_url
+"""
+
+import gzip
+import io
+import random
+import threading
+import time
+import zipfile
+import simplejson as json
+from datetime import datetime, timedelta
+
+try:
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import urlsplit, parse_qsl
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler
+    from urlparse import urlsplit, parse_qsl
+
+from .stubserver import _ThreadingHTTPServer
+
+REST_PREFIX = '/api/2/'
+COHORTS_PREFIX = '/api/3/cohorts'
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._answer('GET', b'')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self._answer('POST', self.rfile.read(length))
+
+    def _answer(self, method, body):
+        status, content_type, payload, headers = self.server.mock.respond(method, self.path, body)
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockAmplitudeServer(object):
+    """ Args:
+            labels (optional)          Series of the time-series responses
+            (default: 10).
+            days (optional)            Days of the time-series responses, when
+            the request has no start/end (default: 30).
+            events_per_hour (optional) Events of each hourly export file, and
+            of User Activity responses (default: 100).
+            cohort_size (optional)     Members of the exported cohorts
+            (default: 1000).
+            latency (optional)         Seconds slept before answering each
+            request (default: 0).
+            throttle_rate (optional)   Fraction of the requests answered with
+            429 and Retry-After: 0 (default: 0).
+            seed (optional)            Seed of the payloads and of the 429
+            injection.
+            empty_hours (optional)     Export hours (YYYYMMDDTHH) without
+            data; exports of only such hours are answered with 404.
+
+        Counters:
+            requests_served   Requests answered, throttled ones included.
+            throttled         Requests answered with 429.
+            uploaded_ids      Ids received by cohort uploads.
+    """
+
+    def __init__(self, labels=10, days=30, events_per_hour=100, cohort_size=1000,
+                 latency=0.0, throttle_rate=0.0, seed=0, empty_hours=(), host='127.0.0.1', port=0):
+
+        self.labels = labels
+        self.days = days
+        self.events_per_hour = events_per_hour
+        self.cohort_size = cohort_size
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.seed = seed
+        self.empty_hours = set(empty_hours)
+
+        self.requests_served = 0
+        self.throttled = 0
+        self.uploaded_ids = 0
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._export_archives = {}
+
+        self.httpd = _ThreadingHTTPServer((host, port), _MockHandler)
+        self.httpd.mock = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    @property
+    def rest_url(self):
+        return self.url + REST_PREFIX
+
+    @property
+    def export_url(self):
+        return self.url + REST_PREFIX + 'export'
+
+    @property
+    def cohorts_url(self):
+        return self.url + COHORTS_PREFIX
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def respond(self, method, path, body):
+        """ Returns (status, content type, payload bytes, headers)."""
+        url = urlsplit(path)
+        params = dict(parse_qsl(url.query))
+
+        with self._lock:
+            self.requests_served += 1
+            throttle = self._random.random() < self.throttle_rate
+            if throttle:
+                self.throttled += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if throttle:
+            return 429, 'application/json', b'{"error": "throttled"}', {'Retry-After': '0'}
+
+        if url.path == REST_PREFIX + 'export':
+            return self._export(params)
+
+        if url.path.startswith(COHORTS_PREFIX):
+            return self._cohorts(method, url.path[len(COHORTS_PREFIX):], body)
+
+        if url.path.startswith(REST_PREFIX):
+            return self._json(self._rest(url.path[len(REST_PREFIX):], params))
+
+        return self._json({'error': 'not found'}, 404)
+
+    @staticmethod
+    def _json(payload, status=200):
+        return status, 'application/json', json.dumps(payload).encode('utf-8'), {}
+
+    def _rest(self, endpoint, params):
+        if endpoint == 'realtime':
+            minutes = ['{:02d}:{:02d}'.format(n // 12, n % 12 * 5) for n in range(288)]
+            return {'data': {'series': [[n % 97 for n in range(288)], [n % 89 for n in range(288)]],
+                             'seriesLabels': ['Today', 'Yesterday'],
+                             'xValues': minutes}}
+
+        if endpoint == 'useractivity':
+            return {'userData': {'user_id': params.get('user')},
+                    'events': [{'event_id': n, 'event_type': 'event %d' % (n % 20)}
+                               for n in range(self.events_per_hour)]}
+
+        x_values = self._x_values(params)
+        rng = random.Random('{}/{}/{}'.format(self.seed, endpoint, len(x_values)))
+
+        return {'data': {'series': [[rng.randint(0, 100000) for _ in x_values]
+                                    for _ in range(self.labels)],
+                         'seriesLabels': [[0, 'label %d' % n] for n in range(self.labels)],
+                         'xValues': x_values}}
+
+    def _x_values(self, params):
+        try:
+            start = datetime.strptime(params['start'], '%Y%m%d')
+            end = datetime.strptime(params['end'], '%Y%m%d')
+        except (KeyError, ValueError):
+            start = datetime(2017, 1, 1)
+            end = start + timedelta(days=self.days - 1)
+
+        return [(start + timedelta(days=n)).strftime('%Y-%m-%d')
+                for n in range((end - start).days + 1)]
+
+    def _export(self, params):
+        key = (params.get('start'), params.get('end'))
+
+        with self._lock:
+            archive = self._export_archives.get(key)
+
+        if archive is None:
+            archive = self.export_archive(*key)
+            with self._lock:
+                self._export_archives[key] = archive
+
+        if archive is None:
+            return self._json({'error': 'no data'}, 404)
+
+        return 200, 'application/zip', archive, {}
+
+    def export_archive(self, start, end):
+        """ A zip archive of one gzipped JSON-lines file per hour between
+            start and end (YYYYMMDDTHH), as returned by the export api, None
+            if all those hours are empty."""
+        first = datetime.strptime(start, '%Y%m%dT%H')
+        last = datetime.strptime(end, '%Y%m%dT%H')
+        buffer = io.BytesIO()
+        written = 0
+
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+            hour = first
+            while hour <= last:
+                if hour.strftime('%Y%m%dT%H') in self.empty_hours:
+                    hour += timedelta(hours=1)
+                    continue
+                lines = [json.dumps({'event_id': n,
+                                     'event_type': 'event %d' % (n % 20),
+                                     'event_time': hour.strftime('%Y-%m-%d %H:') + '00:00.000000',
+                                     'user_id': 'user %d' % (n % 500),
+                                     'event_properties': {'position': n % 7}})
+                         for n in range(self.events_per_hour)]
+                name = '123/123_{}#0.json.gz'.format(hour.strftime('%Y-%m-%d_%H'))
+                archive.writestr(name, gzip.compress(('\n'.join(lines) + '\n').encode('utf-8')))
+                written += 1
+                hour += timedelta(hours=1)
+
+        return buffer.getvalue() if written else None
+
+    def _cohorts(self, method, path, body):
+        if method == 'POST' and path == '/upload':
+            ids = json.loads(body.decode('utf-8')).get('ids', [])
+            with self._lock:
+                self.uploaded_ids += len(ids)
+            return self._json({'cohort_id': 'mock%d' % len(ids)})
+
+        if path in ['', '/']:
+            return self._json({'cohorts': [{'id': 'mock%d' % n, 'name': 'cohort %d' % n,
+                                            'size': self.cohort_size} for n in range(10)]})
+
+        cohort_id = path.strip('/')
+
+        return self._json({'cohort': {'id': cohort_id, 'size': self.cohort_size},
+                           'user_ids': ['user %d' % n for n in range(self.cohort_size)],
+                           'amplitude_ids': list(range(self.cohort_size))})
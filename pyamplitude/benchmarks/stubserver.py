@@ -0,0 +1,114 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import threading
+import simplejson as json
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlsplit, parse_qsl
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlsplit, parse_qsl
+
+DEFAULT_PAYLOAD = {'data': {'series': [[1, 2, 3]],
+                            'seriesLabels': [0],
+                            'xValues': ['2017-08-14', '2017-08-15', '2017-08-16']}}
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """ Answers every GET with the server payload, keeping the connection
+        open (HTTP/1.1) so clients can reuse it."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections_accepted += 1
+
+    def do_GET(self):
+        self.server.requests_served += 1
+        status = 200
+        headers = {}
+        body = self.server.body
+
+        if self.server.responder is not None:
+            url = urlsplit(self.path)
+            payload = self.server.responder(url.path, parse_qsl(url.query))
+            if isinstance(payload, tuple):
+                response = payload
+                status, payload = response[0], response[1]
+                headers = response[2] if len(response) > 2 else {}
+            body = json.dumps(payload).encode('utf-8')
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(object):
+    """ A local HTTP server answering with a fixed JSON payload, or with the
+        payload returned by responder(path, params) when one is given. A
+        responder may also return a (status, payload) or a
+        (status, payload, headers) tuple.
+
+        Usage:
+
+            with StubServer() as server:
+                api = AmplitudeRestApi(..., api_url=server.url)
+    """
+
+    def __init__(self, payload=None, responder=None, host='127.0.0.1', port=0):
+        self.httpd = _ThreadingHTTPServer((host, port), _StubHandler)
+        payload = DEFAULT_PAYLOAD if payload is None else payload
+        self.httpd.body = json.dumps(payload).encode('utf-8')
+        self.httpd.requests_served = 0
+        self.httpd.connections_accepted = 0
+        self.httpd.lock = threading.Lock()
+        self.httpd.responder = responder
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://{}:{}/'.format(host, port)
+
+    @property
+    def requests_served(self):
+        return self.httpd.requests_served
+
+    @property
+    def connections_accepted(self):
+        """ TCP connections accepted, one per client connection kept alive."""
+        return self.httpd.connections_accepted
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,279 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Offline benchmark suite, run against a MockAmplitudeServer.
+
+    Scenarios:
+
+        make_request      Uncached AmplitudeRestApi._make_request calls.
+        cache_hit         Calls answered by the response cache.
+        throttled         Uncached calls with 429 responses injected and
+                          retried.
+        realtime          get_realtime_active_users.
+        export_decode     AmplitudeExportApi.get_all_events_data of a day
+                          (24 hourly files), download and extraction.
+        cohort_download   BehavioralCohortsApi.get_cohort.
+        cohort_upload     BehavioralCohortsApi.upload_cohort_from_ids.
+
+    Every scenario reports its calls, throughput (calls per second) and
+    mean/p50/p99 latencies in milliseconds. Results can be written as JSON
+    and compared with a previous run to catch regressions:
+
+        python -m pyamplitude.benchmarks.suite --json baseline.json
+        python -m pyamplitude.benchmarks.suite --compare baseline.json
+
+    --compare exits with status 1 if the p50 latency of a scenario grew by
+    more than --tolerance (default: 0.25, i.e. 25%).
+"""
+
+import argparse
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import simplejson as json
+
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.exportapi import AmplitudeExportApi
+from pyamplitude.behavioralcohortsapi import BehavioralCohortsApi
+from pyamplitude.retry import RetryPolicy
+from pyamplitude.benchmarks.mockserver import MockAmplitudeServer
+
+SCENARIOS = ['make_request', 'cache_hit', 'throttled', 'realtime',
+             'export_decode', 'cohort_download', 'cohort_upload']
+
+DEFAULT_TOLERANCE = 0.25
+
+
+def percentile(samples, q):
+    """ q-th percentile (0-100) of samples, nearest rank."""
+    if not samples:
+        return 0.0
+
+    ordered = sorted(samples)
+    rank = int(round(q / 100.0 * (len(ordered) - 1)))
+
+    return ordered[rank]
+
+
+def summarize(samples, elapsed):
+    """ Summary of a list of per-call durations in seconds."""
+    return {'calls': len(samples),
+            'throughput_per_sec': len(samples) / elapsed if elapsed else 0.0,
+            'mean_ms': 1000.0 * sum(samples) / len(samples) if samples else 0.0,
+            'p50_ms': 1000.0 * percentile(samples, 50),
+            'p99_ms': 1000.0 * percentile(samples, 99)}
+
+
+def _time_calls(function, calls):
+    samples = []
+    started = time.perf_counter()
+
+    for n in range(calls):
+        call_started = time.perf_counter()
+        function(n)
+        samples.append(time.perf_counter() - call_started)
+
+    return summarize(samples, time.perf_counter() - started)
+
+
+class Suite(object):
+    """ Runs the scenarios against mock servers built from the options.
+
+        Args:
+            calls (optional)          Calls per scenario (default: 200).
+            labels, days (optional)   Size of the time-series responses.
+            events_per_hour           Events of each hourly export file.
+            cohort_size               Members of downloaded and uploaded
+                                      cohorts.
+            latency (optional)        Latency added by the server, seconds.
+            throttle_rate (optional)  429 rate of the 'throttled' scenario.
+    """
+
+    def __init__(self, calls=200, labels=10, days=30, events_per_hour=100,
+                 cohort_size=1000, latency=0.0, throttle_rate=0.2):
+
+        self.calls = calls
+        self.options = {'labels': labels, 'days': days, 'events_per_hour': events_per_hour,
+                        'cohort_size': cohort_size, 'latency': latency}
+        self.throttle_rate = throttle_rate
+        self.project = ProjectsHandler(project_name='bench', api_key='key', secret_key='secret')
+
+    def run(self, scenarios=SCENARIOS):
+        results = {}
+
+        for name in scenarios:
+            throttle_rate = self.throttle_rate if name == 'throttled' else 0.0
+
+            with MockAmplitudeServer(throttle_rate=throttle_rate, **self.options) as server:
+                results[name] = getattr(self, 'bench_' + name)(server)
+
+        return {'version': _version(),
+                'python': platform.python_version(),
+                'options': dict(self.options, calls=self.calls, throttle_rate=self.throttle_rate),
+                'results': results}
+
+    def _rest_api(self, server, **kwargs):
+        return AmplitudeRestApi(self.project, show_logs=False, log_query_cost=False,
+                                api_url=server.rest_url, **kwargs)
+
+    def bench_make_request(self, server):
+        api = self._rest_api(server, cache=False)
+        url = api.api_url + 'events/segmentation'
+        result = _time_calls(lambda n: api._make_request(url, [('e', str(n))]), self.calls)
+        api.close()
+
+        return result
+
+    def bench_cache_hit(self, server):
+        api = self._rest_api(server)
+        url = api.api_url + 'events/segmentation'
+        api._make_request(url, [('e', 'cached')])
+        result = _time_calls(lambda n: api._make_request(url, [('e', 'cached')]), self.calls)
+        api.close()
+
+        return result
+
+    def bench_throttled(self, server):
+        policy = RetryPolicy(base_delay=0.001, max_attempts=10)
+        api = self._rest_api(server, cache=False, retry_policy=policy)
+        url = api.api_url + 'events/segmentation'
+        result = _time_calls(lambda n: api._make_request(url, [('e', str(n))]), self.calls)
+        api.close()
+
+        result['retries'] = policy.retries
+
+        return result
+
+    def bench_realtime(self, server):
+        api = self._rest_api(server, cache=False)
+        result = _time_calls(lambda n: api.get_realtime_active_users(), self.calls)
+        api.close()
+
+        return result
+
+    def bench_export_decode(self, server):
+        export = AmplitudeExportApi(self.project, show_logs=False)
+        export.api_url = server.export_url
+        calls = max(1, self.calls // 20)
+
+        # get_all_events_data extracts the archive in the working directory.
+        directory = tempfile.mkdtemp()
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            result = _time_calls(lambda n: export.get_all_events_data('20170801T00', '20170801T23'), calls)
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(directory)
+
+        size = len(server.export_archive('20170801T00', '20170801T23'))
+        result['archive_bytes'] = size
+        result['mb_per_sec'] = size * result['throughput_per_sec'] / 1e6
+
+        return result
+
+    def bench_cohort_download(self, server):
+        cohorts = BehavioralCohortsApi(self.project)
+        cohorts.api_url = server.cohorts_url
+
+        return _time_calls(lambda n: cohorts.get_cohort('mock' + str(n)), self.calls)
+
+    def bench_cohort_upload(self, server):
+        cohorts = BehavioralCohortsApi(self.project)
+        cohorts.api_url = server.cohorts_url
+        ids = list(range(self.options['cohort_size']))
+
+        def upload(n):
+            if not cohorts.upload_cohort_from_ids(name='bench %d' % n, app_id=123, id_type='BY_AMP_ID',
+                                                  ids=ids, owner='bench@example.com'):
+                raise RuntimeError('Pyamplitude Error: cohort upload failed')
+
+        return _time_calls(upload, self.calls)
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """ Returns a list of (scenario, baseline p50, current p50, ratio,
+        regressed) for the scenarios present in both runs."""
+    rows = []
+
+    for name, current in sorted(results['results'].items()):
+        previous = baseline['results'].get(name)
+        if previous is None or not previous['p50_ms']:
+            continue
+
+        ratio = current['p50_ms'] / previous['p50_ms']
+        rows.append((name, previous['p50_ms'], current['p50_ms'], ratio, ratio > 1 + tolerance))
+
+    return rows
+
+
+def _version():
+    try:
+        from pkg_resources import get_distribution
+        return get_distribution('pyamplitude').version
+    except Exception:
+        return 'unknown'
+
+
+def _print_results(results):
+    print('{:<16} {:>8} {:>12} {:>10} {:>10} {:>10}'.format(
+        'scenario', 'calls', 'calls/sec', 'mean ms', 'p50 ms', 'p99 ms'))
+
+    for name in SCENARIOS:
+        if name not in results['results']:
+            continue
+        r = results['results'][name]
+        print('{:<16} {:>8} {:>12.1f} {:>10.3f} {:>10.3f} {:>10.3f}'.format(
+            name, r['calls'], r['throughput_per_sec'], r['mean_ms'], r['p50_ms'], r['p99_ms']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='pyamplitude offline benchmarks')
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--labels', type=int, default=10)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--events-per-hour', type=int, default=100)
+    parser.add_argument('--cohort-size', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.0, help='server latency, in seconds')
+    parser.add_argument('--throttle-rate', type=float, default=0.2)
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                        help='run only this scenario (repeatable)')
+    parser.add_argument('--json', metavar='PATH', help='write the results as JSON ("-" for stdout)')
+    parser.add_argument('--compare', metavar='PATH', help='baseline JSON results to compare with')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    suite = Suite(calls=args.calls, labels=args.labels, days=args.days,
+                  events_per_hour=args.events_per_hour, cohort_size=args.cohort_size,
+                  latency=args.latency, throttle_rate=args.throttle_rate)
+    results = suite.run(args.scenario or SCENARIOS)
+
+    if args.json == '-':
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        _print_results(results)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+        regressed = False
+        for name, before, after, ratio, slower in compare(results, baseline, args.tolerance):
+            print('{:<16} p50 {:.3f} ms -> {:.3f} ms ({:+.0f}%){}'.format(
+                name, before, after, (ratio - 1) * 100, '  REGRESSION' if slower else ''))
+            regressed = regressed or slower
+
+        return 1 if regressed else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
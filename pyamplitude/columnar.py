@@ -0,0 +1,248 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Columnar decoding of time-series responses into NumPy arrays.
+
+    NumPy (and pandas, for to_dataframe) are optional dependencies, imported
+    on first use.
+"""
+
+import re
+from .lazyimport import LazyModule
+
+json = LazyModule('simplejson')
+
+SERIES = 'series'
+RETENTION = 'retention'
+LTV = 'ltv'
+
+ENDPOINT_KINDS = {'users': SERIES,
+                  'events/segmentation': SERIES,
+                  'revenue/day': SERIES,
+                  'sessions/average': SERIES,
+                  'sessions/peruser': SERIES,
+                  'retention': RETENTION,
+                  'revenue/ltv': LTV}
+
+LABEL_KEYS = ('seriesLabels', 'seriesMeta')
+
+_SERIES_START = re.compile(r'"series"\s*:\s*\[')
+_SERIES_END = re.compile(r'\]\s*\]')
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('Pyamplitude Error: columnar results require numpy, '
+                          'install it with: pip install "pyamplitude[numpy]"')
+    return numpy
+
+
+def _pandas():
+    try:
+        import pandas
+    except ImportError:
+        raise ImportError('Pyamplitude Error: DataFrame results require pandas, '
+                          'install it with: pip install "pyamplitude[pandas]"')
+    return pandas
+
+
+class ColumnarResult(object):
+    """ A time-series response decoded into arrays.
+
+        Attributes:
+            index     datetime64[D] array of the dates (xValues), datetime64[s]
+                      for hourly or minute intervals, or an object array of
+                      the xValues that are not dates (histogram buckets).
+            labels    List of series labels (seriesLabels / seriesMeta).
+            values    Array of shape (labels, dates) or, for retention and
+                      revenue LTV, (labels, dates, columns).
+            columns   Names of the last axis of 3-dimensional values: 'outof'
+                      followed by the retention day numbers, or the LTV
+                      metrics ('r1d', ..., 'count', 'paid', 'total_amount').
+    """
+
+    def __init__(self, index, labels, values, columns=None):
+        self.index = index
+        self.labels = labels
+        self.values = values
+        self.columns = columns
+
+    def __repr__(self):
+        return 'ColumnarResult(labels={}, dates={}, shape={})'.format(
+            len(self.labels), len(self.index), self.values.shape)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.index.nbytes
+
+    def to_dataframe(self):
+        """ A DataFrame indexed by date (or histogram bucket), with one
+            column per label (or one (label, column) pair per column for
+            3-dimensional values)."""
+        pandas = _pandas()
+        if self.index.dtype.kind == 'M':
+            index = pandas.DatetimeIndex(self.index, name='date')
+        else:
+            index = pandas.Index(self.index, name='bucket')
+        labels = [_label_name(label) for label in self.labels]
+
+        if self.values.ndim == 2:
+            return pandas.DataFrame(self.values.T, index=index, columns=labels)
+
+        n_labels, n_dates, n_columns = self.values.shape
+        columns = pandas.MultiIndex.from_product([labels, self.columns], names=['label', 'column'])
+        values = self.values.transpose(1, 0, 2).reshape(n_dates, n_labels * n_columns)
+
+        return pandas.DataFrame(values, index=index, columns=columns)
+
+
+def kind_for_endpoint(endpoint):
+    return ENDPOINT_KINDS.get(endpoint)
+
+
+def decode(response, kind=SERIES):
+    """ Decode a parsed JSON response into a ColumnarResult."""
+    if kind == RETENTION:
+        return _decode_retention(response['data'])
+    elif kind == LTV:
+        return _decode_ltv(response['data'])
+
+    numpy = _numpy()
+    data = response['data']
+
+    return ColumnarResult(_dates(data['xValues']), _labels(data),
+                          numpy.asarray(data['series'], dtype=numpy.float64))
+
+
+def decode_text(text, kind=SERIES):
+    """ Decode a raw JSON response body into a ColumnarResult.
+
+        For xValues/series responses the numeric series block is parsed by
+        NumPy directly from the text, no Python object is built per value.
+        Other responses, or series containing nulls, go through decode.
+    """
+    if kind == SERIES:
+        result = _decode_series_text(text)
+        if result is not None:
+            return result
+
+    return decode(json.loads(text), kind)
+
+
+def _decode_series_text(text):
+    numpy = _numpy()
+    start = _SERIES_START.search(text)
+
+    if start is None:
+        return None
+
+    end = _SERIES_END.search(text, start.end())
+    block_start = start.end() - 1
+
+    if end is None or '"' in text[block_start:end.start()]:
+        return None
+
+    block_end = end.end()
+    block = text[block_start + 1:block_end - 1]
+
+    # The rest of the response (xValues, labels...) is small: parse it with
+    # an empty series in place of the numeric block.
+    data = json.loads(text[:block_start] + '[]' + text[block_end:])['data']
+    n_rows = block.count('[')
+    n_columns = len(data['xValues'])
+
+    try:
+        values = numpy.array(block.replace('[', ' ').replace(']', ' ').replace(',', ' ').split(),
+                             dtype=numpy.float64)
+    except ValueError:
+        return None
+
+    if values.size != n_rows * n_columns:
+        return None
+
+    return ColumnarResult(_dates(data['xValues']), _labels(data),
+                          values.reshape(n_rows, n_columns))
+
+
+def _decode_retention(data):
+    """ series: [{"dates": [...], "values": {date: [{"count", "outof"}...]}}]"""
+    numpy = _numpy()
+    series = data['series']
+    dates = series[0]['dates'] if series else []
+    n_days = max([len(days) for s in series for days in s['values'].values()] or [0])
+    values = numpy.zeros((len(series), len(dates), n_days + 1))
+
+    for s, segment in enumerate(series):
+        for d, day in enumerate(dates):
+            cells = segment['values'].get(day, [])
+            if cells:
+                values[s, d, 0] = cells[0].get('outof', 0)
+            values[s, d, 1:len(cells) + 1] = [cell.get('count', 0) for cell in cells]
+
+    return ColumnarResult(_dates(dates), _labels(data), values,
+                          columns=['outof'] + list(range(n_days)))
+
+
+def _decode_ltv(data):
+    """ series: [{"dates": [...], "values": {date: {"r1d": ..., "count": ...}}}]"""
+    numpy = _numpy()
+    series = data['series']
+    dates = series[0]['dates'] if series else []
+    columns = []
+
+    for segment in series:
+        for metrics in segment['values'].values():
+            for name in metrics:
+                if name not in columns:
+                    columns.append(name)
+
+    columns.sort(key=_ltv_column_order)
+    position = dict((name, n) for n, name in enumerate(columns))
+    values = numpy.zeros((len(series), len(dates), len(columns)))
+
+    for s, segment in enumerate(series):
+        for d, day in enumerate(dates):
+            for name, value in segment['values'].get(day, {}).items():
+                values[s, d, position[name]] = value or 0
+
+    return ColumnarResult(_dates(dates), _labels(data), values, columns=columns)
+
+
+def _ltv_column_order(name):
+    """ r1d, r2d, ..., r90d first, in day order, then the other metrics."""
+    if name.startswith('r') and name.endswith('d') and name[1:-1].isdigit():
+        return (0, int(name[1:-1]), name)
+
+    return (1, 0, name)
+
+
+def _dates(x_values):
+    """ Days, or seconds when the xValues have a time (hourly and minute
+        intervals). xValues that are not dates, such as the '0-1' buckets
+        of histograms, are kept as they are."""
+    numpy = _numpy()
+
+    try:
+        if any(len(x_value) > 10 for x_value in x_values):
+            return numpy.array([x_value.replace(' ', 'T') for x_value in x_values], dtype='datetime64[s]')
+
+        return numpy.array(x_values, dtype='datetime64[D]')
+    except (TypeError, ValueError):
+        return numpy.array(x_values, dtype=object)
+
+
+def _labels(data):
+    for key in LABEL_KEYS:
+        if key in data:
+            return data[key]
+
+    return list(range(len(data.get('series', []))))
+
+
+def _label_name(label):
+    if isinstance(label, (list, dict)):
+        return json.dumps(label)
+
+    return label
@@ -0,0 +1,220 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .amplituderestapi import USER_ENDPOINTS_CONCURRENCY
+from .ratelimiter import QueryRateLimiter
+from .lazyimport import LazyModule
+
+json = LazyModule('simplejson')
+
+MAX_PAGE_SIZE = 1000
+DONE = 'done'
+
+
+class CrawlCheckpoint(object):
+    """ Progress of a crawl, appended to a text file so that an interrupted
+        crawl can be resumed.
+
+        Each line records the next offset of a user ('<id> <offset>'), or that
+        the user is complete ('<id> done'). A page is recorded once all its
+        events were written to the sink, so after a crash at most the pages
+        being written are written again.
+
+        Args:
+            path (required)   Checkpoint file, created if missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._progress = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) == 2:
+                        self._progress[fields[0]] = fields[1] if fields[1] == DONE else int(fields[1])
+
+        self._file = open(path, 'a')
+
+    def offset(self, user):
+        """ Offset to resume user from, None if the user is complete."""
+        progress = self._progress.get(str(user), 0)
+
+        return None if progress == DONE else progress
+
+    def advance(self, user, offset):
+        self._record(user, offset)
+
+    def done(self, user):
+        self._record(user, DONE)
+
+    def _record(self, user, progress):
+        with self._lock:
+            self._progress[str(user)] = progress
+            self._file.write(str(user) + ' ' + str(progress) + '\n')
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class JsonLinesSink(object):
+    """ Sink writing every member as a JSON line:
+        {"user": <id>, "userData": {...}} or {"user": <id>, "event": {...}}.
+
+        Args:
+            path (required)   Output file, appended to.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'a')
+        self._lock = threading.Lock()
+
+    def __call__(self, user, key, value):
+        name = 'event' if key == 'events' else key
+        line = json.dumps({'user': user, name: value}) + '\n'
+
+        with self._lock:
+            self._file.write(line)
+
+    def close(self):
+        self._file.close()
+
+
+class UserActivityCrawler(object):
+    """ Dumps the User Activity of many users, paging through each user's
+        events with offset/limit.
+
+        Users are crawled by a pool of concurrency workers (5, Amplitude's
+        limit on concurrent User Activity requests), each sending one request
+        at a time, so exactly that many requests are in flight. Responses are
+        streamed (see AmplitudeRestApi.iter_user_activity) into the sink and
+        never cached, so memory use does not grow with the number of users or
+        events.
+
+        Every request is debited from the api's rate_limiter, or, when the api
+        has none, from a QueryRateLimiter of the crawler (360 User Activity
+        queries per hour, waiting when exhausted).
+
+        Args:
+            api (required)            An AmplitudeRestApi.
+            sink (required)           Callable receiving sink(user, key,
+            value) for the ('userData', {...}) member of each user and every
+            ('events', event) member; called from the worker threads, so it
+            must be thread safe (see JsonLinesSink).
+            checkpoint (optional)     A CrawlCheckpoint, or the path of one:
+            complete users are skipped and partial ones resumed at their last
+            recorded page.
+            page_size (optional)      Events per request (default and
+            maximum: 1000).
+            concurrency (optional)    Requests in flight (default: 5).
+            rate_limiter (optional)   Limiter used when the api has none.
+
+        Usage:
+
+            sink = JsonLinesSink('activity.jsonl')
+            crawler = UserActivityCrawler(api, sink, checkpoint='activity.checkpoint')
+            crawler.run(amplitude_ids)
+            crawler.failed   # {amplitude_id: exception}, retried on resume
+    """
+
+    def __init__(self, api, sink, checkpoint=None, page_size=MAX_PAGE_SIZE,
+                 concurrency=USER_ENDPOINTS_CONCURRENCY, rate_limiter=None):
+
+        if not 0 < page_size <= MAX_PAGE_SIZE:
+            raise ValueError('Pyamplitude Error: UserActivityCrawler: page_size must be between 1 and 1000')
+
+        if not 0 < concurrency <= USER_ENDPOINTS_CONCURRENCY:
+            raise ValueError('Pyamplitude Error: UserActivityCrawler: concurrency must be between 1 and 5')
+
+        if isinstance(checkpoint, str):
+            checkpoint = CrawlCheckpoint(checkpoint)
+
+        if api.rate_limiter is None and rate_limiter is None:
+            rate_limiter = QueryRateLimiter()
+
+        self.api = api
+        self.sink = sink
+        self.checkpoint = checkpoint
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.rate_limiter = rate_limiter if api.rate_limiter is None else None
+
+        self.users = 0
+        self.skipped = 0
+        self.pages = 0
+        self.events = 0
+        self.failed = {}
+        self._lock = threading.Lock()
+
+    def run(self, amplitude_ids):
+        """ Crawl every user of amplitude_ids (any iterable, consumed as
+            workers free up). Failed users are collected in failed. Returns
+            stats()."""
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            pending = {}
+
+            for user in amplitude_ids:
+                offset = self.checkpoint.offset(user) if self.checkpoint is not None else 0
+                if offset is None:
+                    self.skipped += 1
+                    continue
+
+                if len(pending) >= self.concurrency:
+                    self._collect(pending, wait(pending, return_when=FIRST_COMPLETED)[0])
+
+                pending[pool.submit(self._crawl_user, user, offset)] = user
+
+            self._collect(pending, wait(pending)[0])
+
+        return self.stats()
+
+    def stats(self):
+        return {'users': self.users,
+                'skipped': self.skipped,
+                'failed': len(self.failed),
+                'pages': self.pages,
+                'events': self.events}
+
+    def _collect(self, pending, completed):
+        for future in completed:
+            user = pending.pop(future)
+            try:
+                future.result()
+            except Exception as e:
+                self.failed[user] = e
+            else:
+                self.users += 1
+
+    def _crawl_user(self, user, offset):
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire('useractivity', 1)
+
+            events = 0
+            for key, value in self.api.iter_user_activity(user=user, offset=offset, limit=self.page_size):
+                if key == 'events':
+                    events += 1
+                elif offset != 0:
+                    # userData is repeated on every page.
+                    continue
+                self.sink(user, key, value)
+
+            offset += events
+
+            with self._lock:
+                self.pages += 1
+                self.events += events
+
+            if events < self.page_size:
+                if self.checkpoint is not None:
+                    self.checkpoint.done(user)
+                return
+
+            if self.checkpoint is not None:
+                self.checkpoint.advance(user, offset)
@@ -0,0 +1,134 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from .lazyimport import LazyModule
+
+json = LazyModule('simplejson')
+
+HISTORICAL_TTL_SEC = 30 * 24 * 3600
+RECENT_TTL_SEC = 10 * 60
+SETTLE_DAYS = 3
+
+
+class DiskCache(object):
+    """ A persistent SQLite cache for date-ranged API responses.
+
+        Data for a date range stops changing once the range is a few days in
+        the past, so responses whose end date is at least settle_days before
+        today are kept for historical_ttl seconds, while ranges touching the
+        last days are kept for recent_ttl seconds only. Requests without an
+        end date (realtime, event list, annotations...) are never persisted.
+
+        Args:
+            path (required)            SQLite database file, created if needed.
+            historical_ttl (optional)  TTL in seconds of closed ranges
+            (default: 30 days).
+            recent_ttl (optional)      TTL in seconds of ranges touching the
+            last settle_days days (default: 10 minutes).
+            settle_days (optional)     Number of days after which a day is
+            considered closed (default: 3).
+
+        Keys are the sha256 of the canonical JSON of project, endpoint and
+        params (see make_key), so a warm restart re-uses every closed range.
+    """
+
+    def __init__(self, path, historical_ttl=HISTORICAL_TTL_SEC, recent_ttl=RECENT_TTL_SEC,
+                 settle_days=SETTLE_DAYS, today=date.today, timer=time.time):
+
+        self.path = path
+        self.historical_ttl = historical_ttl
+        self.recent_ttl = recent_ttl
+        self.settle_days = settle_days
+        self.today = today
+        self.timer = timer
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS responses '
+                                     '(key TEXT PRIMARY KEY, expires_at REAL, body TEXT)')
+
+    @staticmethod
+    def make_key(project, endpoint, params):
+        """ Canonical hash of a request.
+
+            Params are ordered by name (repeated names keep their relative
+            order) so equivalent requests built in a different order share
+            the same key.
+        """
+        params = sorted([list(p) for p in params or []], key=lambda p: p[0])
+        canonical = json.dumps([project, endpoint, params], sort_keys=True,
+                               separators=(',', ':'))
+
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def ttl_for(self, params):
+        """ TTL in seconds for a request with the given params, 0 if the
+            response should not be persisted."""
+        end = dict(params or []).get('end')
+
+        if end is None:
+            return 0
+
+        try:
+            end = datetime.strptime(str(end), "%Y%m%d").date()
+        except ValueError:
+            return 0
+
+        if end <= self.today() - timedelta(days=self.settle_days):
+            return self.historical_ttl
+
+        return self.recent_ttl
+
+    def get(self, key):
+        """ Return the cached response for key, or None."""
+        with self._lock:
+            row = self._connection.execute('SELECT expires_at, body FROM responses WHERE key = ?',
+                                           (key,)).fetchone()
+
+            if row is None or row[0] <= self.timer():
+                self.misses += 1
+                return None
+
+            self.hits += 1
+
+        return json.loads(row[1])
+
+    def set(self, key, data, params):
+        """ Persist a parsed response if its date range allows it."""
+        ttl = self.ttl_for(params)
+
+        if ttl <= 0:
+            return
+
+        body = json.dumps(data)
+
+        with self._lock, self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?)',
+                                     (key, self.timer() + ttl, body))
+
+    def purge_expired(self):
+        """ Delete expired responses, returns the number of deleted rows."""
+        with self._lock, self._connection:
+            cursor = self._connection.execute('DELETE FROM responses WHERE expires_at <= ?',
+                                              (self.timer(),))
+
+        return cursor.rowcount
+
+    def stats(self):
+        """ Return the cache counters as a dict."""
+        with self._lock:
+            entries = self._connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries}
+
+    def close(self):
+        self._connection.close()
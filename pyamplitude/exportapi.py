@@ -3,8 +3,23 @@
 
 
 import logging
+import os
 import sys
-import requests, zipfile, StringIO
+import tempfile
+import zipfile
+from .retry import RetryPolicy
+from .metrics import MetricsHook
+from .exportedevents import iter_archive
+from .lazyimport import LazyModule
+
+requests = LazyModule('requests')
+
+# Bytes read from the response at a time.
+CHUNK_SIZE = 1024 * 1024
+
+# Archives up to this size are spooled in memory, bigger ones to a temporary
+# file.
+SPOOL_SIZE = 16 * 1024 * 1024
 
 class AmplitudeExportApi(object):
     """ Export all event data for a given app that were uploaded within a
@@ -22,16 +37,32 @@ class AmplitudeExportApi(object):
         For more information please refer to:
         https://amplitude.zendesk.com/hc/en-us/articles/205406637-Export-API- \
         Export-Your-App-s-Event-Data#returns
+
+        The archive is never held in memory: it is written to disk as it is
+        received (download), spooled to a temporary file and decoded one
+        event at a time (iter_events), or spooled and extracted
+        (get_all_events_data).
+
+        An optional metrics hook (see metrics.py) receives the latency
+        (network, and decode for the archive extraction), bytes, responses
+        and retries of the 'export' endpoint.
     """
 
     ERROR_CODES = ['401','400','429','500']
 
-    def __init__(self, project_handler, show_logs):
+    def __init__(self, project_handler, show_logs, retry_policy=None, metrics=None):
 
         self.api_url         = 'https://amplitude.com/api/2/export'
         self.logger          = self._logger_config(show_logs)
         self.project_handler = project_handler
 
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+        elif retry_policy is False:
+            retry_policy = None
+        self.retry_policy    = retry_policy
+        self.metrics         = metrics if metrics is not None else MetricsHook()
+
     @staticmethod
     def _logger_config(show_logs):
         """A static method configuring logs"""
@@ -50,6 +81,30 @@ class AmplitudeExportApi(object):
 
 
 
+    def _get(self, url, **kwargs):
+        """ GET url, retried on 429 and 5xx according to retry_policy"""
+        labels = {'client': 'export', 'endpoint': 'export'}
+
+        def send():
+            response = requests.get(url,
+                                    auth=(self.project_handler.api_key,
+                                          self.project_handler.secret_key),
+                                    **kwargs)
+            if kwargs.get('stream') and response.status_code >= 400:
+                response.close()
+            self.metrics.increment('responses', status=response.status_code, **labels)
+            return response
+
+        def on_retry(status, delay):
+            self.metrics.increment('retries', status=status, **labels)
+            self.metrics.observe('backoff_seconds', delay, status=status, **labels)
+
+        with self.metrics.timer('latency_seconds', phase='network', **labels):
+            if self.retry_policy is None:
+                return send()
+
+            return self.retry_policy.call('export', send, on_retry=on_retry)
+
     def get_all_events_data(self, start, end):
         """ Get all events with a specific start and end date
 
@@ -69,15 +124,111 @@ class AmplitudeExportApi(object):
             time range during which no data has been collected for the project,
             then you will receive a 404 response from our server.
 
-        """
-        url = self.api_url + '?start=' + start + '&end=' + end
+            The archive is extracted to the current directory. To read the
+            events without extracting them, see iter_events.
 
-        response = requests.get(url,
-                                auth=(self.project_handler.api_key,
-                                      self.project_handler.secret_key),
-                                stream=True)
+        """
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+            self._download(start, end, spool)
+            spool.seek(0)
 
-        content = zipfile.ZipFile(StringIO.StringIO(response.content))
-        data = content.extractall()
+            with self.metrics.timer('latency_seconds', phase='decode', client='export', endpoint='export'):
+                content = zipfile.ZipFile(spool)
+                data = content.extractall()
 
         return True
+
+    def download(self, start, end, target):
+        """ Write the export archive of start..end (YYYYMMDDTHH) to target, a
+            path or a binary file, as it is received. Returns the number of
+            bytes written.
+
+            Raises:
+                requests.HTTPError if the export fails (404 if no data was
+                collected in the range).
+        """
+        if hasattr(target, 'write'):
+            return self._download(start, end, target)
+
+        with open(target, 'wb') as f:
+            return self._download(start, end, f)
+
+    def iter_events(self, start, end, spool_dir=None, spool_size=SPOOL_SIZE, workers=None):
+        """ Yield the events exported between start and end (YYYYMMDDTHH) as
+            dicts, in the order of the hourly files.
+
+            The archive is spooled as it is received, in memory up to
+            spool_size bytes and in a temporary file of spool_dir (default:
+            the system's) beyond. Its gzipped members are then decompressed
+            and parsed one line at a time, so memory use does not depend on
+            the size of the export. The request is sent on the first
+            iteration and the spool deleted when the generator is exhausted
+            or closed.
+
+            With workers (> 1), the archive is always written to a temporary
+            file and its members decoded by that many processes (see
+            exportdecode.py).
+
+            Raises:
+                requests.HTTPError if the export fails (404 if no data was
+                collected in the range).
+        """
+        if workers is not None and workers > 1:
+            for event in self._iter_events_parallel(start, end, spool_dir, workers):
+                yield event
+            return
+
+        with tempfile.SpooledTemporaryFile(max_size=spool_size, dir=spool_dir) as spool:
+            self._download(start, end, spool)
+            spool.seek(0)
+
+            for event in iter_archive(spool):
+                yield event
+
+    def _iter_events_parallel(self, start, end, spool_dir, workers):
+        from . import exportdecode
+
+        descriptor, path = tempfile.mkstemp(suffix='.zip', dir=spool_dir)
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                self._download(start, end, f)
+
+            for event in exportdecode.iter_events(path, workers):
+                yield event
+        finally:
+            os.remove(path)
+
+    def export_shards(self, start, end, output_dir, **kwargs):
+        """ Export start..end (YYYYMMDDTHH) to output_dir in concurrent hour
+            or day shards, skipping the shards recorded complete by a previous
+            run. kwargs are passed to exportshards.ShardedExport (shard_hours,
+            max_workers, manifest, verify).
+
+            Returns:
+                The ShardedExport, see its shards, failed and stats().
+        """
+        from .exportshards import ShardedExport
+
+        sharded = ShardedExport(self, output_dir, **kwargs)
+        sharded.run(start, end)
+
+        return sharded
+
+    def _download(self, start, end, f):
+        """ Stream the export archive into the binary file f."""
+        labels = {'client': 'export', 'endpoint': 'export'}
+        url = self.api_url + '?start=' + start + '&end=' + end
+        response = self._get(url, stream=True)
+        size = 0
+
+        try:
+            response.raise_for_status()
+            with self.metrics.timer('latency_seconds', phase='transfer', **labels):
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+                    self.metrics.increment('bytes_received', len(chunk), **labels)
+        finally:
+            response.close()
+
+        return size
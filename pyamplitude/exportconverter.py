@@ -0,0 +1,323 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Conversion of exported events to partitioned Parquet or Arrow IPC files.
+
+    The export is gzipped JSON, one event per line, that every job has to
+    parse again. ExportConverter reads it once (any exportedevents source:
+    an archive, a directory of shards, or AmplitudeExportApi.iter_events)
+    and writes columnar files, partitioned like:
+
+        <output_dir>/date=2017-08-01/hour=05/event_type=open_app/part-00000-<run>.parquet
+
+    Columns are the top-level fields of the events, with event_properties,
+    user_properties and group_properties flattened into
+    'event_properties.<name>' ... columns. Their types are inferred from the
+    values of each batch: bool, int64, float64 (ints and floats mixed),
+    string, timestamp for the *_time fields; lists, dicts and mixed values
+    are JSON strings.
+
+    Events are buffered by partition and written every batch_size events, one
+    part file per partition, so memory use is bounded by batch_size. Arrow
+    IPC files are uncompressed and can be memory-mapped; read_table reads
+    either format back, memory-mapping the files, and reconciles the
+    schemas of the parts.
+"""
+
+import os
+import uuid
+from .exportedevents import iter_events
+from .lazyimport import LazyModule
+
+try:
+    from urllib.parse import quote, unquote
+except ImportError:
+    from urllib import quote, unquote
+
+json = LazyModule('simplejson')
+
+DEFAULT_BATCH_SIZE = 100000
+
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+PARTITION_KEYS = ['date', 'hour', 'event_type']
+
+PROPERTY_FIELDS = ['event_properties', 'user_properties', 'group_properties']
+
+TIME_FIELDS = ['event_time', 'client_event_time', 'client_upload_time', 'server_upload_time',
+               'server_received_time', 'processed_time', 'user_creation_time']
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('Pyamplitude Error: Parquet and Arrow conversion require pyarrow, '
+                          'install it with: pip install "pyamplitude[arrow]"')
+    return pyarrow
+
+
+def flatten(event):
+    """ The columns of an event: its top-level fields, with the property
+        dicts flattened to '<field>.<name>' columns."""
+    row = {}
+
+    for key, value in event.items():
+        if key in PROPERTY_FIELDS:
+            for name, prop in (value or {}).items():
+                row[key + '.' + name] = prop
+        else:
+            row[key] = value
+
+    return row
+
+
+def to_array(name, values):
+    """ A pyarrow array of values, of the type inferred from them."""
+    pyarrow = _pyarrow()
+    kinds = set(type(value) for value in values if value is not None)
+
+    if not kinds:
+        return pyarrow.array(values, pyarrow.null())
+
+    if kinds == set([str]) and name in TIME_FIELDS:
+        try:
+            return pyarrow.array(values, pyarrow.string()).cast(pyarrow.timestamp('us'))
+        except pyarrow.ArrowInvalid:
+            pass
+
+    try:
+        if kinds == set([bool]):
+            return pyarrow.array(values, pyarrow.bool_())
+        if kinds == set([int]):
+            return pyarrow.array(values, pyarrow.int64())
+        if kinds <= set([int, float]):
+            return pyarrow.array(values, pyarrow.float64())
+    except (pyarrow.ArrowInvalid, OverflowError):
+        pass
+
+    if kinds == set([str]):
+        return pyarrow.array(values, pyarrow.string())
+
+    return pyarrow.array([value if value is None or isinstance(value, str) else json.dumps(value)
+                          for value in values], pyarrow.string())
+
+
+def to_table(events):
+    """ A pyarrow Table of events (see flatten and to_array). Columns are
+        in order of first appearance."""
+    pyarrow = _pyarrow()
+    rows = [flatten(event) for event in events]
+    names = {}
+
+    for row in rows:
+        for name in row:
+            names.setdefault(name, len(names))
+
+    names = sorted(names, key=names.get)
+
+    return pyarrow.Table.from_arrays([to_array(name, [row.get(name) for row in rows]) for name in names],
+                                     names=names)
+
+
+class ExportConverter(object):
+    """ Args:
+            output_dir (required)     Root of the partitioned output, created
+            if missing.
+            format (optional)         'parquet' (default) or 'arrow' (Arrow
+            IPC files, memory-mappable).
+            partition_by (optional)   Partition keys, in order, among 'date',
+            'hour' and 'event_type' (of event_time and event_type; default:
+            all three).
+            batch_size (optional)     Events buffered before writing
+            (default: 100000).
+            compression (optional)    Parquet compression (default: snappy).
+
+        Usage:
+
+            converter = ExportConverter('events/', format='arrow')
+            converter.convert(export.iter_events('20170801T00', '20170801T23'))
+            table = read_table('events/', event_type=['purchase'])
+    """
+
+    def __init__(self, output_dir, format='parquet', partition_by=PARTITION_KEYS,
+                 batch_size=DEFAULT_BATCH_SIZE, compression='snappy'):
+
+        if format not in FORMATS:
+            raise ValueError('Pyamplitude Error: ExportConverter: format must be "parquet" or "arrow"')
+
+        unknown = [key for key in partition_by if key not in PARTITION_KEYS]
+        if unknown:
+            raise ValueError('Pyamplitude Error: ExportConverter: unknown partition keys ' + str(unknown))
+
+        if batch_size < 1:
+            raise ValueError('Pyamplitude Error: ExportConverter: batch_size must be positive')
+
+        _pyarrow()
+
+        self.output_dir = output_dir
+        self.format = format
+        self.partition_by = list(partition_by)
+        self.batch_size = batch_size
+        self.compression = compression
+
+        self.events = 0
+        self.files = 0
+        self.partitions = set()
+
+        self._run = uuid.uuid4().hex[:8]
+        self._buffers = {}
+        self._buffered = 0
+
+    def convert(self, source):
+        """ Convert the events of an export source (see
+            exportedevents.iter_events). Can be called several times.
+            Returns stats()."""
+        for event in iter_events(source):
+            self._buffers.setdefault(self._partition(event), []).append(event)
+            self._buffered += 1
+
+            if self._buffered >= self.batch_size:
+                self.flush()
+
+        self.flush()
+
+        return self.stats()
+
+    def stats(self):
+        return {'events': self.events, 'files': self.files, 'partitions': len(self.partitions)}
+
+    def flush(self):
+        """ Write the buffered events, one part file per partition."""
+        for partition, events in sorted(self._buffers.items()):
+            directory = os.path.join(self.output_dir, *partition)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+
+            path = os.path.join(directory, 'part-{:05d}-{}{}'.format(self.files, self._run, FORMATS[self.format]))
+            self._write(to_table(events), path)
+
+            self.events += len(events)
+            self.files += 1
+            self.partitions.add(partition)
+
+        self._buffers = {}
+        self._buffered = 0
+
+    def _write(self, table, path):
+        pyarrow = _pyarrow()
+        temporary = path + '.tmp'
+
+        if self.format == 'parquet':
+            pyarrow.parquet.write_table(table, temporary, compression=self.compression)
+        else:
+            with pyarrow.OSFile(temporary, 'wb') as sink:
+                with pyarrow.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+
+        os.rename(temporary, path)
+
+    def _partition(self, event):
+        """ The 'key=value' directories of an event."""
+        time = event.get('event_time') or ''
+        values = {'date': time[:10] or 'unknown',
+                  'hour': time[11:13] or 'unknown',
+                  'event_type': event.get('event_type') or 'unknown'}
+
+        return tuple(key + '=' + quote(str(values[key]), safe='') for key in self.partition_by)
+
+
+def convert_export(source, output_dir, **kwargs):
+    """ Shortcut for ExportConverter(output_dir, **kwargs).convert(source)."""
+    return ExportConverter(output_dir, **kwargs).convert(source)
+
+
+def read_table(path, columns=None, **partitions):
+    """ Read the files written by ExportConverter under path as one pyarrow
+        Table, memory-mapping them.
+
+        Args:
+            path (required)      Output directory of a conversion, or any
+            partition of it.
+            columns (optional)   Columns to read (default: all).
+            partitions           Values to keep for partition keys, e.g.
+            date=['2017-08-01'], event_type=['open_app'].
+
+        Parts written with different schemas are reconciled: missing columns
+        are null, int and float columns become float64, other conflicting
+        columns strings.
+    """
+    pyarrow = _pyarrow()
+    wanted = dict((key, set(str(value) for value in values)) for key, values in partitions.items())
+    tables = []
+
+    for directory, subdirectories, names in os.walk(path):
+        subdirectories.sort()
+        keys = dict(unquote(part).split('=', 1) for part in os.path.relpath(directory, path).split(os.sep)
+                    if '=' in part)
+
+        if any(key in keys and keys[key] not in values for key, values in wanted.items()):
+            subdirectories[:] = []
+            continue
+
+        for name in sorted(names):
+            if name.endswith('.parquet'):
+                table = pyarrow.parquet.read_table(os.path.join(directory, name), memory_map=True)
+            elif name.endswith('.arrow'):
+                table = pyarrow.ipc.open_file(pyarrow.memory_map(os.path.join(directory, name))).read_all()
+            else:
+                continue
+
+            if columns is not None:
+                table = table.select([column for column in columns if column in table.column_names])
+            tables.append(table)
+
+    return _concat(tables)
+
+
+def _concat(tables):
+    pyarrow = _pyarrow()
+    types, names = {}, {}
+
+    for table in tables:
+        for field in table.schema:
+            names.setdefault(field.name, len(names))
+            types.setdefault(field.name, set()).add(field.type)
+
+    names = sorted(names, key=names.get)
+    schema = pyarrow.schema([(name, _common_type(types[name])) for name in names])
+
+    return pyarrow.concat_tables([_conform(table, schema) for table in tables]) if tables else schema.empty_table()
+
+
+def _common_type(types):
+    pyarrow = _pyarrow()
+    types = set(t for t in types if not pyarrow.types.is_null(t)) or set([pyarrow.null()])
+
+    if len(types) == 1:
+        return types.pop()
+
+    if all(pyarrow.types.is_integer(t) or pyarrow.types.is_floating(t) for t in types):
+        return pyarrow.float64()
+
+    return pyarrow.string()
+
+
+def _conform(table, schema):
+    """ table with the columns and types of schema."""
+    pyarrow = _pyarrow()
+    arrays = []
+
+    for field in schema:
+        if field.name not in table.column_names:
+            arrays.append(pyarrow.nulls(len(table), field.type))
+            continue
+
+        column = table.column(field.name)
+        if column.type != field.type:
+            column = column.cast(field.type)
+        arrays.append(column)
+
+    return pyarrow.Table.from_arrays(arrays, schema=schema)
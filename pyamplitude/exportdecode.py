@@ -0,0 +1,149 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Multi-core decoding of export archives.
+
+    Decompressing and parsing the hourly .json.gz files of an export is CPU
+    bound: exportedevents.iter_events uses a single core. iter_batches spreads
+    the files (the members of an archive, or the files of an extracted or
+    sharded export directory) over a pool of worker processes; each worker
+    opens its file, decompresses and parses it, and sends back one compact
+    batch:
+
+        'events'   The list of event dicts, pickled.
+        'arrow'    A pyarrow Table (see exportconverter.to_table), sent as an
+                   Arrow IPC stream, cheap to send and to load in the parent.
+
+    Batches are yielded in file order, with at most prefetch batches per
+    worker decoded ahead, so memory is bounded by a few files.
+
+        for event in iter_events('export.zip', workers=8):
+            ...
+
+        retention.add_events(iter_events('export/', workers=8))
+
+    Archives must be files on disk, so that workers can open them.
+"""
+
+import gc
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from .exportedevents import _iter_lines
+
+FORMATS = ['events', 'arrow']
+
+DEFAULT_PREFETCH = 2
+
+
+def decode_units(source):
+    """ (path, member) of every file of an export source: the .json.gz and
+        .json members of an archive (member is their name), or the files of a
+        directory or a single file (member is None)."""
+    if os.path.isdir(source):
+        units = []
+        for directory, subdirectories, names in os.walk(source):
+            subdirectories.sort()
+            units.extend((os.path.join(directory, name), None) for name in sorted(names)
+                         if name.endswith('.json.gz') or name.endswith('.json'))
+        return units
+
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as content:
+            return [(source, name) for name in sorted(content.namelist())
+                    if name.endswith('.json.gz') or name.endswith('.json')]
+
+    return [(source, None)]
+
+
+def decode_unit(path, member=None, format='events'):
+    """ Decode one file of an export: the member of the archive at path, or
+        the file at path. Returns a batch (see the module docstring); run in
+        the worker processes."""
+    name = member if member is not None else path
+
+    # Parsed events hold no reference cycles: pausing the cyclic collector
+    # while the batch grows avoids collections that would scan all of it.
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        if member is None:
+            with open(path, 'rb') as f:
+                events = list(_iter_lines(f, name.endswith('.gz')))
+        else:
+            with zipfile.ZipFile(path) as content, content.open(member) as f:
+                events = list(_iter_lines(f, name.endswith('.gz')))
+    finally:
+        if collecting:
+            gc.enable()
+
+    if format == 'events':
+        return events
+
+    from .exportconverter import _pyarrow, to_table
+    pyarrow = _pyarrow()
+    table = to_table(events)
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    return sink.getvalue().to_pybytes()
+
+
+def iter_batches(source, workers=None, format='events', prefetch=DEFAULT_PREFETCH):
+    """ Yield one decoded batch per file of source (see decode_units), in
+        order: a list of events, or a pyarrow Table for format='arrow'.
+
+        Args:
+            source (required)     An export archive, directory or file.
+            workers (optional)    Worker processes (default: one per core).
+            With 1, files are decoded in this process.
+            format (optional)     'events' (default) or 'arrow'.
+            prefetch (optional)   Batches decoded ahead per worker
+            (default: 2).
+    """
+    if format not in FORMATS:
+        raise ValueError('Pyamplitude Error: iter_batches: format must be "events" or "arrow"')
+
+    workers = workers or os.cpu_count() or 1
+    if workers < 1 or prefetch < 1:
+        raise ValueError('Pyamplitude Error: iter_batches: workers and prefetch must be positive')
+
+    units = decode_units(source)
+
+    if workers == 1:
+        for path, member in units:
+            yield _load(decode_unit(path, member, format), format)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+
+        try:
+            for path, member in units:
+                pending.append(pool.submit(decode_unit, path, member, format))
+                if len(pending) >= workers * prefetch:
+                    yield _load(pending.popleft().result(), format)
+
+            while pending:
+                yield _load(pending.popleft().result(), format)
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _load(batch, format):
+    if format == 'events':
+        return batch
+
+    from .exportconverter import _pyarrow
+    return _pyarrow().ipc.open_stream(batch).read_all()
+
+
+def iter_events(source, workers=None, prefetch=DEFAULT_PREFETCH):
+    """ Yield the events of an export source, as exportedevents.iter_events,
+        decoded by workers processes (see iter_batches)."""
+    for batch in iter_batches(source, workers, 'events', prefetch):
+        for event in batch:
+            yield event
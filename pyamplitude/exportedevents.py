@@ -0,0 +1,249 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Reading and filtering of the events exported with AmplitudeExportApi,
+    shared by the local computation engines (see localretention.py and
+    localfunnel.py).
+
+    An export is a zip archive of gzipped JSON files, one event per line.
+    Sources can be the archive itself, the directory it was extracted to by
+    get_all_events_data, a single .json.gz or .json file, or any iterable of
+    event dicts.
+
+    Segment and Event filters are evaluated like Amplitude does: user
+    properties are read from the top-level event fields (country, platform,
+    ...) or, prefixed with 'gp:' or not, from user_properties; event
+    properties from event_properties. Missing values are '(none)'.
+"""
+
+import gzip
+import os
+import zipfile
+from .lazyimport import LazyModule
+
+json = LazyModule('simplejson')
+
+DEFAULT_CHUNK_SIZE = 1000000
+
+NONE = '(none)'
+
+# Event types matching any event.
+ANY_EVENT = ['_active', '_all']
+
+# Event type matching the events of a user on the day they were created
+# (user_creation_time), as get_retention's new users start event.
+NEW_USER_EVENT = '_new'
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('Pyamplitude Error: local computations require numpy, '
+                          'install it with: pip install "pyamplitude[numpy]"')
+    return numpy
+
+
+def iter_events(source):
+    """ Yields the events of an export source, as dicts."""
+    if not isinstance(source, str):
+        for event in source:
+            yield event
+        return
+
+    if os.path.isdir(source):
+        for directory, _, names in sorted(os.walk(source)):
+            for name in sorted(names):
+                if name.endswith('.json.gz') or name.endswith('.json'):
+                    for event in iter_events(os.path.join(directory, name)):
+                        yield event
+        return
+
+    if zipfile.is_zipfile(source):
+        for event in iter_archive(source):
+            yield event
+        return
+
+    with open(source, 'rb') as f:
+        for event in _iter_lines(f, source.endswith('.gz')):
+            yield event
+
+
+def iter_archive(archive):
+    """ Yields the events of an export zip archive (a path or a seekable
+        binary file), decompressing one hourly member at a time."""
+    with zipfile.ZipFile(archive) as content:
+        for name in sorted(content.namelist()):
+            if name.endswith('.json.gz') or name.endswith('.json'):
+                with content.open(name) as member:
+                    for event in _iter_lines(member, name.endswith('.gz')):
+                        yield event
+
+
+def _iter_lines(f, gzipped):
+    if gzipped:
+        f = gzip.GzipFile(fileobj=f)
+
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_chunks(events, chunk_size=DEFAULT_CHUNK_SIZE):
+    """ Lists of at most chunk_size events."""
+    chunk = []
+
+    for event in events:
+        chunk.append(event)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def user_property(event, prop):
+    """ Value of a user property (or of a top-level event field)."""
+    if prop.startswith('gp:'):
+        value = (event.get('user_properties') or {}).get(prop[3:])
+    elif prop in event:
+        value = event[prop]
+    else:
+        value = (event.get('user_properties') or {}).get(prop)
+
+    return NONE if value is None else value
+
+
+def event_property(event, prop):
+    value = (event.get('event_properties') or {}).get(prop)
+
+    return NONE if value is None else value
+
+
+def matches(value, op, values):
+    """ Whether a property value satisfies a Segment / Event filter."""
+    if op in ['set is', 'set is not', 'set contains', 'set does not contain']:
+        items = [str(item) for item in value] if isinstance(value, list) else [str(value)]
+        if op == 'set is':
+            return any(item in values for item in items)
+        if op == 'set is not':
+            return not any(item in values for item in items)
+        found = any(v in item for item in items for v in values)
+        return found if op == 'set contains' else not found
+
+    if op in ['less', 'less or equal', 'greater', 'greater or equal']:
+        try:
+            number, bound = float(value), float(values[0])
+        except (TypeError, ValueError, IndexError):
+            return False
+        return {'less': number < bound,
+                'less or equal': number <= bound,
+                'greater': number > bound,
+                'greater or equal': number >= bound}[op]
+
+    value = str(value)
+
+    if op == 'is':
+        return value in values
+    if op == 'is not':
+        return value not in values
+    if op == 'contains':
+        return any(v in value for v in values)
+    if op == 'does not contain':
+        return not any(v in value for v in values)
+
+    raise ValueError('Pyamplitude Error: unknown filter operator ' + str(op))
+
+
+def segment_predicate(segment_definitions):
+    """ Function telling whether an event's user belongs to the segments.
+        As in AmplitudeRestApi, the filters of every segment are combined."""
+    filters = [f for segment in segment_definitions or [] for f in segment.get_filters()]
+
+    def predicate(event):
+        return all(matches(user_property(event, f['prop']), f['op'], f['values']) for f in filters)
+
+    return predicate
+
+
+def event_predicate(event_definition):
+    """ Function telling whether an event matches an Event (its type and
+        filters). '_active' and '_all' match any event, '_new' the events of
+        the day the user was created."""
+    event_type = event_definition.event_type
+    filters = list(event_definition.get_filters())
+
+    def predicate(event):
+        if event_type == NEW_USER_EVENT:
+            created = (event.get('user_creation_time') or '')[:10]
+            if not created or (event.get('event_time') or '')[:10] != created:
+                return False
+        elif event_type not in ANY_EVENT and event.get('event_type') != event_type:
+            return False
+
+        for f in filters:
+            if f['subprop_type'] == 'event':
+                value = event_property(event, f['subprop_key'])
+            else:
+                value = user_property(event, f['subprop_key'])
+            if not matches(value, f['subprop_op'], f['subprop_value']):
+                return False
+
+        return True
+
+    return predicate
+
+
+def group_by_property(group_by):
+    """ The property of a group_by argument (a name, or a list of one)."""
+    if group_by is None:
+        return None
+
+    if isinstance(group_by, (list, tuple)):
+        if len(group_by) != 1:
+            raise ValueError('Pyamplitude Error: group_by accepts up to 1 property')
+        return group_by[0]
+
+    return group_by
+
+
+class UserIndex(object):
+    """ Dense integer index (0, 1, ...) of the users of an export, by
+        amplitude_id, or user_id / device_id when it is missing."""
+
+    def __init__(self):
+        self._ids = {}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __call__(self, event):
+        key = event.get('amplitude_id')
+        if key is None:
+            key = event.get('user_id') or event.get('device_id')
+
+        index = self._ids.get(key)
+        if index is None:
+            index = self._ids[key] = len(self._ids)
+
+        return index
+
+
+def event_days(events):
+    """ Day of each event (event_time, 'YYYY-MM-DD HH:MM:SS.ffffff') as a
+        datetime64[D] array."""
+    return _numpy().array([event['event_time'][:10] for event in events], dtype='datetime64[D]')
+
+
+def event_times(events):
+    """ Time of each event (event_time) in milliseconds since the epoch, as
+        an int64 array."""
+    numpy = _numpy()
+    return numpy.array([event['event_time'] for event in events], dtype='datetime64[ms]').astype(numpy.int64)
+
+
+def parse_day(day):
+    """ A YYYYMMDD date as a datetime64[D]."""
+    return _numpy().datetime64(day[:4] + '-' + day[4:6] + '-' + day[6:8], 'D')
@@ -0,0 +1,346 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Exports of long ranges split in hour or day shards, downloaded
+    concurrently.
+
+    get_all_events_data(start, end) sends a single request for the whole
+    range: a week-long backfill is one slow download that has to start over
+    if it fails. ShardedExport splits the range in shards of shard_hours
+    hours (1 for hours, 24 for days), downloads them with a bounded pool of
+    workers and extracts each one on its own into a partition of the output
+    directory:
+
+        <output_dir>/date=2017-08-01/hour=05/123_2017-08-01_05#0.json.gz   (hour shards)
+        <output_dir>/date=2017-08-01/123_2017-08-01_05#0.json.gz           (day shards)
+
+    Hours without data, answered with 404 by the export api, are empty
+    shards rather than errors.
+
+    Completed shards are recorded in a manifest (see ShardManifest), so an
+    interrupted export resumes where it stopped: a new run of the same range
+    skips the shards whose files are intact and fetches the missing or
+    corrupt ones only.
+"""
+
+import gzip
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from .exportapi import SPOOL_SIZE
+from .lazyimport import LazyModule
+
+requests = LazyModule('requests')
+
+HOUR_FORMAT = '%Y%m%dT%H'
+
+MANIFEST_NAME = '_manifest.sqlite'
+
+VERIFY_MODES = ['checksum', 'size', None]
+
+# Bytes read at a time when hashing and counting.
+READ_SIZE = 1024 * 1024
+
+
+def _check_shard_hours(shard_hours):
+    if not 0 < shard_hours <= 24 or 24 % shard_hours != 0:
+        raise ValueError('Pyamplitude Error: shard_hours must divide 24 (1, 2, 3, 4, 6, 8, 12 or 24)')
+
+
+def shard_ranges(start, end, shard_hours=1):
+    """ (start, end) hour ranges (YYYYMMDDTHH, both included) of the shards of
+        start..end. Shards are aligned on multiples of shard_hours from
+        midnight, so the first and last ones may be shorter."""
+    _check_shard_hours(shard_hours)
+
+    first = datetime.strptime(start, HOUR_FORMAT)
+    last = datetime.strptime(end, HOUR_FORMAT)
+
+    if last < first:
+        raise ValueError('Pyamplitude Error: export end ' + end + ' is before start ' + start)
+
+    ranges = []
+    hour = first
+    while hour <= last:
+        shard_end = hour.replace(hour=(hour.hour // shard_hours + 1) * shard_hours - 1)
+        shard_end = min(shard_end, last)
+        ranges.append((hour.strftime(HOUR_FORMAT), shard_end.strftime(HOUR_FORMAT)))
+        hour = shard_end + timedelta(hours=1)
+
+    return ranges
+
+
+def shard_partition(start, shard_hours):
+    """ Relative directory of the shard starting at start."""
+    hour = datetime.strptime(start, HOUR_FORMAT)
+    partition = 'date=' + hour.strftime('%Y-%m-%d')
+
+    if shard_hours < 24:
+        partition = os.path.join(partition, 'hour=' + hour.strftime('%H'))
+
+    return partition
+
+
+def scan_partition(path):
+    """ {'files', 'bytes', 'sha256'} of the files of a partition. The
+        checksum is the sha256 of the sorted '<name> <sha256>' lines of its
+        files."""
+    lines, size = [], 0
+
+    for name in sorted(os.listdir(path)):
+        digest = hashlib.sha256()
+        with open(os.path.join(path, name), 'rb') as f:
+            for chunk in iter(lambda: f.read(READ_SIZE), b''):
+                digest.update(chunk)
+                size += len(chunk)
+        lines.append(name + ' ' + digest.hexdigest() + '\n')
+
+    return {'files': len(lines),
+            'bytes': size,
+            'sha256': hashlib.sha256(''.join(lines).encode('utf-8')).hexdigest()}
+
+
+def count_events(path):
+    """ Events (lines) of the .json.gz and .json files of a partition."""
+    events = 0
+
+    for name in os.listdir(path):
+        if not (name.endswith('.json.gz') or name.endswith('.json')):
+            continue
+
+        opener = gzip.open if name.endswith('.gz') else open
+        last = b'\n'
+        with opener(os.path.join(path, name), 'rb') as f:
+            for chunk in iter(lambda: f.read(READ_SIZE), b''):
+                events += chunk.count(b'\n')
+                last = chunk[-1:]
+        if last != b'\n':
+            events += 1
+
+    return events
+
+
+class ShardManifest(object):
+    """ SQLite record of the completed shards of an export: partition path
+        (None for empty shards), files, bytes, events and checksum (see
+        scan_partition) of each (start, end) shard.
+
+        Args:
+            path (required)   SQLite database file, created if needed.
+    """
+
+    COLUMNS = ['path', 'files', 'bytes', 'events', 'sha256', 'completed_at']
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS shards '
+                                     '(start TEXT, end TEXT, path TEXT, files INTEGER, bytes INTEGER, '
+                                     'events INTEGER, sha256 TEXT, completed_at REAL, '
+                                     'PRIMARY KEY (start, end))')
+
+    def get(self, start, end):
+        """ The record of a completed shard, None if it is not recorded."""
+        with self._lock:
+            row = self._connection.execute('SELECT ' + ', '.join(self.COLUMNS) + ' FROM shards '
+                                           'WHERE start = ? AND end = ?', (start, end)).fetchone()
+
+        return None if row is None else dict(zip(self.COLUMNS, row))
+
+    def record(self, start, end, shard):
+        with self._lock, self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO shards VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                     (start, end, shard['path'], shard['files'], shard['bytes'],
+                                      shard['events'], shard['sha256'], time.time()))
+
+    def forget(self, start, end):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM shards WHERE start = ? AND end = ?', (start, end))
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM shards').fetchone()[0]
+
+    def close(self):
+        self._connection.close()
+
+
+class ShardedExport(object):
+    """ Args:
+            export (required)        An AmplitudeExportApi.
+            output_dir (required)    Root of the partitioned output, created
+            if missing.
+            shard_hours (optional)   Hours per shard, 1 (default) to 24.
+            max_workers (optional)   Concurrent downloads (default: 4).
+            manifest (optional)      A ShardManifest, or the path of one
+            (default: _manifest.sqlite in output_dir). False disables it.
+            verify (optional)        How recorded shards are checked before
+            being skipped: 'checksum' (default, the files are hashed again),
+            'size' (file count and bytes), or None (trust the manifest).
+
+        Usage:
+
+            sharded = ShardedExport(export, 'export/', shard_hours=24)
+            sharded.run('20170801T00', '20170807T23')
+            sharded.failed   # {(start, end): exception}, fetched again on the next run
+
+        Each shard is spooled (see AmplitudeExportApi.iter_events) and
+        extracted to a temporary directory, then moved to its partition and
+        recorded in the manifest, so a recorded partition is always complete.
+    """
+
+    def __init__(self, export, output_dir, shard_hours=1, max_workers=4, manifest=None,
+                 verify='checksum'):
+        if max_workers < 1:
+            raise ValueError('Pyamplitude Error: ShardedExport: max_workers must be positive')
+
+        if verify not in VERIFY_MODES:
+            raise ValueError('Pyamplitude Error: ShardedExport: verify must be "checksum", "size" or None')
+
+        _check_shard_hours(shard_hours)
+
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+
+        if manifest is None:
+            manifest = os.path.join(output_dir, MANIFEST_NAME)
+        if isinstance(manifest, str):
+            manifest = ShardManifest(manifest)
+
+        self.export = export
+        self.output_dir = output_dir
+        self.shard_hours = shard_hours
+        self.max_workers = max_workers
+        self.manifest = manifest if manifest is not False else None
+        self.verify = verify
+
+        self.shards = {}
+        self.failed = {}
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def run(self, start, end):
+        """ Download and extract every shard of start..end (YYYYMMDDTHH) not
+            recorded intact in the manifest. Completed shards are listed in
+            shards, {(start, end): {'path', 'files', 'bytes', 'events',
+            'sha256'}} (path is None for empty shards), failed ones in failed.
+            Returns stats()."""
+        pending = [shard for shard in shard_ranges(start, end, self.shard_hours)
+                   if not self._is_complete(*shard)]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._fetch_shard, shard_start, shard_end): (shard_start, shard_end)
+                       for shard_start, shard_end in pending}
+
+            for future in as_completed(futures):
+                shard = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.failed[shard] = e
+                else:
+                    self.shards[shard] = result
+                    self.failed.pop(shard, None)
+
+        return self.stats()
+
+    def stats(self):
+        return {'shards': len(self.shards),
+                'skipped': self.skipped,
+                'empty': sum(1 for shard in self.shards.values() if shard['path'] is None),
+                'failed': len(self.failed),
+                'files': sum(shard['files'] for shard in self.shards.values()),
+                'bytes': sum(shard['bytes'] for shard in self.shards.values()),
+                'events': sum(shard['events'] for shard in self.shards.values())}
+
+    def _is_complete(self, start, end):
+        """ Whether a shard is recorded in the manifest and its files are
+            intact (see verify)."""
+        if self.manifest is None:
+            return False
+
+        record = self.manifest.get(start, end)
+        if record is None:
+            return False
+
+        shard = self._shard(record)
+        if shard['path'] is not None and self.verify is not None:
+            if not os.path.isdir(shard['path']):
+                return False
+
+            scanned = scan_partition(shard['path'])
+            keys = ['files', 'bytes', 'sha256'] if self.verify == 'checksum' else ['files', 'bytes']
+            if any(scanned[key] != shard[key] for key in keys):
+                return False
+
+        self.shards[(start, end)] = shard
+        self.skipped += 1
+
+        return True
+
+    def _shard(self, record):
+        shard = dict((key, record[key]) for key in ['path', 'files', 'bytes', 'events', 'sha256'])
+        if shard['path'] is not None:
+            shard['path'] = os.path.join(self.output_dir, shard['path'])
+
+        return shard
+
+    def _fetch_shard(self, start, end):
+        partition = shard_partition(start, self.shard_hours)
+        record = {'path': None, 'files': 0, 'bytes': 0, 'events': 0, 'sha256': None}
+
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+            try:
+                self.export.download(start, end, spool)
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 404:
+                    raise
+            else:
+                spool.seek(0)
+                record = self._extract(spool, os.path.join(self.output_dir, partition))
+                record['path'] = partition
+
+        if self.manifest is not None:
+            self.manifest.record(start, end, record)
+
+        return self._shard(record)
+
+    def _extract(self, archive, partition):
+        """ Extract the members of a shard archive to partition, flattened.
+            Returns the scan_partition of the files, with their events."""
+        parent = os.path.dirname(partition)
+        with self._lock:
+            if not os.path.isdir(parent):
+                os.makedirs(parent)
+
+        staging = tempfile.mkdtemp(prefix='.shard-', dir=parent)
+
+        try:
+            with zipfile.ZipFile(archive) as content:
+                for name in content.namelist():
+                    if name.endswith('/'):
+                        continue
+                    with content.open(name) as member, \
+                            open(os.path.join(staging, os.path.basename(name)), 'wb') as f:
+                        shutil.copyfileobj(member, f)
+
+            record = scan_partition(staging)
+            record['events'] = count_events(staging)
+
+            if os.path.isdir(partition):
+                shutil.rmtree(partition)
+            os.rename(staging, partition)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        return record
@@ -0,0 +1,140 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .amplituderestapi import AmplitudeRestApi
+
+DEFAULT_MAX_WORKERS = 8
+
+
+class FanOutResult(object):
+    """ Results of a fan-out by project name.
+
+        results holds the responses of the projects that succeeded and errors
+        the exception raised for each project that failed, a failure never
+        hides the other projects' results.
+    """
+
+    def __init__(self, results, errors):
+        self.results = results
+        self.errors = errors
+
+    def __repr__(self):
+        return 'FanOutResult(' + str(len(self.results)) + ' results, ' + str(len(self.errors)) + ' errors)'
+
+    def __getitem__(self, project_name):
+        """ Response of a project, raises its exception if it failed."""
+        if project_name in self.errors:
+            raise self.errors[project_name]
+
+        return self.results[project_name]
+
+    def __contains__(self, project_name):
+        return project_name in self.results or project_name in self.errors
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def raise_for_errors(self):
+        """ Raise the exception of the first failed project (by name), if any."""
+        for project_name in sorted(self.errors):
+            raise self.errors[project_name]
+
+
+class ProjectFanOut(object):
+    """ Sends the same AmplitudeRestApi query to many projects in parallel.
+
+        Each project gets its own AmplitudeRestApi, so its own pooled session
+        and, with a rate_limiter_factory, its own QueryRateLimiter budget
+        (Amplitude limits each project separately). The query is prepared for
+        every project first, so invalid arguments raise before anything is
+        sent, then the requests run from a bounded thread pool.
+
+        Args:
+            projects (required)             List of ProjectsHandler, with
+            distinct project names.
+            max_workers (optional)          Concurrent requests
+            (default: 8).
+            rate_limiter_factory (optional) Callable returning the
+            QueryRateLimiter of a project, e.g. QueryRateLimiter.
+            api_factory (optional)          Callable building the api of a
+            project, to configure projects differently. The other keyword
+            arguments are ignored when given.
+            **api_kwargs                    Keyword arguments of every
+            AmplitudeRestApi (show_logs and log_query_cost default to False).
+
+        Usage:
+
+            with ProjectFanOut(projects, rate_limiter_factory=QueryRateLimiter) as fanout:
+                dau = fanout.run('get_active_and_new_user_count',
+                                 start='20170801', end='20170801')
+            dau.results   # {'project a': {...}, 'project b': {...}}
+            dau.errors    # {'project c': HTTPError(...)}
+    """
+
+    def __init__(self, projects, max_workers=DEFAULT_MAX_WORKERS, rate_limiter_factory=None,
+                 api_factory=None, **api_kwargs):
+
+        names = [project.project_name for project in projects]
+        for name in names:
+            if names.count(name) > 1:
+                raise ValueError('Pyamplitude Error: ProjectFanOut: duplicated project name ' + str(name))
+
+        self.max_workers = max_workers
+        self.apis = {}
+
+        for project in projects:
+            if api_factory is not None:
+                api = api_factory(project)
+            else:
+                kwargs = dict(api_kwargs)
+                kwargs.setdefault('show_logs', False)
+                kwargs.setdefault('log_query_cost', False)
+                if rate_limiter_factory is not None:
+                    kwargs['rate_limiter'] = rate_limiter_factory()
+                api = AmplitudeRestApi(project, **kwargs)
+
+            self.apis[project.project_name] = api
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Close the pooled connections of every project."""
+        for api in self.apis.values():
+            api.close()
+
+    def iter_completed(self, method, **kwargs):
+        """ Yields (project name, response) pairs in completion order, the
+            response of a failed project being its exception."""
+        queries = dict((name, api.prepare(method, **kwargs)) for name, api in self.apis.items())
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = dict((pool.submit(self.apis[name].execute, query), name)
+                           for name, query in queries.items())
+
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+
+                yield futures[future], result
+
+    def run(self, method, **kwargs):
+        """ Run method (an AmplitudeRestApi get_* method name) with kwargs on
+            every project, returns a FanOutResult."""
+        results = {}
+        errors = {}
+
+        for name, result in self.iter_completed(method, **kwargs):
+            if isinstance(result, Exception):
+                errors[name] = result
+            else:
+                results[name] = result
+
+        return FanOutResult(results, errors)
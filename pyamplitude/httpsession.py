@@ -0,0 +1,51 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from .lazyimport import LazyModule
+
+requests = LazyModule('requests')
+
+DEFAULT_POOL_SIZE = 10
+
+
+def build_session(pool_size=DEFAULT_POOL_SIZE, keep_alive=True, http2=False):
+    """ Build a pooled HTTP session shared by every request of a project.
+
+        Args:
+            pool_size (optional)    Maximum number of connections kept open
+            per host (default: 10).
+
+            keep_alive (optional)   Reuse connections between requests. When
+            False every request is sent with "Connection: close".
+
+            http2 (optional)        Use an HTTP/2 capable transport. Requires
+            the httpx package installed with its http2 extra.
+
+        Returns:
+            A requests.Session (or an httpx.Client when http2 is True); both
+            expose the get/post methods used by the Amplitude api classes.
+    """
+
+    if http2:
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError('Pyamplitude Error: http2=True requires httpx, '
+                              'install it with: pip install "pyamplitude[http2]"')
+
+        keepalive_connections = pool_size if keep_alive else 0
+        limits = httpx.Limits(max_connections=pool_size,
+                              max_keepalive_connections=keepalive_connections)
+
+        return httpx.Client(http2=True, limits=limits)
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size,
+                                            pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+
+    return session
@@ -0,0 +1,166 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Helpers to split daily time-series responses into per-day entries and
+    to assemble them back into the response shape returned by Amplitude:
+
+        {"data": {"xValues": [...], "series": [[...], ...], "seriesLabels": [...]}}
+
+    Only modes whose daily values add up are split (see
+    amplituderestapi._is_incremental): the seriesCollapsed totals of the
+    merged response are the sums of its daily values.
+"""
+
+from datetime import datetime, timedelta
+from .lazyimport import LazyModule
+
+json = LazyModule('simplejson')
+
+LABEL_KEYS = ('seriesLabels', 'seriesMeta')
+
+COLLAPSED_KEY = 'seriesCollapsed'
+
+
+def date_range(start, end):
+    """ List of YYYYMMDD days from start to end, both included."""
+    first = datetime.strptime(start, "%Y%m%d")
+    last = datetime.strptime(end, "%Y%m%d")
+
+    return [(first + timedelta(days=n)).strftime("%Y%m%d")
+            for n in range((last - first).days + 1)]
+
+
+def missing_runs(days, present):
+    """ Group the days not in present into contiguous (start, end) runs."""
+    runs = []
+    run_start = None
+    previous = None
+
+    for day in days + [None]:
+        if day is not None and day not in present:
+            if run_start is None:
+                run_start = day
+            previous = day
+        elif run_start is not None:
+            runs.append((run_start, previous))
+            run_start = None
+
+    return runs
+
+
+def with_dates(params, start, end):
+    """ Copy of params with start and end replaced."""
+    replaced = []
+
+    for name, value in params:
+        if name == 'start':
+            value = start
+        elif name == 'end':
+            value = end
+        replaced.append((name, value))
+
+    return replaced
+
+
+def is_daily(response):
+    """ Whether response is a time series with one YYYY-MM-DD xValue per day,
+        unlike histograms, whose xValues are buckets."""
+    data = response.get('data') if isinstance(response, dict) else None
+    if not isinstance(data, dict) or 'xValues' not in data or 'series' not in data:
+        return False
+
+    try:
+        for x_value in data['xValues']:
+            datetime.strptime(x_value, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return False
+
+    return True
+
+
+def split_daily(response):
+    """ Split a daily response into a dict of YYYYMMDD -> one-day response."""
+    data = response['data']
+    label_key = _label_key(data)
+    days = {}
+
+    for index, x_value in enumerate(data['xValues']):
+        day_data = {'xValues': [x_value],
+                    'series': [[row[index]] for row in data['series']]}
+
+        if label_key is not None:
+            day_data[label_key] = data[label_key]
+
+        if COLLAPSED_KEY in data:
+            day_data[COLLAPSED_KEY] = [[_collapsed(collapsed, row[index])]
+                                       for collapsed, row in zip(data[COLLAPSED_KEY], data['series'])]
+
+        days[x_value.replace('-', '')] = {'data': day_data}
+
+    return days
+
+
+def merge_daily(day_responses):
+    """ Merge one-day responses, in date order, into a single response.
+
+        Series are matched by label, a label missing on a given day is filled
+        with 0. seriesCollapsed, when the days have it, is the sum of each
+        merged series.
+    """
+    label_key = None
+    labels = []
+    label_index = {}
+    x_values = []
+    rows = []
+    collapsed = {}
+
+    for response in day_responses:
+        data = response['data']
+        label_key = label_key or _label_key(data)
+        day_labels = data.get(label_key, []) if label_key else []
+        day_collapsed = data.get(COLLAPSED_KEY, [])
+
+        for position, row in enumerate(data['series']):
+            label = day_labels[position] if position < len(day_labels) else position
+            encoded = json.dumps(label)
+
+            if encoded not in label_index:
+                label_index[encoded] = len(labels)
+                labels.append(label)
+                rows.append([0] * len(x_values))
+
+            rows[label_index[encoded]].extend(row)
+
+            if position < len(day_collapsed):
+                collapsed.setdefault(label_index[encoded], day_collapsed[position])
+
+        x_values.extend(data['xValues'])
+
+        for row in rows:
+            row.extend([0] * (len(x_values) - len(row)))
+
+    merged = {'xValues': x_values, 'series': rows}
+
+    if label_key is not None:
+        merged[label_key] = labels
+
+    if collapsed:
+        merged[COLLAPSED_KEY] = [[_collapsed(collapsed.get(index), sum(row))]
+                                 for index, row in enumerate(rows)]
+
+    return {'data': merged}
+
+
+def _collapsed(entries, value):
+    """ A seriesCollapsed entry of value, keeping the setId of entries."""
+    set_id = entries[0].get('setId', '') if entries else ''
+
+    return {'setId': set_id, 'value': value}
+
+
+def _label_key(data):
+    for key in LABEL_KEYS:
+        if key in data:
+            return key
+
+    return None
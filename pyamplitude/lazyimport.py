@@ -0,0 +1,37 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Deferred imports of the heavier dependencies (requests, simplejson), so
+    that importing pyamplitude, or a single api module, stays cheap:
+
+        requests = LazyModule('requests')
+        ...
+        requests.get(url)   # requests is imported here, on first use
+"""
+
+import importlib
+
+
+class LazyModule(object):
+    """ Stand-in for a module, imported on first attribute access. The
+        attributes read are then kept on the instance, so later accesses
+        cost the same as on the module itself."""
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def __getattr__(self, attribute):
+        module = self.__dict__['_module']
+
+        if module is None:
+            module = importlib.import_module(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+
+        value = getattr(module, attribute)
+        self.__dict__[attribute] = value
+
+        return value
+
+    def __repr__(self):
+        return '<LazyModule ' + self.__dict__['_name'] + '>'
@@ -0,0 +1,384 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Funnels computed locally, with NumPy, from exported events.
+
+    AmplitudeRestApi.get_funnel costs 2 per condition, day and event, so
+    trying many funnel variants quickly exhausts the query budget. LocalFunnel
+    takes the same arguments, reads events exported with AmplitudeExportApi
+    (see exportedevents.py) and returns a response of the same shape:
+
+        funnel = LocalFunnel([Event('open_app'), Event('add_to_cart'), Event('purchase')],
+                             start='20170801', end='20170831')
+        response = funnel.add_events('export/').result()
+
+    Definitions:
+
+        Entry       A user enters the funnel with their first first-step
+                    event between start and end that matches the segments
+                    (and, for n="new", if the user was created between start
+                    and end). Group by values are read from that event.
+        ordered     Step k is reached with the first step k event after the
+                    step k - 1 one, at most cs seconds after the entry.
+        unordered   Step k is reached if steps 2..k were all performed, in
+                    any order, within the conversion window rounded down to
+                    days, starting on the entry day.
+
+    Only the events matching a step are kept, as rows of (user, time, event,
+    step). The rows of each chunk are split in partitions by user, sorted and
+    spilled to .npy files in a temporary directory. result() loads one
+    partition at a time and evaluates it in batches of batch_size users, so
+    memory holds the rows of one chunk, or of one partition (about
+    1 / partitions of the matching events), never all of them.
+
+    Transition times are aggregated as they are evaluated: a sum per group
+    and step for the averages, and counts of the distinct durations, in
+    whole seconds, for the medians.
+"""
+
+import os
+import tempfile
+from .exportedevents import (DEFAULT_CHUNK_SIZE, UserIndex, event_predicate, event_times,
+                             group_by_property, iter_chunks, iter_events, parse_day,
+                             segment_predicate, user_property, _numpy)
+
+DEFAULT_BATCH_SIZE = 100000
+
+DEFAULT_PARTITIONS = 16
+
+DAY_MS = 86400000
+
+# Columns of the stored rows.
+USER, TIME, EVENT, STEP, GROUP = range(5)
+
+# Durations take the low bits of the (group, duration) keys.
+DURATION_BITS = 32
+
+
+class LocalFunnel(object):
+    """ Args:
+            Same as AmplitudeRestApi.get_funnel (e, start, end, mode, n,
+            segment_definitions, group_by, cs), plus:
+            chunk_size (optional)   Events read at once (default: 1000000).
+            batch_size (optional)   Users evaluated at once (default: 100000).
+            partitions (optional)   User partitions the rows are spilled to
+            (default: 16).
+            spill_dir (optional)    Directory of the spilled rows (default:
+            the system temporary directory).
+
+        The spilled rows are removed by close(), or when the funnel is
+        garbage collected.
+    """
+
+    def __init__(self, e, start, end, mode='ordered', n='active', segment_definitions=[],
+                 group_by=None, cs=2592000, chunk_size=DEFAULT_CHUNK_SIZE,
+                 batch_size=DEFAULT_BATCH_SIZE, partitions=DEFAULT_PARTITIONS, spill_dir=None):
+
+        if len(e) == 0:
+            raise ValueError('Pyamplitude Error: LocalFunnel: at least one event is required')
+
+        if mode not in ['unordered', 'ordered']:
+            raise ValueError('Pyamplitude Error: LocalFunnel: mode must be "unordered" or "ordered"')
+
+        if n not in ['new', 'active']:
+            raise ValueError('Pyamplitude Error: LocalFunnel: n must be "new" or "active"')
+
+        if partitions < 1:
+            raise ValueError('Pyamplitude Error: LocalFunnel: partitions must be positive')
+
+        numpy = _numpy()
+
+        self.events = [event.event_type for event in e]
+        self.mode = mode
+        self.n = n
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.partitions = partitions
+
+        start_day, end_day = parse_day(start), parse_day(end)
+        self.n_days = int((end_day - start_day).astype(numpy.int64)) + 1
+        self._start_ms = int(start_day.astype('datetime64[ms]').astype(numpy.int64))
+        self._end_ms = self._start_ms + self.n_days * DAY_MS
+        self._first_day, self._last_day = str(start_day), str(end_day)
+
+        if mode == 'ordered':
+            self.window_ms = int(cs) * 1000
+        else:
+            self.window_ms = max(int(cs) // 86400, 1) * DAY_MS
+
+        self._steps = [event_predicate(event) for event in e]
+        self._in_segment = segment_predicate(segment_definitions)
+        self._group_by = group_by_property(group_by)
+
+        self._users = UserIndex()
+        self._groups = {}
+        self._seen = 0
+
+        self._spill = tempfile.TemporaryDirectory(prefix='localfunnel-', dir=spill_dir)
+        self._runs = 0
+
+    def add_events(self, source):
+        """ Process the events of an export source (see
+            exportedevents.iter_events). Can be called several times."""
+        for chunk in iter_chunks(iter_events(source), self.chunk_size):
+            self._add_chunk(chunk)
+
+        return self
+
+    def _add_chunk(self, chunk):
+        numpy = _numpy()
+        last_ms = self._end_ms + self.window_ms
+        rows = []
+
+        for i, (event, time) in enumerate(zip(chunk, event_times(chunk).tolist())):
+            if not self._start_ms <= time <= last_ms:
+                continue
+
+            for step, is_step in enumerate(self._steps):
+                if not is_step(event):
+                    continue
+
+                group = -1
+                if step == 0:
+                    if time >= self._end_ms or not self._can_enter(event):
+                        continue
+                    group = self._group(event)
+
+                rows.append((self._users(event), time, self._seen + i, step, group))
+
+        self._seen += len(chunk)
+
+        if rows:
+            self._spill_run(numpy.array(rows, dtype=numpy.int64))
+
+    def _spill_run(self, rows):
+        """ Write the rows of a chunk, sorted, to one .npy file per user
+            partition."""
+        numpy = _numpy()
+        rows = rows[numpy.lexsort((rows[:, EVENT], rows[:, TIME], rows[:, USER]))]
+        partition = rows[:, USER] % self.partitions
+
+        for p in numpy.unique(partition).tolist():
+            numpy.save(self._run_path(p, self._runs), rows[partition == p])
+
+        self._runs += 1
+
+    def _run_path(self, partition, run):
+        return os.path.join(self._spill.name, 'part-{:04d}-run-{:06d}.npy'.format(partition, run))
+
+    def _partition_rows(self, partition):
+        """ The spilled rows of a partition, sorted by user, time and event."""
+        numpy = _numpy()
+        runs = [numpy.load(path) for path in [self._run_path(partition, run) for run in range(self._runs)]
+                if os.path.exists(path)]
+
+        if not runs:
+            return numpy.zeros((0, 5), dtype=numpy.int64)
+
+        rows = numpy.concatenate(runs)
+
+        return rows[numpy.lexsort((rows[:, EVENT], rows[:, TIME], rows[:, USER]))]
+
+    def close(self):
+        """ Remove the spilled rows."""
+        self._spill.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _can_enter(self, event):
+        if not self._in_segment(event):
+            return False
+
+        if self.n == 'new':
+            created = (event.get('user_creation_time') or '')[:10]
+            return self._first_day <= created <= self._last_day
+
+        return True
+
+    def _group(self, event):
+        if self._group_by is None:
+            return 0
+
+        value = str(user_property(event, self._group_by))
+
+        return self._groups.setdefault(value, len(self._groups))
+
+    def result(self):
+        """ The funnel response, shaped like get_funnel's."""
+        numpy = _numpy()
+        n_groups = max(len(self._groups), 1)
+        n_steps = len(self._steps)
+
+        counts = numpy.zeros((n_groups, n_steps), dtype=numpy.int64)
+        day_counts = numpy.zeros((n_groups, self.n_days, n_steps), dtype=numpy.int64)
+        transitions = _Transitions(n_groups, n_steps)
+
+        for partition in range(self.partitions):
+            for batch in self._batches(self._partition_rows(partition)):
+                self._add_batch(batch, counts, day_counts, transitions)
+
+        return self._response(counts, day_counts, transitions)
+
+    def _batches(self, rows):
+        """ Slices of the rows (sorted by user) of batch_size users each."""
+        numpy = _numpy()
+        users = rows[:, USER]
+        edges = numpy.unique(users)[::self.batch_size]
+
+        bounds = list(numpy.searchsorted(users, edges)) + [len(rows)]
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            yield rows[first:last]
+
+    def _add_batch(self, rows, counts, day_counts, transitions):
+        numpy = _numpy()
+        never = numpy.iinfo(numpy.int64).max
+
+        # Dense 0..n_users - 1 index of the users of the batch.
+        users = numpy.cumsum(numpy.concatenate([[0], rows[1:, USER] != rows[:-1, USER]]))
+        times, steps = rows[:, TIME], rows[:, STEP]
+        n_users = int(users[-1]) + 1
+
+        # Rows are sorted by user, time and event: the rank of a row's event
+        # orders the events of each user, and is shared by the rows of an
+        # event matching several steps.
+        ranks = numpy.cumsum(numpy.concatenate([[1], rows[1:, EVENT] != rows[:-1, EVENT]]))
+
+        entry_rank = numpy.full(n_users, never)
+        entries = steps == 0
+        numpy.minimum.at(entry_rank, users[entries], ranks[entries])
+
+        entered = entry_rank != never
+        entry_rows = entries & (ranks == entry_rank[users])
+        entry_time = numpy.full(n_users, never)
+        entry_time[users[entry_rows]] = times[entry_rows]
+        group = numpy.zeros(n_users, dtype=numpy.int64)
+        group[users[entry_rows]] = rows[entry_rows, GROUP]
+        day = (numpy.where(entered, entry_time, self._start_ms) - self._start_ms) // DAY_MS
+
+        # Users who did not enter get an empty window before any event.
+        if self.mode == 'ordered':
+            window_start = numpy.where(entered, entry_time, -1)
+        else:
+            window_start = numpy.where(entered, self._start_ms + day * DAY_MS, -1)
+        deadline = numpy.where(entered, window_start + self.window_ms - (self.mode == 'unordered'), -1)
+
+        reached_time, reached_rank = entry_time, entry_rank
+
+        for step in range(len(self._steps)):
+            if step > 0:
+                selected = steps == step
+                step_users, step_times, step_ranks = users[selected], times[selected], ranks[selected]
+                in_window = (reached_rank[step_users] != never) & (step_times <= deadline[step_users])
+
+                if self.mode == 'ordered':
+                    in_window &= step_ranks > reached_rank[step_users]
+                else:
+                    in_window &= step_times >= window_start[step_users]
+
+                first_time = numpy.full(n_users, never)
+                first_rank = numpy.full(n_users, never)
+                numpy.minimum.at(first_time, step_users[in_window], step_times[in_window])
+                numpy.minimum.at(first_rank, step_users[in_window], step_ranks[in_window])
+
+                if self.mode == 'unordered':
+                    # The step is reached once all the previous ones are.
+                    first_time = numpy.where(first_time == never, never,
+                                             numpy.maximum(first_time, reached_time))
+
+                converted = first_time != never
+                transitions.add(step, group[converted], first_time[converted] - reached_time[converted])
+                reached_time, reached_rank = first_time, numpy.where(converted, first_rank, never)
+
+            converted = reached_time != never
+            counts[:, step] += numpy.bincount(group[converted], minlength=counts.shape[0])
+            cells = group[converted] * self.n_days + day[converted]
+            day_counts[:, :, step] += numpy.bincount(cells, minlength=day_counts[:, :, 0].size).reshape(
+                day_counts.shape[:2])
+
+    def _response(self, counts, day_counts, transitions):
+        numpy = _numpy()
+        dates = [str(numpy.datetime64(self._start_ms + d * DAY_MS, 'ms').astype('datetime64[D]'))
+                 for d in range(self.n_days)]
+        labels = sorted(self._groups, key=self._groups.get) if self._groups else [None]
+
+        data = []
+        for group, label in sorted(enumerate(labels), key=lambda item: str(item[1])):
+            raw = [int(count) for count in counts[group]]
+            median, average = [0], [0]
+
+            for step in range(1, len(raw)):
+                median.append(transitions.median(step, group))
+                average.append(transitions.average(step, group))
+
+            data.append({'meta': {'segmentIndex': 0} if label is None else {'segmentIndex': 0, 'groupBy': label},
+                         'events': list(self.events),
+                         'cumulativeRaw': raw,
+                         'cumulative': [_ratio(count, raw[0]) for count in raw],
+                         'stepByStep': [1.0 if raw[0] else 0.0] +
+                                       [_ratio(raw[k], raw[k - 1]) for k in range(1, len(raw))],
+                         'medianTransTimes': median,
+                         'avgTransTimes': average,
+                         'dayFunnels': {'xValues': dates,
+                                        'series': [[int(count) for count in day] for day in day_counts[group]]}})
+
+        return {'data': data}
+
+
+class _Transitions(object):
+    """ Transition times to each step, by group: their sum and number, and
+        the counts of their distinct durations in seconds, so memory is
+        bounded by the conversion window rather than by the users."""
+
+    def __init__(self, n_groups, n_steps):
+        numpy = _numpy()
+        self.sums = numpy.zeros((n_groups, n_steps))
+        self.numbers = numpy.zeros((n_groups, n_steps), dtype=numpy.int64)
+        self.keys = [numpy.zeros(0, dtype=numpy.int64) for _ in range(n_steps)]
+        self.counts = [numpy.zeros(0, dtype=numpy.int64) for _ in range(n_steps)]
+
+    def add(self, step, groups, durations):
+        """ Add the durations (ms) of the users of groups reaching step."""
+        numpy = _numpy()
+        numpy.add.at(self.sums[:, step], groups, durations)
+        self.numbers[:, step] += numpy.bincount(groups, minlength=len(self.numbers))
+
+        keys = (groups << DURATION_BITS) | ((durations + 500) // 1000)
+        keys, inverse = numpy.unique(numpy.concatenate([self.keys[step], keys]), return_inverse=True)
+        weights = numpy.concatenate([self.counts[step], numpy.ones(len(groups), dtype=numpy.int64)])
+        self.keys[step] = keys
+        self.counts[step] = numpy.bincount(inverse.ravel(), weights=weights, minlength=len(keys)).astype(numpy.int64)
+
+    def average(self, step, group):
+        number = self.numbers[group, step]
+        return int(self.sums[group, step] / number) if number else 0
+
+    def median(self, step, group):
+        """ Median duration (ms) of a group, from the counts of its
+            durations in seconds."""
+        numpy = _numpy()
+        selected = (self.keys[step] >> DURATION_BITS) == group
+        seconds = self.keys[step][selected] & ((1 << DURATION_BITS) - 1)
+        cumulative = numpy.cumsum(self.counts[step][selected])
+
+        if len(cumulative) == 0:
+            return 0
+
+        total = int(cumulative[-1])
+        middle = seconds[numpy.searchsorted(cumulative, [(total + 1) // 2, total // 2 + 1])]
+
+        return int(middle.mean() * 1000)
+
+
+def _ratio(count, total):
+    return float(count) / total if total else 0.0
+
+
+def local_funnel(source, e, start, end, **kwargs):
+    """ Shortcut for LocalFunnel(e, start, end, **kwargs)
+        .add_events(source).result()."""
+    with LocalFunnel(e, start, end, **kwargs) as funnel:
+        return funnel.add_events(source).result()
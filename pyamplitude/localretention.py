@@ -0,0 +1,253 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Retention computed locally, with NumPy, from exported events.
+
+    AmplitudeRestApi.get_retention is the most expensive query (cost 8 per
+    day and condition). LocalRetention takes the same arguments, reads events
+    exported with AmplitudeExportApi (see exportedevents.py) and returns a
+    response of the same shape, without spending any query budget:
+
+        retention = LocalRetention(se=Event('open_app'), re=Event('purchase'),
+                                   start='20170801', end='20170831')
+        response = retention.add_events('export/').result()
+
+    Definitions:
+
+        Cohorts     A user belongs to the cohort of every day (or interval
+                    of 7 / 30 days from start) between start and end on which
+                    they performed the start event, and matched the segments
+                    at that event. Group by values are read from that event.
+                    With se=Event('_new'), users only belong to the cohort of
+                    the day they were created (user_creation_time).
+        n-day       Day N counts the cohort users performing the return event
+                    N days (intervals) after their cohort's. Day 0 is the
+                    cohort size.
+        rolling     Unbounded retention: day N counts the users returning on
+                    day N or later.
+        bracket     One value per [first, last + 1) bracket of days in rb,
+                    counting the users returning on any day of the bracket.
+
+    Return events after end are counted, up to the last day of the exported
+    data; each cohort only lists the days available for it.
+
+    Events are processed in chunks (chunk_size events). Each chunk is reduced
+    to unique (user, day) pairs of start and return events, so memory grows
+    with the number of active users and days, not with the number of events.
+"""
+
+from .lazyimport import LazyModule
+from .exportedevents import (DEFAULT_CHUNK_SIZE, UserIndex, event_days, event_predicate,
+                             group_by_property, iter_chunks, iter_events, parse_day,
+                             segment_predicate, user_property, _numpy)
+
+json = LazyModule('simplejson')
+
+# Periods take the low bits of the (user, period) keys.
+PERIOD_BITS = 20
+
+
+class LocalRetention(object):
+    """ Args:
+            Same as AmplitudeRestApi.get_retention (se, re, start, end, rm,
+            rb, interval, segment_definitions, group_by), plus:
+            chunk_size (optional)   Events processed at once
+            (default: 1000000).
+    """
+
+    def __init__(self, se, re, start, end, rm='n-day', rb=None, interval=1,
+                 segment_definitions=[], group_by=None, chunk_size=DEFAULT_CHUNK_SIZE):
+
+        if rm not in ['bracket', 'rolling', 'n-day']:
+            raise ValueError('Pyamplitude Error: LocalRetention: rm must be "bracket", "rolling", or "n-day"')
+
+        if interval not in [1, 7, 30]:
+            raise ValueError('Pyamplitude Error: LocalRetention: interval must be 1, 7 or 30')
+
+        if rm == 'bracket':
+            if rb is None:
+                raise ValueError('Pyamplitude Error: LocalRetention: rb required for rm = "bracket"')
+            rb = _brackets(rb)
+
+        numpy = _numpy()
+
+        self.rm = rm
+        self.rb = rb
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.start_day = parse_day(start)
+        self.n_cohorts = int((parse_day(end) - self.start_day).astype(numpy.int64)) // interval + 1
+
+        self._is_start = event_predicate(se)
+        self._is_return = event_predicate(re)
+        self._in_segment = segment_predicate(segment_definitions)
+        self._group_by = group_by_property(group_by)
+
+        self._users = UserIndex()
+        self._groups = {}
+        self._starts = []
+        self._returns = []
+        self._stored = 0
+        self._compacted = 0
+        self._last_period = None
+
+    def add_events(self, source):
+        """ Process the events of an export source (see
+            exportedevents.iter_events). Can be called several times."""
+        for chunk in iter_chunks(iter_events(source), self.chunk_size):
+            self._add_chunk(chunk)
+
+        return self
+
+    def _add_chunk(self, chunk):
+        numpy = _numpy()
+        periods = (event_days(chunk) - self.start_day).astype(numpy.int64) // self.interval
+
+        last = int(periods.max())
+        self._last_period = last if self._last_period is None else max(self._last_period, last)
+
+        starts, returns = [], []
+
+        for event, period in zip(chunk, periods.tolist()):
+            if period < 0:
+                continue
+
+            if period < self.n_cohorts and self._is_start(event) and self._in_segment(event):
+                group = 0
+                if self._group_by is not None:
+                    value = str(user_property(event, self._group_by))
+                    group = self._groups.setdefault(value, len(self._groups))
+                starts.append((group, self._users(event), period))
+
+            if self._is_return(event):
+                returns.append((self._users(event) << PERIOD_BITS) | period)
+
+        if starts:
+            self._starts.append(numpy.unique(numpy.array(starts, dtype=numpy.int64), axis=0))
+            self._stored += len(self._starts[-1])
+        if returns:
+            self._returns.append(numpy.unique(numpy.array(returns, dtype=numpy.int64)))
+            self._stored += len(self._returns[-1])
+
+        if self._stored > 2 * max(self._compacted, self.chunk_size):
+            self._compact()
+
+    def _compact(self):
+        numpy = _numpy()
+
+        if self._starts:
+            self._starts = [numpy.unique(numpy.concatenate(self._starts), axis=0)]
+        if self._returns:
+            self._returns = [numpy.unique(numpy.concatenate(self._returns))]
+
+        self._stored = self._compacted = sum(len(a) for a in self._starts + self._returns)
+
+    def result(self):
+        """ The retention response, shaped like get_retention's."""
+        numpy = _numpy()
+        self._compact()
+
+        starts = self._starts[0] if self._starts else numpy.zeros((0, 3), dtype=numpy.int64)
+        returns = self._returns[0] if self._returns else numpy.zeros(0, dtype=numpy.int64)
+        groups, users, periods = starts[:, 0], starts[:, 1], starts[:, 2]
+
+        n_groups = max(len(self._groups), 1)
+        last_period = self._last_period if self._last_period is not None else self.n_cohorts - 1
+        n_columns = max(last_period + 1, 1)
+        cells = groups * self.n_cohorts + periods
+        outof = numpy.bincount(cells, minlength=n_groups * self.n_cohorts)
+
+        if self.rm == 'bracket':
+            counts = [self._returned_within(users, periods, returns, cells, first, last)
+                      for first, last in self.rb]
+        elif self.rm == 'rolling':
+            counts = [outof] + self._returned_after(users, periods, returns, cells, n_columns)
+        else:
+            keys = (users << PERIOD_BITS) | periods
+            counts = [outof] + [self._count(cells, _contains(returns, keys + k))
+                                for k in range(1, n_columns)]
+
+        return self._response(outof, counts, last_period)
+
+    def _count(self, cells, hits):
+        numpy = _numpy()
+        return numpy.bincount(cells, weights=hits, minlength=max(len(self._groups), 1) * self.n_cohorts)
+
+    def _returned_within(self, users, periods, returns, cells, first, last):
+        numpy = _numpy()
+        keys = (users << PERIOD_BITS) | periods
+        hits = numpy.zeros(len(keys), dtype=bool)
+
+        for k in range(first, last):
+            hits |= _contains(returns, keys + k)
+
+        return self._count(cells, hits)
+
+    def _returned_after(self, users, periods, returns, cells, n_columns):
+        """ Counts of day 1..n_columns - 1 of unbounded retention."""
+        numpy = _numpy()
+        last_return = numpy.full(max(len(self._users), 1), -1, dtype=numpy.int64)
+        numpy.maximum.at(last_return, returns >> PERIOD_BITS, returns & ((1 << PERIOD_BITS) - 1))
+        delay = last_return[users] - periods
+
+        return [self._count(cells, delay >= k) for k in range(1, n_columns)]
+
+    def _response(self, outof, counts, last_period):
+        numpy = _numpy()
+        dates = [str(self.start_day + numpy.timedelta64(p * self.interval, 'D')) for p in range(self.n_cohorts)]
+        labels = sorted(self._groups, key=self._groups.get) if self._groups else [None]
+
+        series, meta = [], []
+        for group, label in sorted(enumerate(labels), key=lambda item: str(item[1])):
+            values, combined = {}, []
+
+            for p, day in enumerate(dates):
+                cell = group * self.n_cohorts + p
+                available = len(counts) if self.rm == 'bracket' else max(last_period - p + 1, 0)
+                values[day] = [{'count': int(counts[k][cell]), 'outof': int(outof[cell])}
+                               for k in range(available)]
+
+                for k, value in enumerate(values[day]):
+                    if k == len(combined):
+                        combined.append({'count': 0, 'outof': 0})
+                    combined[k]['count'] += value['count']
+                    combined[k]['outof'] += value['outof']
+
+            series.append({'dates': dates, 'values': values, 'combined': combined})
+            meta.append({'segmentIndex': 0} if label is None else {'segmentIndex': 0, 'groupBy': label})
+
+        return {'data': {'series': series, 'seriesMeta': meta}}
+
+
+def _contains(sorted_keys, keys):
+    """ Boolean array: which keys are in the sorted unique array."""
+    numpy = _numpy()
+
+    if len(sorted_keys) == 0:
+        return numpy.zeros(len(keys), dtype=bool)
+
+    positions = numpy.minimum(numpy.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+
+    return sorted_keys[positions] == keys
+
+
+def _brackets(rb):
+    """ rb as a list of [first, last + 1) pairs: '[[0,5],[5,8]]', [[0, 5]]
+        or [0, 5]."""
+    if isinstance(rb, str):
+        rb = json.loads(rb)
+
+    if len(rb) == 2 and all(isinstance(day, int) for day in rb):
+        rb = [rb]
+
+    for first, last in rb:
+        if not 0 <= first < last:
+            raise ValueError('Pyamplitude Error: LocalRetention: invalid bracket ' + str([first, last]))
+
+    return [(int(first), int(last)) for first, last in rb]
+
+
+def local_retention(source, se, re, start, end, **kwargs):
+    """ Shortcut for LocalRetention(se, re, start, end, **kwargs)
+        .add_events(source).result()."""
+    return LocalRetention(se, re, start, end, **kwargs).add_events(source).result()
@@ -0,0 +1,219 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Metrics hooks of the api classes.
+
+    AmplitudeRestApi, AsyncAmplitudeRestApi, AmplitudeExportApi,
+    BehavioralCohortsApi and AmplitudeRedshift take a metrics argument, a
+    MetricsHook receiving:
+
+        latency_seconds   histogram, labels client, endpoint and phase:
+                          'throttle' (waiting for the rate limiter),
+                          'network' (sending the request and reading the
+                          response, retries included), 'transfer' (writing
+                          the streamed body of an export), 'decode' (parsing
+                          the response), 'query' (Redshift queries) and
+                          'total' (the whole call, cache hits included).
+        responses         counter, labels client, endpoint and status, one
+                          per response received (throttled 429 included).
+        retries           counter, labels client, endpoint and status.
+        backoff_seconds   histogram, labels client, endpoint and status, the
+                          delay slept before each retry.
+        bytes_received    counter, labels client and endpoint.
+        rows_received     counter (Redshift), labels client and endpoint.
+        cache_hits        counter, labels client, endpoint and cache
+        cache_misses      ('memory' or 'disk').
+        cost_spent        counter, labels client and endpoint, the query
+                          cost of the requests sent to Amplitude.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                           1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+COUNTER = 'counter'
+HISTOGRAM = 'histogram'
+
+
+class MetricsHook(object):
+    """ Receives the metrics of an api instance and drops them. Subclass it
+        and override increment and observe to collect them."""
+
+    def increment(self, name, value=1, **labels):
+        """ Add value to the counter name."""
+        pass
+
+    def observe(self, name, value, **labels):
+        """ Record value in the histogram name."""
+        pass
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """ Observe the seconds spent in the with block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+
+class _Histogram(object):
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for n, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[n] += 1
+
+
+class InMemoryCollector(MetricsHook):
+    """ Keeps every counter and histogram in memory, one series per label
+        set, to be asserted against or exported with prometheus_text.
+
+        Usage:
+
+            metrics = InMemoryCollector()
+            api = AmplitudeRestApi(..., metrics=metrics)
+            ...
+            metrics.value('cache_hits', endpoint='users')
+            metrics.histogram('latency_seconds', phase='network')['count']
+    """
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1, **labels):
+        key = (name, _label_items(labels))
+
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_items(labels))
+
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    def value(self, name, **labels):
+        """ Sum of the counter series name matching labels."""
+        with self._lock:
+            return sum(value for (counter, items), value in self._counters.items()
+                       if counter == name and _matches(items, labels))
+
+    def histogram(self, name, **labels):
+        """ The histogram series name matching labels merged in a dict with
+            'count', 'sum' and 'buckets' (upper bound -> cumulative count)."""
+        merged = {'count': 0, 'sum': 0.0, 'buckets': dict((b, 0) for b in self.buckets)}
+
+        with self._lock:
+            for (histogram_name, items), histogram in self._histograms.items():
+                if histogram_name != name or not _matches(items, labels):
+                    continue
+                merged['count'] += histogram.count
+                merged['sum'] += histogram.sum
+                for bound, count in zip(self.buckets, histogram.bucket_counts):
+                    merged['buckets'][bound] += count
+
+        return merged
+
+    def series(self):
+        """ List of (kind, name, labels dict, value) for every series, value
+            being a number for counters and a dict like histogram's for
+            histograms."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+
+            series = [(COUNTER, name, dict(items), value) for (name, items), value in counters]
+            for (name, items), histogram in histograms:
+                series.append((HISTOGRAM, name, dict(items),
+                               {'count': histogram.count, 'sum': histogram.sum,
+                                'buckets': dict(zip(self.buckets, histogram.bucket_counts))}))
+
+        return series
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def prometheus_text(collector, namespace='pyamplitude'):
+    """ The series of an InMemoryCollector in the Prometheus text exposition
+        format, counters suffixed with _total."""
+    lines = []
+    described = set()
+
+    for kind, name, labels, value in collector.series():
+        metric = namespace + '_' + name if namespace else name
+
+        if kind == COUNTER:
+            metric += '_total'
+
+        if metric not in described:
+            described.add(metric)
+            lines.append('# TYPE {} {}'.format(metric, kind))
+
+        if kind == COUNTER:
+            lines.append('{}{} {}'.format(metric, _format_labels(labels), _format_value(value)))
+            continue
+
+        for bound in sorted(value['buckets']):
+            bucket_labels = dict(labels, le=_format_value(bound))
+            lines.append('{}_bucket{} {}'.format(metric, _format_labels(bucket_labels),
+                                                 value['buckets'][bound]))
+        lines.append('{}_bucket{} {}'.format(metric, _format_labels(dict(labels, le='+Inf')),
+                                             value['count']))
+        lines.append('{}_sum{} {}'.format(metric, _format_labels(labels), _format_value(value['sum'])))
+        lines.append('{}_count{} {}'.format(metric, _format_labels(labels), value['count']))
+
+    return '\n'.join(lines) + '\n'
+
+
+def _label_items(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _matches(items, labels):
+    items = dict(items)
+
+    for name, value in labels.items():
+        if items.get(name) != str(value):
+            return False
+
+    return True
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+
+    pairs = []
+    for name in sorted(labels):
+        value = str(labels[name]).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append('{}="{}"'.format(name, value))
+
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float) and value == int(value):
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+
+    return str(value)
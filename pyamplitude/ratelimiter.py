@@ -0,0 +1,173 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from collections import deque
+
+# Dashboard REST API limits, see:
+# https://amplitude.zendesk.com/hc/en-us/articles/205469748-Dashboard-Rest-API-Export-Amplitude-Dashboard-Data#request-limits
+HOURLY_COST_BUDGET = 108000
+HOURLY_USER_QUERIES = 360
+
+USER_ENDPOINTS = ['useractivity', 'usersearch']
+
+BLOCK = 'block'
+QUEUE = 'queue'
+RAISE = 'raise'
+
+
+class RateLimitExceeded(Exception):
+    """ Raised by a RAISE mode QueryRateLimiter when a budget is exhausted."""
+    pass
+
+
+class TokenBucket(object):
+    """ A token bucket holding up to capacity tokens, refilled continuously
+        so that a full bucket is restored every period seconds."""
+
+    def __init__(self, capacity, period=3600, timer=time.monotonic):
+
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.timer = timer
+        self.tokens = self.capacity
+        self.updated_at = timer()
+
+    def refill(self):
+        now = self.timer()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount):
+        """ Seconds until amount tokens are available."""
+        self.refill()
+
+        if self.tokens >= amount:
+            return 0.0
+
+        return (amount - self.tokens) / self.rate
+
+
+class QueryRateLimiter(object):
+    """ Debits each request's query cost from an hourly cost budget, and each
+        User Activity / User Search request from a separate hourly query
+        budget, before the request is sent.
+
+        Args:
+            cost_budget (optional)   Cost available per period
+            (default: 108000, Amplitude's hourly limit).
+            user_budget (optional)   User Activity / User Search queries
+            available per period (default: 360).
+            period (optional)        Budget period in seconds (default: 3600).
+            mode (optional)          What to do when a budget is exhausted:
+                                     'block' waits until enough budget is
+                                     restored, 'queue' waits too but serves
+                                     waiting requests in arrival order, so
+                                     cheap requests can not starve expensive
+                                     ones, 'raise' raises RateLimitExceeded.
+
+        A limiter can be shared by several AmplitudeRestApi instances of the
+        same project so that all their workers draw from the same budget.
+    """
+
+    def __init__(self, cost_budget=HOURLY_COST_BUDGET, user_budget=HOURLY_USER_QUERIES,
+                 period=3600, mode=BLOCK, timer=time.monotonic):
+
+        if mode not in [BLOCK, QUEUE, RAISE]:
+            raise ValueError('Pyamplitude Error: QueryRateLimiter: mode must be "block", "queue" or "raise"')
+
+        self.mode = mode
+        self.cost_bucket = TokenBucket(cost_budget, period, timer)
+        self.user_bucket = TokenBucket(user_budget, period, timer)
+
+        self.spent = 0.0
+        self.waited = 0.0
+        self.rejected = 0
+
+        self._condition = threading.Condition()
+        self._waiting = deque()
+
+    def _bucket_for(self, endpoint, cost):
+        if endpoint in USER_ENDPOINTS:
+            return self.user_bucket, 1
+
+        return self.cost_bucket, cost
+
+    def try_acquire(self, endpoint, cost):
+        """ Debit the request if the budget allows it and return 0, otherwise
+            return the number of seconds to wait before trying again (or raise
+            in 'raise' mode)."""
+        bucket, amount = self._bucket_for(endpoint, cost)
+        self._check_amount(bucket, amount)
+
+        with self._condition:
+            wait = bucket.wait_time(amount)
+
+            if wait == 0:
+                self._debit(bucket, amount)
+            elif self.mode == RAISE:
+                self.rejected += 1
+                raise RateLimitExceeded('Pyamplitude Error: {} budget exhausted, {:.1f} seconds '
+                                        'until {} is available'.format(endpoint, wait, amount))
+
+            return wait
+
+    def acquire(self, endpoint, cost):
+        """ Debit the request, waiting for the budget to be restored if
+            needed (or raising in 'raise' mode)."""
+        bucket, amount = self._bucket_for(endpoint, cost)
+        self._check_amount(bucket, amount)
+
+        if self.mode != QUEUE:
+            wait = self.try_acquire(endpoint, cost)
+            while wait > 0:
+                self._sleep(wait)
+                wait = self.try_acquire(endpoint, cost)
+            return
+
+        ticket = object()
+
+        with self._condition:
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    if self._waiting[0] is ticket:
+                        wait = bucket.wait_time(amount)
+                        if wait == 0:
+                            self._debit(bucket, amount)
+                            return
+                    else:
+                        wait = None
+
+                    started = time.monotonic()
+                    self._condition.wait(wait)
+                    self.waited += time.monotonic() - started
+            finally:
+                self._waiting.remove(ticket)
+                self._condition.notify_all()
+
+    def remaining(self):
+        """ Budget currently available, as a dict."""
+        with self._condition:
+            self.cost_bucket.refill()
+            self.user_bucket.refill()
+
+            return {'cost': self.cost_bucket.tokens,
+                    'user_queries': self.user_bucket.tokens}
+
+    def _debit(self, bucket, amount):
+        bucket.tokens -= amount
+        self.spent += amount if bucket is self.cost_bucket else 0
+
+    def _sleep(self, seconds):
+        with self._condition:
+            started = time.monotonic()
+            self._condition.wait(seconds)
+            self.waited += time.monotonic() - started
+
+    @staticmethod
+    def _check_amount(bucket, amount):
+        if amount > bucket.capacity:
+            raise ValueError('Pyamplitude Error: query cost {} exceeds the whole budget of {}'.format(
+                amount, bucket.capacity))
@@ -0,0 +1,124 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_TTL_SEC = 60
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ResponseCache(object):
+    """ A thread-safe LRU cache with per-endpoint TTLs for parsed API responses.
+
+        Entries are evicted least recently used first whenever the cache holds
+        more than max_entries responses or more than max_bytes of response
+        bodies, and expire after the TTL of their endpoint.
+
+        Args:
+            max_entries (optional)   Maximum number of cached responses.
+            max_bytes (optional)     Maximum total size of the cached response
+            bodies, in bytes. Responses larger than this are never cached.
+            ttl (optional)           Default time to live in seconds.
+            endpoint_ttls (optional) A dict of endpoint -> ttl overriding the
+            default, e.g. {'realtime': 5, 'events/list': 3600}. An endpoint
+            such as 'sessions/length' falls back to the 'sessions' entry.
+
+        NOTE: cached responses are shared between callers and must be treated
+        as read-only.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES,
+                 ttl=CACHE_TTL_SEC, endpoint_ttls=None, timer=time.monotonic):
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.endpoint_ttls = endpoint_ttls or {}
+        self.timer = timer
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def ttl_for(self, endpoint):
+        """ Time to live for responses of the given endpoint."""
+        if endpoint in self.endpoint_ttls:
+            return self.endpoint_ttls[endpoint]
+
+        if endpoint is not None:
+            root = endpoint.split('/')[0]
+            if root in self.endpoint_ttls:
+                return self.endpoint_ttls[root]
+
+        return self.ttl
+
+    def get(self, key):
+        """ Return the cached response for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, size, value = entry
+
+            if expires_at <= self.timer():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def set(self, key, value, size, endpoint=None):
+        """ Cache a parsed response whose body was size bytes long."""
+        ttl = self.ttl_for(endpoint)
+
+        if ttl <= 0 or size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (self.timer() + ttl, size, value)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """ Return the cache counters as a dict."""
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'expirations': self.expirations,
+                    'entries': len(self._entries),
+                    'bytes': self._bytes}
+
+    def _remove(self, key):
+        expires_at, size, value = self._entries.pop(key)
+        self._bytes -= size
@@ -0,0 +1,222 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import random
+import threading
+import time
+from datetime import datetime
+
+# 429 is Amplitude's throttling answer, 5xx are transient server errors.
+# 400 and 401 are never retried, the same request would fail again.
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+NEVER_RETRY_STATUSES = [400, 401]
+
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY_SEC = 1.0
+DEFAULT_MAX_DELAY_SEC = 60.0
+DEFAULT_DEADLINE_SEC = 300.0
+
+# Transport errors worth retrying; requests' ConnectionError and Timeout are
+# OSErrors. call_async adds aiohttp.ClientError (server disconnected,
+# truncated payload...), which is not.
+TRANSIENT_ERRORS = (OSError,)
+
+
+class RetryPolicy(object):
+    """ Exponential backoff with full jitter for throttled (429) and failed
+        (5xx, connection errors) requests, shared by every api class.
+
+        Args:
+            max_attempts (optional)           Attempts per request, the first
+            one included (default: 4).
+            endpoint_max_attempts (optional)  A dict of endpoint -> attempts
+            overriding max_attempts, e.g. {'export': 6}. An endpoint such as
+            'sessions/length' falls back to the 'sessions' entry.
+            base_delay (optional)             Backoff of the first retry, in
+            seconds, doubled on every retry (default: 1).
+            max_delay (optional)              Maximum backoff (default: 60).
+            deadline (optional)               No retry is attempted if it would
+            end more than deadline seconds after the first attempt
+            (default: 300).
+            transient_errors (optional)       Exception types raised by send
+            that are retried as connection errors (default: OSError).
+
+        A Retry-After header sent with the response is honored instead of the
+        computed backoff. Requests that are not idempotent (cohort upload)
+        are only retried on 429, as the server did not process them.
+
+        Counters:
+            retries           Number of retries.
+            backoff_seconds   Total time spent waiting before retries.
+            statuses          A dict of status code -> number of retried
+                              responses, connection errors count as None.
+    """
+
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, endpoint_max_attempts=None,
+                 base_delay=DEFAULT_BASE_DELAY_SEC, max_delay=DEFAULT_MAX_DELAY_SEC,
+                 deadline=DEFAULT_DEADLINE_SEC, retry_statuses=RETRY_STATUSES,
+                 transient_errors=TRANSIENT_ERRORS, timer=time.monotonic, sleep=time.sleep):
+
+        self.max_attempts = max_attempts
+        self.endpoint_max_attempts = endpoint_max_attempts or {}
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retry_statuses = [s for s in retry_statuses if s not in NEVER_RETRY_STATUSES]
+        self.transient_errors = tuple(transient_errors)
+        self.timer = timer
+        self.sleep = sleep
+
+        self.retries = 0
+        self.backoff_seconds = 0.0
+        self.statuses = {}
+
+        self._lock = threading.Lock()
+
+    def max_attempts_for(self, endpoint):
+        if endpoint in self.endpoint_max_attempts:
+            return self.endpoint_max_attempts[endpoint]
+
+        root = str(endpoint).split('/')[0]
+
+        return self.endpoint_max_attempts.get(root, self.max_attempts)
+
+    def backoff(self, retry, response=None):
+        """ Seconds to wait before the given retry (0 for the first one)."""
+        retry_after = self._retry_after(response)
+
+        if retry_after is not None:
+            return retry_after
+
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry)))
+
+    def call(self, endpoint, send, idempotent=True, on_retry=None):
+        """ Call send() until it returns a response that should not be
+            retried, and return it. A connection error raised by the last
+            attempt is re-raised. on_retry(status, delay) is called before
+            each retry, status being None for a connection error."""
+        started = self.timer()
+        attempt = 0
+
+        while True:
+            error = None
+            try:
+                response = send()
+            except self.transient_errors as e:
+                response, error = None, e
+
+            delay = self._next_delay(endpoint, response, error, idempotent, attempt, started)
+
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+
+            if on_retry is not None:
+                on_retry(_status_code(response) if response is not None else None, delay)
+
+            self.sleep(delay)
+            attempt += 1
+
+    async def call_async(self, endpoint, send, idempotent=True, on_retry=None):
+        """ Same as call, for a coroutine function send."""
+        import asyncio
+
+        errors = self.transient_errors + _aiohttp_errors()
+        started = self.timer()
+        attempt = 0
+
+        while True:
+            error = None
+            try:
+                response = await send()
+            except errors as e:
+                response, error = None, e
+
+            delay = self._next_delay(endpoint, response, error, idempotent, attempt, started)
+
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+
+            if on_retry is not None:
+                on_retry(_status_code(response) if response is not None else None, delay)
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self):
+        """ Return the counters as a dict."""
+        with self._lock:
+            return {'retries': self.retries,
+                    'backoff_seconds': self.backoff_seconds,
+                    'statuses': dict(self.statuses)}
+
+    def _next_delay(self, endpoint, response, error, idempotent, attempt, started):
+        """ Delay before the next attempt, or None if there is none."""
+        status = None if response is None else _status_code(response)
+
+        if error is None:
+            retry_statuses = self.retry_statuses if idempotent else [429]
+            if status not in retry_statuses:
+                return None
+        elif not idempotent:
+            return None
+
+        if attempt + 1 >= self.max_attempts_for(endpoint):
+            return None
+
+        delay = self.backoff(attempt, response)
+
+        if self.timer() - started + delay > self.deadline:
+            return None
+
+        with self._lock:
+            self.retries += 1
+            self.backoff_seconds += delay
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+        return delay
+
+    @staticmethod
+    def _retry_after(response):
+        if response is None:
+            return None
+
+        value = response.headers.get('Retry-After')
+
+        if value is None:
+            return None
+
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+
+        from email.utils import parsedate_to_datetime
+
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+
+        return max(0.0, (retry_at - datetime.now(retry_at.tzinfo)).total_seconds())
+
+
+def _aiohttp_errors():
+    try:
+        import aiohttp
+    except ImportError:
+        return ()
+    return (aiohttp.ClientError,)
+
+
+def _status_code(response):
+    """ Status of a requests (status_code) or aiohttp (status) response."""
+    status = getattr(response, 'status_code', None)
+
+    if status is None:
+        status = getattr(response, 'status', None)
+
+    return status
@@ -0,0 +1,69 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import threading
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """ Coalesces concurrent identical calls.
+
+        The first caller of do(key, function) runs function; callers arriving
+        with the same key while it is running wait for it and share its
+        result (or its exception) instead of running it again.
+
+        Counters:
+            calls       Number of do calls.
+            coalesced   Number of calls answered by another caller's run.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def do(self, key, function):
+        with self._lock:
+            self.calls += 1
+            call = self._in_flight.get(key)
+
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._in_flight[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+
+    def stats(self):
+        """ Return the counters as a dict."""
+        with self._lock:
+            return {'calls': self.calls,
+                    'coalesced': self.coalesced,
+                    'in_flight': len(self._in_flight)}
@@ -0,0 +1,168 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+""" Incremental parsing of large JSON objects received in chunks.
+
+    User Activity and cohort responses are a JSON object whose bulk is one or
+    more arrays (events, user_ids, amplitude_ids...). MemberParser yields the
+    object's members as (key, value) pairs, one pair per item of an array
+    value, as the chunks arrive: only the item being received is held in
+    memory, never the whole body.
+"""
+
+import codecs
+import re
+from .lazyimport import LazyModule
+
+json = LazyModule('simplejson')
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER_TAIL = re.compile(r'[0-9.eE+\-]*\Z')
+
+_START, _KEY, _COLON, _VALUE, _ITEM, _END = range(6)
+
+
+class MemberParser(object):
+    """ Push parser of the top-level members of a JSON object.
+
+        feed(chunk) returns the list of (key, value) pairs completed by the
+        chunk (bytes or text), close() those left once the body has been
+        received. A member whose value is an array produces one
+        (key, item) pair per item; an empty array produces none.
+
+        Usage:
+
+            parser = MemberParser()
+            for chunk in chunks:
+                for key, value in parser.feed(chunk):
+                    ...
+            for key, value in parser.close():
+                ...
+    """
+
+    def __init__(self, encoding='utf-8'):
+        self._text = codecs.getincrementaldecoder(encoding)()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._state = _START
+        self._key = None
+
+    def feed(self, chunk):
+        if isinstance(chunk, bytes):
+            chunk = self._text.decode(chunk)
+
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+
+        return list(self._parse(final=False))
+
+    def close(self):
+        """ Parse what is left, raises ValueError if the object is incomplete."""
+        self._buffer = self._buffer[self._pos:] + self._text.decode(b'', final=True)
+        self._pos = 0
+        members = list(self._parse(final=True))
+
+        if self._state != _END:
+            raise ValueError('Pyamplitude Error: truncated JSON response')
+
+        return members
+
+    def _parse(self, final):
+        buffer = self._buffer
+
+        while True:
+            pos = _WHITESPACE.match(buffer, self._pos).end()
+            self._pos = pos
+
+            if pos == len(buffer):
+                return
+
+            char = buffer[pos]
+            state = self._state
+
+            if state == _START:
+                self._expect(char, '{')
+                self._state, self._pos = _KEY, pos + 1
+
+            elif state == _COLON:
+                self._expect(char, ':')
+                self._state, self._pos = _VALUE, pos + 1
+
+            elif state == _KEY and char in ',}':
+                self._state = _END if char == '}' else _KEY
+                self._pos = pos + 1
+
+            elif state == _VALUE and char == '[':
+                self._state, self._pos = _ITEM, pos + 1
+
+            elif state == _ITEM and char in ',]':
+                self._state = _KEY if char == ']' else _ITEM
+                self._pos = pos + 1
+
+            elif state == _END:
+                raise ValueError('Pyamplitude Error: unexpected data after the JSON response')
+
+            else:
+                value, end = self._decode(buffer, pos, final)
+
+                if end is None:
+                    return
+
+                self._pos = end
+
+                if state == _KEY:
+                    self._key, self._state = value, _COLON
+                elif state == _VALUE:
+                    self._state = _KEY
+                    yield self._key, value
+                else:
+                    yield self._key, value
+
+    def _decode(self, buffer, pos, final):
+        """ The value starting at pos and its end, or (None, None) if more
+            data is needed to decode it."""
+        try:
+            value, end = self._decoder.raw_decode(buffer, pos)
+        except ValueError:
+            if final:
+                raise
+            return None, None
+
+        # A number followed by nothing but number characters may go on in
+        # the next chunk ('150' of '1500.5').
+        if (not final and isinstance(value, (int, float)) and
+                _NUMBER_TAIL.match(buffer, end)):
+            return None, None
+
+        return value, end
+
+    @staticmethod
+    def _expect(char, expected):
+        if char != expected:
+            raise ValueError('Pyamplitude Error: expected "{}" in JSON response, '
+                             'found "{}"'.format(expected, char))
+
+
+def iter_members(chunks, encoding='utf-8'):
+    """ Yields the (key, value) members of the JSON object received as
+        chunks, see MemberParser."""
+    parser = MemberParser(encoding)
+
+    for chunk in chunks:
+        for member in parser.feed(chunk):
+            yield member
+
+    for member in parser.close():
+        yield member
+
+
+def iter_body(response, chunk_size=CHUNK_SIZE):
+    """ Body chunks of a streamed requests (iter_content) or httpx
+        (iter_bytes) response."""
+    if hasattr(response, 'iter_content'):
+        return response.iter_content(chunk_size)
+
+    return response.iter_bytes(chunk_size)
@@ -1,9 +1,12 @@
 # !/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import contextlib
+import io
 import unittest
-from pyamplitude.apiresources  import ProjectsHandler
+from pyamplitude.apiresources  import ProjectsHandler, Event
 from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.benchmarks.stubserver import StubServer
 
 class Test_AmplitudeRestApi(unittest.TestCase):
 
@@ -303,5 +306,20 @@ class Test_AmplitudeRestApi(unittest.TestCase):
            self.assertTrue(str(element[aux]) == str(element[aux + 1]))
 
 
+class Test_LogQueryCost(unittest.TestCase):
+
+    def test_log_query_cost(self):
+        project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+        output = io.StringIO()
+
+        with StubServer() as server, contextlib.redirect_stdout(output):
+            api = AmplitudeRestApi(project, show_logs=False, log_query_cost=True, api_url=server.url)
+            api.get_events(start='20170801', end='20170803', events=[Event('open_app')])
+            api.get_average_session_length(start='20170801', end='20170803')
+            api.close()
+
+        self.assertEqual(output.getvalue().count('Calculated cost '), 2)
+
+
 if __name__ == '__main__':
     unittest.main()
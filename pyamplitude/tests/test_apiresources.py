@@ -0,0 +1,113 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+from pyamplitude.apiresources import Event, Segment, FrozenEvent, FrozenSegment, PreparedQuery
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.benchmarks.stubserver import StubServer
+
+
+class Test_FrozenResources(unittest.TestCase):
+
+    def test_frozen_segment(self):
+        segment = Segment().add_filter(prop='country', op='is', values=['argentina'])
+        frozen = segment.freeze()
+
+        self.assertTrue(isinstance(frozen, FrozenSegment))
+        self.assertTrue(isinstance(frozen, Segment))
+        self.assertEqual(str(frozen), str(segment))
+        self.assertEqual(frozen.filter_count(), 1)
+        self.assertTrue(frozen.freeze() is frozen)
+
+        segment.add_filter(prop='city', op='is', values=['cordoba'])
+        segment.filters[0]['values'].append('chile')
+        self.assertEqual(frozen.filter_count(), 1)
+        self.assertEqual(frozen.filters[0]['values'], ['argentina'])
+
+        self.assertRaises(AttributeError, frozen.add_filter, 'city', 'is', ['cordoba'])
+        with self.assertRaises(AttributeError):
+            frozen.filters = []
+
+    def test_frozen_event(self):
+        event = Event('open_app').add_filter('user', 'country', 'is', ['argentina'])
+        event.add_groupby('user', 'city')
+        frozen = event.freeze()
+
+        self.assertTrue(isinstance(frozen, FrozenEvent))
+        self.assertEqual(str(frozen), str(event))
+        self.assertEqual((frozen.filter_count(), frozen.groupby_count()), (1, 1))
+        self.assertRaises(AttributeError, frozen.add_measured_property, 'event', 'price')
+        self.assertRaises(AttributeError, frozen.add_groupby, 'user', 'platform')
+
+    def test_hash_and_equality(self):
+        first = Event('open_app').freeze()
+        second = Event('open_app').freeze()
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(set([first, second, Event('close_app').freeze()])), 2)
+        self.assertNotEqual(Segment().freeze(), PreparedQuery('[]', None, 1))
+
+    def test_prepared_query(self):
+        query = PreparedQuery('https://amplitude.com/api/2/users', [('start', '20170801')], 1)
+        same = PreparedQuery('https://amplitude.com/api/2/users', (('start', '20170801'),), 1)
+
+        self.assertEqual(query.params, (('start', '20170801'),))
+        self.assertEqual(query, same)
+        self.assertEqual(hash(query), hash(same))
+        self.assertTrue(query.key() is query.key())
+        self.assertEqual(PreparedQuery('https://amplitude.com/api/2/annotations', None, 1).params, ())
+        with self.assertRaises(AttributeError):
+            query.cost = 2
+
+
+class Test_FrozenQueries(unittest.TestCase):
+
+    def setUp(self):
+        self.project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+        self.params = []
+        self.server = StubServer(responder=self._respond).start()
+        self.api = AmplitudeRestApi(self.project, show_logs=False, log_query_cost=False,
+                                    api_url=self.server.url)
+
+    def tearDown(self):
+        self.api.close()
+        self.server.stop()
+
+    def _respond(self, path, params):
+        self.params.append(params)
+        return {'data': {'series': [[1]], 'seriesLabels': [0], 'xValues': ['2017-08-01']}}
+
+    def test_frozen_segments_in_queries(self):
+        segment = Segment().add_filter(prop='country', op='is', values=['argentina'])
+        mutable = self.api.prepare('get_active_and_new_user_count', start='20170801', end='20170801',
+                                   interval='1', segment_definitions=[segment])
+        frozen = self.api.prepare('get_active_and_new_user_count', start='20170801', end='20170801',
+                                  interval='1', segment_definitions=[segment.freeze()])
+
+        self.assertEqual(mutable, frozen)
+
+        self.api.execute(frozen)
+        self.api.execute(frozen)
+        self.api.get_active_and_new_user_count(start='20170801', end='20170801', interval='1',
+                                               segment_definitions=[segment])
+
+        # Executions of equal queries share a cache entry.
+        self.assertEqual(len(self.params), 1)
+        self.assertEqual(dict(self.params[0])['s'], '[{"prop": "country", "op": "is", "values": ["argentina"]}]')
+
+    def test_frozen_events_cost_the_same(self):
+        for group_bys in [[], ['city'], ['city', 'platform']]:
+            event = Event('open_app').add_filter('user', 'country', 'is', ['argentina'])
+            for prop in group_bys:
+                event.add_groupby('user', prop)
+
+            mutable = self.api.prepare('get_events', start='20170801', end='20170831', events=[event])
+            frozen = self.api.prepare('get_events', start='20170801', end='20170831', events=[event.freeze()])
+
+            self.assertEqual(frozen.cost, mutable.cost)
+            self.assertEqual(mutable, frozen)
+
+
+if __name__ == '__main__':
+    unittest.main()
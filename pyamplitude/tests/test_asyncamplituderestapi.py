@@ -0,0 +1,100 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import threading
+import time
+import unittest
+from pyamplitude.apiresources import Event, Segment
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.asyncamplituderestapi import AsyncAmplitudeRestApi
+from pyamplitude.benchmarks.stubserver import StubServer
+
+
+class _ConcurrencyProbe(object):
+    """ Responder recording the requests and how many run at the same time."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def __call__(self, path, params):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.requests.append((path, params))
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+
+        return {'path': path, 'params': params}
+
+
+class Test_AsyncAmplitudeRestApi(unittest.TestCase):
+
+    def setUp(self):
+        self.project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+
+    def _api(self, server, **kwargs):
+        return AsyncAmplitudeRestApi(self.project, show_logs=False, log_query_cost=False,
+                                     api_url=server.url, **kwargs)
+
+    def test_get_methods_share_the_sync_surface(self):
+        probe = _ConcurrencyProbe(delay=0)
+        segment = Segment().add_filter(prop='country', op='is', values=['argentina'])
+
+        async def scenario(api):
+            async with api:
+                return await api.get_events(start='20170801', end='20170802',
+                                            events=[Event('open_app')],
+                                            segment_definitions=[segment])
+
+        with StubServer(responder=probe) as server:
+            result = asyncio.run(scenario(self._api(server)))
+
+        self.assertEqual(result['path'], '/events/segmentation')
+        params = dict(result['params'])
+        self.assertEqual(params['e'], str(Event('open_app')))
+        self.assertEqual(params['start'], '20170801')
+
+    def test_validation_raises_before_awaiting(self):
+        with StubServer() as server:
+            api = self._api(server)
+            self.assertRaises(ValueError, api.get_events, start='20170802', end='20170801',
+                              events=[Event('open_app')])
+
+    def test_user_endpoints_concurrency_is_limited(self):
+        probe = _ConcurrencyProbe()
+
+        async def scenario(api):
+            async with api:
+                return await asyncio.gather(*[api.get_user_activity(user=str(n))
+                                              for n in range(15)])
+
+        with StubServer(responder=probe) as server:
+            results = asyncio.run(scenario(self._api(server, cache=False)))
+
+        self.assertEqual(len(results), 15)
+        self.assertEqual(len(probe.requests), 15)
+        self.assertTrue(probe.max_active <= 5)
+
+    def test_other_endpoints_run_concurrently(self):
+        probe = _ConcurrencyProbe()
+
+        async def scenario(api):
+            async with api:
+                return await asyncio.gather(*[api.get_average_session_length(start='201708%02d' % n,
+                                                                             end='20170831')
+                                              for n in range(1, 11)])
+
+        with StubServer(responder=probe) as server:
+            asyncio.run(scenario(self._api(server)))
+
+        self.assertTrue(probe.max_active > 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
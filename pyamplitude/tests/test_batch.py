@@ -0,0 +1,180 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import threading
+import unittest
+import simplejson as json
+from pyamplitude.apiresources import Event, Segment, PreparedQuery
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.batch import BatchExecutor, QuerySpec, split_events_response
+from pyamplitude.metrics import InMemoryCollector
+from pyamplitude.benchmarks.stubserver import StubServer
+
+
+class _Recorder(object):
+
+    def __init__(self):
+        self.paths = []
+        self.lock = threading.Lock()
+
+    def __call__(self, path, params):
+        with self.lock:
+            self.paths.append(path)
+        return {'path': path, 'params': params}
+
+
+class Test_BatchExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+        self.recorder = _Recorder()
+        self.server = StubServer(responder=self.recorder).start()
+        self.api = AmplitudeRestApi(self.project, show_logs=False, log_query_cost=False,
+                                    api_url=self.server.url)
+
+    def tearDown(self):
+        self.api.close()
+        self.server.stop()
+
+    def _specs(self):
+        event = Event('open_app')
+        segment = Segment().add_filter(prop='country', op='is', values=['argentina'])
+        return [QuerySpec('events', 'get_events',
+                          {'start': '20170801', 'end': '20170831', 'events': [event]}),
+                QuerySpec('same_events', 'get_events',
+                          {'start': '20170801', 'end': '20170831', 'events': [Event('open_app')]}),
+                QuerySpec('retention', 'get_retention',
+                          {'se': event, 're': event, 'start': '20170801', 'end': '20170802',
+                           'segment_definitions': [segment]}),
+                QuerySpec('sessions', 'get_average_session_length',
+                          {'start': '20170801', 'end': '20170802'}),
+                QuerySpec('annotations', 'get_annotations', priority=1)]
+
+    def test_prepare_does_not_send(self):
+        query = self.api.prepare('get_events', start='20170801', end='20170811',
+                                 events=[Event('open_app')])
+        self.assertTrue(isinstance(query, PreparedQuery))
+        self.assertEqual(query.cost, 10)
+        self.assertEqual(self.recorder.paths, [])
+        self.assertEqual(self.api.execute(query)['path'], '/events/segmentation')
+
+    def test_plan_dedupes_and_orders(self):
+        plan = BatchExecutor(self.api).plan(self._specs())
+        self.assertEqual([p.names for p in plan],
+                         [['annotations'], ['sessions'], ['retention'], ['events', 'same_events']])
+
+    def test_run_returns_every_name(self):
+        executor = BatchExecutor(self.api, max_workers=1)
+        results = executor.run(self._specs())
+
+        self.assertEqual(sorted(results), ['annotations', 'events', 'retention', 'same_events', 'sessions'])
+        self.assertTrue(results['events'] is results['same_events'])
+        self.assertEqual(self.recorder.paths, ['/annotations', '/sessions/average',
+                                               '/retention', '/events/segmentation'])
+        self.assertEqual((executor.submitted, executor.deduplicated), (4, 1))
+
+    def test_failures_are_isolated_with_return_exceptions(self):
+        specs = self._specs()
+        specs[3].kwargs['end'] = 'yesterday'
+        self.assertRaises(ValueError, BatchExecutor(self.api).run, specs)
+
+        specs = [QuerySpec('realtime', 'get_realtime_active_users'),
+                 QuerySpec('missing', 'get_user_search', {'user': '1'})]
+        self.server.stop()
+        self.server = StubServer(responder=self._failing_responder).start()
+        self.api.api_url = self.server.url
+        results = BatchExecutor(self.api).run(specs, return_exceptions=True)
+        self.assertEqual(results['realtime']['path'], '/realtime')
+        self.assertTrue(isinstance(results['missing'], Exception))
+
+    @staticmethod
+    def _failing_responder(path, params):
+        if path == '/usersearch':
+            return 500, {'error': 'boom'}
+        return {'path': path}
+
+
+def _segmentation_responder(path, params):
+    """ One series per event (e, e2) and group by value, labelled like
+        Amplitude does."""
+    events = [json.loads(value) for name, value in params if name in ['e', 'e2']]
+    series, labels, collapsed = [], [], []
+
+    for index, event in enumerate(events):
+        for group in event['group_by'] and ['ios', 'android'] or [None]:
+            value = len(event['event_type']) + (10 if group == 'android' else 0)
+            series.append([value, value])
+            labels.append([index, group] if group else index)
+            collapsed.append([{'setId': '', 'value': 2 * value}])
+
+    return {'data': {'series': series, 'seriesLabels': labels, 'seriesCollapsed': collapsed,
+                     'xValues': ['2017-08-01', '2017-08-02']}}
+
+
+class Test_EventMerging(unittest.TestCase):
+
+    def setUp(self):
+        self.project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+        self.server = StubServer(responder=_segmentation_responder).start()
+        self.metrics = InMemoryCollector()
+        self.api = AmplitudeRestApi(self.project, show_logs=False, log_query_cost=False,
+                                    api_url=self.server.url, metrics=self.metrics, cache=False)
+
+    def tearDown(self):
+        self.api.close()
+        self.server.stop()
+
+    def _specs(self, method='get_events'):
+        kwargs = {'start': '20170801', 'end': '20170802'}
+        return [QuerySpec(name, method, dict(kwargs, events=[Event(name)]))
+                for name in ['open', 'login', 'search']]
+
+    def test_single_event_queries_are_paired(self):
+        executor = BatchExecutor(self.api)
+        specs = self._specs() + [QuerySpec('weekly', 'get_events',
+                                           {'start': '20170801', 'end': '20170802', 'interval': '7',
+                                            'events': [Event('share')]})]
+        plan = executor.plan(specs)
+
+        self.assertEqual(sorted(p.names for p in plan), [['open', 'login'], ['search'], ['weekly']])
+        self.assertEqual(executor.merged, 1)
+
+        results = executor.run(specs)
+        alone = BatchExecutor(self.api, merge_events=False).run(self._specs())
+
+        self.assertEqual(results['open']['data']['series'], [[4, 4]])
+        self.assertEqual(results['login']['data']['series'], [[5, 5]])
+        self.assertEqual(results['login']['data']['seriesCollapsed'], [[{'setId': '', 'value': 10}]])
+        for name in ['open', 'login', 'search']:
+            self.assertEqual(results[name], alone[name])
+
+        # 3 requests for 4 queries, then 3 for the 3 queries sent alone.
+        self.assertEqual(self.metrics.value('responses', endpoint='events/segmentation'), 6)
+
+    def test_grouped_series_are_split(self):
+        response = _segmentation_responder('/events/segmentation', [
+            ('e', str(Event('open').add_groupby('user', 'platform'))),
+            ('e2', str(Event('search').add_groupby('user', 'platform')))])
+
+        self.assertEqual(split_events_response(response, 1)['data']['series'], [[6, 6], [16, 16]])
+        self.assertEqual(split_events_response(response, 1)['data']['seriesLabels'],
+                         [[0, 'ios'], [0, 'android']])
+        self.assertEqual(split_events_response(response, 0)['data']['xValues'], ['2017-08-01', '2017-08-02'])
+
+    def test_property_metrics_are_merged_but_not_histograms(self):
+        executor = BatchExecutor(self.api)
+        plan = executor.plan(self._specs('get_property_metrics'))
+        self.assertEqual(len(plan), 2)
+        self.assertEqual(sum(p.query.cost for p in plan),
+                         sum(self.api.prepare('get_property_metrics', **spec.kwargs).cost
+                             for spec in self._specs('get_property_metrics')))
+
+        specs = self._specs('get_property_metrics')
+        for spec in specs:
+            spec.kwargs['mode'] = 'histogram'
+        self.assertEqual(len(executor.plan(specs)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
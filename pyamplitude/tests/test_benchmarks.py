@@ -0,0 +1,68 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import gzip
+import io
+import unittest
+import zipfile
+import requests
+from pyamplitude.benchmarks.mockserver import MockAmplitudeServer
+from pyamplitude.benchmarks import suite
+
+
+class Test_MockAmplitudeServer(unittest.TestCase):
+
+    def test_endpoints(self):
+        with MockAmplitudeServer(labels=3, events_per_hour=5, cohort_size=4) as server:
+            users = requests.get(server.rest_url + 'users', params={'start': '20170801',
+                                                                   'end': '20170810'}).json()
+            self.assertEqual(len(users['data']['series']), 3)
+            self.assertEqual(len(users['data']['xValues']), 10)
+
+            realtime = requests.get(server.rest_url + 'realtime').json()
+            self.assertEqual(realtime['data']['seriesLabels'], ['Today', 'Yesterday'])
+
+            export = requests.get(server.export_url, params={'start': '20170801T00',
+                                                             'end': '20170801T02'})
+            archive = zipfile.ZipFile(io.BytesIO(export.content))
+            self.assertEqual(len(archive.namelist()), 3)
+            lines = gzip.decompress(archive.read(archive.namelist()[0])).splitlines()
+            self.assertEqual(len(lines), 5)
+
+            cohort = requests.get(server.cohorts_url + '/abc').json()
+            self.assertEqual(cohort['amplitude_ids'], [0, 1, 2, 3])
+
+            requests.post(server.cohorts_url + '/upload', json={'ids': [1, 2]})
+            self.assertEqual(server.uploaded_ids, 2)
+
+    def test_throttle_injection(self):
+        with MockAmplitudeServer(throttle_rate=0.5, seed=1) as server:
+            statuses = [requests.get(server.rest_url + 'users').status_code for _ in range(40)]
+
+        self.assertEqual(statuses.count(429), server.throttled)
+        self.assertTrue(5 < server.throttled < 35)
+
+
+class Test_Suite(unittest.TestCase):
+
+    def test_run_and_compare(self):
+        results = suite.Suite(calls=3, cohort_size=10).run(['make_request', 'throttled', 'export_decode'])
+
+        self.assertEqual(sorted(results['results']), ['export_decode', 'make_request', 'throttled'])
+        self.assertEqual(results['results']['make_request']['calls'], 3)
+        self.assertTrue(results['results']['export_decode']['archive_bytes'] > 0)
+
+        slower = {'results': dict((name, dict(r, p50_ms=r['p50_ms'] * 2))
+                                  for name, r in results['results'].items())}
+        rows = suite.compare(slower, results, tolerance=0.25)
+        self.assertTrue(all(row[4] for row in rows))
+        self.assertFalse(any(row[4] for row in suite.compare(results, results)))
+
+    def test_percentile(self):
+        self.assertEqual(suite.percentile([3, 1, 2, 4, 5], 50), 3)
+        self.assertEqual(suite.percentile(list(range(101)), 99), 99)
+        self.assertEqual(suite.percentile([], 99), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import numpy
+import simplejson as json
+from pyamplitude import columnar
+from pyamplitude.apiresources import Event
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.benchmarks.stubserver import StubServer
+
+SERIES_RESPONSE = {'data': {'series': [[1, 2, 3], [-4, 5.5, 60000]],
+                            'seriesLabels': [[0, 'ios'], [0, 'android']],
+                            'xValues': ['2017-08-01', '2017-08-02', '2017-08-03']}}
+
+RETENTION_RESPONSE = {'data': {'series': [{'dates': ['2017-08-01', '2017-08-02'],
+                                           'values': {'2017-08-01': [{'count': 10, 'outof': 10},
+                                                                     {'count': 4, 'outof': 10}],
+                                                      '2017-08-02': [{'count': 8, 'outof': 8}]}}],
+                               'seriesMeta': [{'segmentIndex': 0}]}}
+
+HOURLY_RESPONSE = {'data': {'series': [[3, 0, 7]], 'seriesLabels': [0],
+                            'xValues': ['2017-08-01T00:00:00', '2017-08-01T01:00:00', '2017-08-01T02:00:00']}}
+
+HISTOGRAM_RESPONSE = {'data': {'series': [[12, 5, 1]], 'seriesLabels': [0],
+                               'xValues': ['0-1', '1-2', '2-5']}}
+
+LTV_RESPONSE = {'data': {'series': [{'dates': ['2017-08-01'],
+                                     'values': {'2017-08-01': {'count': 12, 'r7d': 1.5,
+                                                               'r30d': 2.5, 'r1d': 0.5}}}],
+                         'seriesLabels': [0]}}
+
+
+class Test_Columnar(unittest.TestCase):
+
+    def test_decode_text_matches_decode(self):
+        text = json.dumps(SERIES_RESPONSE)
+        fast = columnar.decode_text(text)
+        slow = columnar.decode(SERIES_RESPONSE)
+
+        self.assertEqual(fast.values.shape, (2, 3))
+        self.assertTrue(numpy.array_equal(fast.values, slow.values))
+        self.assertTrue(numpy.array_equal(fast.index, slow.index))
+        self.assertEqual(fast.labels, [[0, 'ios'], [0, 'android']])
+        self.assertEqual(str(fast.index[0]), '2017-08-01')
+
+    def test_decode_text_falls_back_on_nulls(self):
+        response = {'data': {'series': [[1, None]], 'seriesLabels': [0],
+                             'xValues': ['2017-08-01', '2017-08-02']}}
+        result = columnar.decode_text(json.dumps(response))
+
+        self.assertEqual(result.values[0, 0], 1)
+        self.assertTrue(numpy.isnan(result.values[0, 1]))
+
+    def test_hourly_index_keeps_the_hour(self):
+        project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+
+        with StubServer(payload=HOURLY_RESPONSE) as server:
+            api = AmplitudeRestApi(project, show_logs=False, log_query_cost=False,
+                                   api_url=server.url, result_format='numpy')
+            result = api.get_events(start='20170801', end='20170801', events=[Event('open_app')],
+                                    interval=-3600000)
+            api.close()
+
+        self.assertEqual(len(set(result.index)), 3)
+        self.assertEqual(str(result.index[1]), '2017-08-01T01:00:00')
+        self.assertEqual(list(result.values[0]), [3, 0, 7])
+        self.assertTrue(numpy.array_equal(columnar.decode(HOURLY_RESPONSE).index, result.index))
+
+    def test_histogram_buckets(self):
+        project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+
+        with StubServer(payload=HISTOGRAM_RESPONSE) as server:
+            for result_format in ['numpy', 'pandas']:
+                api = AmplitudeRestApi(project, show_logs=False, log_query_cost=False,
+                                       api_url=server.url, result_format=result_format)
+                result = api.get_property_metrics(start='20170801', end='20170803',
+                                                  events=[Event('purchase')], mode='histogram')
+                api.close()
+
+                if result_format == 'numpy':
+                    self.assertEqual(list(result.index), ['0-1', '1-2', '2-5'])
+                    self.assertEqual(list(result.values[0]), [12, 5, 1])
+                else:
+                    self.assertEqual(result.index.name, 'bucket')
+                    self.assertEqual(result[0].loc['1-2'], 5)
+
+    def test_retention_and_ltv_shapes(self):
+        retention = columnar.decode(RETENTION_RESPONSE, columnar.RETENTION)
+        self.assertEqual(retention.values.shape, (1, 2, 3))
+        self.assertEqual(retention.columns, ['outof', 0, 1])
+        self.assertEqual(list(retention.values[0, 0]), [10, 10, 4])
+        self.assertEqual(list(retention.values[0, 1]), [8, 8, 0])
+
+        ltv = columnar.decode(LTV_RESPONSE, columnar.LTV)
+        self.assertEqual(ltv.columns, ['r1d', 'r7d', 'r30d', 'count'])
+        self.assertEqual(list(ltv.values[0, 0]), [0.5, 1.5, 2.5, 12])
+
+    def test_to_dataframe(self):
+        frame = columnar.decode(SERIES_RESPONSE).to_dataframe()
+        self.assertEqual(frame.shape, (3, 2))
+        self.assertEqual(frame['[0, "android"]'].iloc[2], 60000)
+
+        frame = columnar.decode(RETENTION_RESPONSE, columnar.RETENTION).to_dataframe()
+        self.assertEqual(frame.shape, (2, 3))
+
+    def test_rest_api_result_format(self):
+        project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+
+        with StubServer(payload=SERIES_RESPONSE) as server:
+            api = AmplitudeRestApi(project, show_logs=False, log_query_cost=False,
+                                   api_url=server.url, result_format='numpy')
+            result = api.get_events(start='20170801', end='20170803', events=[Event('open_app')])
+            again = api.get_events(start='20170801', end='20170803', events=[Event('open_app')])
+            api.close()
+
+            self.assertEqual(server.requests_served, 1)
+
+        self.assertTrue(isinstance(result, columnar.ColumnarResult))
+        self.assertTrue(again is result)
+        self.assertEqual(list(result.values[1]), [-4, 5.5, 60000])
+
+        with self.assertRaises(ValueError):
+            AmplitudeRestApi(project, show_logs=False, log_query_cost=False, result_format='csv')
+
+
+if __name__ == '__main__':
+    unittest.main()
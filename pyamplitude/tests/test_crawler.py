@@ -0,0 +1,126 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import simplejson as json
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.crawler import UserActivityCrawler, CrawlCheckpoint, JsonLinesSink
+from pyamplitude.benchmarks.stubserver import StubServer
+
+EVENTS_PER_USER = 7
+
+
+class _ActivityServer(object):
+    """ User n has EVENTS_PER_USER * n events, paged with offset/limit."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = []
+
+    def __call__(self, path, params):
+        params = dict(params)
+
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.requests.append(params)
+
+        time.sleep(0.01)
+
+        user = int(params['user'])
+        offset, limit = int(params.get('offset', 0)), int(params.get('limit', 1000))
+        events = [{'event_id': n} for n in range(EVENTS_PER_USER * user)][offset:offset + limit]
+
+        with self.lock:
+            self.in_flight -= 1
+
+        return {'userData': {'amplitude_id': user}, 'events': events}
+
+
+class Test_UserActivityCrawler(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+        self.activity = _ActivityServer()
+        self.server = StubServer(responder=self.activity).start()
+        self.api = AmplitudeRestApi(self.project, show_logs=False, log_query_cost=False,
+                                    api_url=self.server.url)
+
+    def tearDown(self):
+        self.api.close()
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def _read(self, path):
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_crawl(self):
+        path = os.path.join(self.directory, 'activity.jsonl')
+        sink = JsonLinesSink(path)
+        crawler = UserActivityCrawler(self.api, sink, page_size=5)
+        stats = crawler.run(iter(range(12)))
+        sink.close()
+
+        events = sum(EVENTS_PER_USER * n for n in range(12))
+        self.assertEqual(stats['users'], 12)
+        self.assertEqual(stats['events'], events)
+        self.assertEqual(self.activity.max_in_flight, 5)
+
+        lines = self._read(path)
+        self.assertEqual(len([line for line in lines if 'userData' in line]), 12)
+        user_3 = [line['event']['event_id'] for line in lines if line['user'] == 3 and 'event' in line]
+        self.assertEqual(user_3, list(range(21)))
+        self.assertTrue(all(int(r['limit']) == 5 for r in self.activity.requests))
+
+        # Budgeted from the crawler's own 360 per hour limiter.
+        remaining = crawler.rate_limiter.remaining()['user_queries']
+        self.assertAlmostEqual(remaining, 360 - len(self.activity.requests), delta=1)
+
+    def test_checkpoint_resume(self):
+        checkpoint_path = os.path.join(self.directory, 'crawl.checkpoint')
+        written = []
+
+        def failing_sink(user, key, value):
+            if user == 4 and key == 'events' and value['event_id'] == 12:
+                raise IOError('disk full')
+            written.append((user, key, value))
+
+        crawler = UserActivityCrawler(self.api, failing_sink, checkpoint=checkpoint_path, page_size=5)
+        crawler.run(range(6))
+        crawler.checkpoint.close()
+
+        self.assertEqual(list(crawler.failed), [4])
+        self.assertEqual(crawler.stats()['users'], 5)
+
+        checkpoint = CrawlCheckpoint(checkpoint_path)
+        self.assertTrue(checkpoint.offset(3) is None)
+        self.assertEqual(checkpoint.offset(4), 10)
+
+        del written[:]
+        self.activity.requests = []
+        crawler = UserActivityCrawler(self.api, lambda *member: written.append(member),
+                                      checkpoint=checkpoint)
+        stats = crawler.run(range(6))
+        checkpoint.close()
+
+        self.assertEqual((stats['users'], stats['skipped']), (1, 5))
+        self.assertEqual(self.activity.requests, [{'user': '4', 'offset': '10', 'limit': '1000'}])
+        self.assertEqual([value['event_id'] for user, key, value in written], list(range(10, 28)))
+
+    def test_invalid_options(self):
+        self.assertRaises(ValueError, UserActivityCrawler, self.api, None, page_size=1001)
+        self.assertRaises(ValueError, UserActivityCrawler, self.api, None, concurrency=6)
+
+
+if __name__ == '__main__':
+    unittest.main()
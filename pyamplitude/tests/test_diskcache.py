@@ -0,0 +1,79 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.diskcache import DiskCache
+from pyamplitude.benchmarks.stubserver import StubServer
+
+
+class Test_DiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite')
+        self.now = 1000.0
+        self.cache = self._open_cache()
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.directory)
+
+    def _open_cache(self):
+        return DiskCache(self.path, historical_ttl=1000, recent_ttl=10,
+                         today=lambda: date(2017, 8, 20), timer=lambda: self.now)
+
+    def test_key_is_canonical(self):
+        first = DiskCache.make_key('key', 'users', [('start', '20170801'), ('end', '20170802'),
+                                                    ('g', 'country'), ('g', 'city')])
+        second = DiskCache.make_key('key', 'users', [('g', 'country'), ('end', '20170802'),
+                                                     ('g', 'city'), ('start', '20170801')])
+        other = DiskCache.make_key('other', 'users', [('start', '20170801'), ('end', '20170802'),
+                                                      ('g', 'country'), ('g', 'city')])
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_ttl_for_date_ranges(self):
+        self.assertEqual(self.cache.ttl_for([('start', '20170801'), ('end', '20170810')]), 1000)
+        self.assertEqual(self.cache.ttl_for([('start', '20170801'), ('end', '20170819')]), 10)
+        self.assertEqual(self.cache.ttl_for([('i', '5')]), 0)
+
+    def test_entries_survive_restart_until_expired(self):
+        params = [('start', '20170801'), ('end', '20170810')]
+        self.cache.set('closed', {'data': [1, 2]}, params)
+        self.cache.set('recent', {'data': [3]}, [('start', '20170801'), ('end', '20170820')])
+        self.cache.set('undated', {'data': [4]}, [('i', '5')])
+        self.cache.close()
+
+        self.cache = self._open_cache()
+        self.assertEqual(self.cache.get('closed'), {'data': [1, 2]})
+        self.assertEqual(self.cache.get('recent'), {'data': [3]})
+        self.assertTrue(self.cache.get('undated') is None)
+
+        self.now += 100
+        self.assertTrue(self.cache.get('recent') is None)
+        self.assertEqual(self.cache.purge_expired(), 1)
+        self.assertEqual(self.cache.stats()['entries'], 1)
+
+    def test_warm_restart_skips_the_network(self):
+        project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+        params = [('start', '20170801'), ('end', '20170810')]
+
+        with StubServer() as server:
+            for _ in range(2):
+                api = AmplitudeRestApi(project, show_logs=False, log_query_cost=False,
+                                       api_url=server.url, disk_cache=self.cache)
+                first = api._make_request(server.url + 'users', params)
+                api.close()
+
+            self.assertEqual(server.requests_served, 1)
+            self.assertTrue('series' in first['data'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+import requests
+from pyamplitude.exportapi import AmplitudeExportApi
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.metrics import InMemoryCollector
+from pyamplitude.benchmarks.mockserver import MockAmplitudeServer
+from pyamplitude.benchmarks.stubserver import StubServer
+
+
+class Test_ExportStreaming(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MockAmplitudeServer(events_per_hour=20).start()
+        self.metrics = InMemoryCollector()
+        self.export = AmplitudeExportApi(ProjectsHandler('test', 'key', 'secret'), show_logs=False,
+                                         metrics=self.metrics)
+        self.export.api_url = self.server.export_url
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def test_iter_events(self):
+        events = list(self.export.iter_events('20170801T00', '20170801T23'))
+
+        self.assertEqual(len(events), 24 * 20)
+        self.assertEqual(events[0]['event_time'], '2017-08-01 00:00:00.000000')
+        self.assertEqual(events[-1]['event_time'], '2017-08-01 23:00:00.000000')
+        self.assertEqual(self.metrics.value('bytes_received', client='export', endpoint='export'),
+                         len(self.server.export_archive('20170801T00', '20170801T23')))
+
+    def test_iter_events_spools_big_archives_to_disk(self):
+        events = self.export.iter_events('20170801T00', '20170801T23',
+                                         spool_dir=self.directory, spool_size=1024)
+
+        self.assertEqual(sum(1 for _ in events), 24 * 20)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_download(self):
+        path = os.path.join(self.directory, 'export.zip')
+        size = self.export.download('20170801T00', '20170801T01', path)
+
+        self.assertEqual(size, os.path.getsize(path))
+        for phase in ['network', 'transfer']:
+            self.assertEqual(self.metrics.histogram('latency_seconds', client='export', phase=phase)['count'], 1)
+        self.assertEqual(len(zipfile.ZipFile(path).namelist()), 2)
+
+    def test_get_all_events_data(self):
+        cwd = os.getcwd()
+        os.chdir(self.directory)
+        try:
+            self.assertTrue(self.export.get_all_events_data('20170801T00', '20170801T01'))
+        finally:
+            os.chdir(cwd)
+
+        self.assertEqual(sorted(os.listdir(os.path.join(self.directory, '123'))),
+                         ['123_2017-08-01_00#0.json.gz', '123_2017-08-01_01#0.json.gz'])
+
+    def test_errors_are_raised(self):
+        with StubServer(responder=lambda path, params: (404, {'error': 'no data'})) as server:
+            self.export.api_url = server.url
+            self.assertRaises(requests.HTTPError, list, self.export.iter_events('20170801T00', '20170801T01'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+import pyarrow
+from pyamplitude.exportconverter import ExportConverter, convert_export, read_table, to_table
+from pyamplitude.benchmarks.mockserver import MockAmplitudeServer
+
+
+def _event(event_type, hour, **properties):
+    return {'event_type': event_type, 'event_time': '2017-08-01 %02d:30:00.250000' % hour,
+            'amplitude_id': 7, 'event_properties': properties, 'user_properties': {'plan': 'free'}}
+
+
+class Test_ExportConverter(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_schema_inference(self):
+        table = to_table([_event('buy', 1, price=5, paid=True, tags=['a']),
+                          _event('buy', 1, price=2.5, paid=False, code=3),
+                          _event('buy', 1, code='x')])
+
+        self.assertEqual(table.column_names, ['event_type', 'event_time', 'amplitude_id',
+                                              'event_properties.price', 'event_properties.paid',
+                                              'event_properties.tags', 'user_properties.plan',
+                                              'event_properties.code'])
+        self.assertEqual(table.schema.field('event_time').type, pyarrow.timestamp('us'))
+        self.assertEqual(table.schema.field('amplitude_id').type, pyarrow.int64())
+        self.assertEqual(table.column('event_properties.price').to_pylist(), [5.0, 2.5, None])
+        self.assertEqual(table.column('event_properties.paid').to_pylist(), [True, False, None])
+        self.assertEqual(table.column('event_properties.tags').to_pylist(), ['["a"]', None, None])
+        self.assertEqual(table.column('event_properties.code').to_pylist(), [None, '3', 'x'])
+        self.assertEqual(table.column('event_time')[0].as_py(), datetime.datetime(2017, 8, 1, 1, 30, 0, 250000))
+
+    def test_partitions_and_batches(self):
+        events = [_event('open', hour % 2, n=hour) for hour in range(10)] + [_event('buy/now', 0, n=1)]
+        stats = convert_export(events, self.directory, batch_size=4)
+
+        self.assertEqual(stats['events'], 11)
+        self.assertEqual(stats['partitions'], 3)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.directory, 'date=2017-08-01', 'hour=00'))),
+                         ['event_type=buy%2Fnow', 'event_type=open'])
+
+        table = read_table(self.directory)
+        self.assertEqual(table.num_rows, 11)
+        self.assertEqual(sorted(table.column('event_properties.n').to_pylist()), sorted([1] + list(range(10))))
+
+        self.assertEqual(read_table(self.directory, event_type=['buy/now']).num_rows, 1)
+        self.assertEqual(read_table(self.directory, hour=['01'], columns=['event_type']).column_names,
+                         ['event_type'])
+        self.assertEqual(read_table(self.directory, hour=['01']).num_rows, 5)
+
+    def test_arrow_files_are_memory_mappable(self):
+        converter = ExportConverter(self.directory, format='arrow', partition_by=['date'])
+        converter.convert([_event('open', 1, n=1), _event('open', 2, n=2)])
+
+        partition = os.path.join(self.directory, 'date=2017-08-01')
+        path = os.path.join(partition, os.listdir(partition)[0])
+        with pyarrow.memory_map(path) as source:
+            table = pyarrow.ipc.open_file(source).read_all()
+
+        self.assertEqual(table.column('event_properties.n').to_pylist(), [1, 2])
+
+    def test_parts_with_different_schemas(self):
+        converter = ExportConverter(self.directory, partition_by=['event_type'])
+        converter.convert([_event('open', 1, n=1)])
+        converter.convert([_event('open', 1, n=1.5, extra='x')])
+        converter.convert([_event('open', 1, n='many')])
+
+        table = read_table(self.directory)
+        self.assertEqual(table.schema.field('event_properties.n').type, pyarrow.string())
+        self.assertEqual(sorted(table.column('event_properties.n').to_pylist()), ['1', '1.5', 'many'])
+        self.assertEqual(table.column('event_properties.extra').null_count, 2)
+
+    def test_export_archive(self):
+        with MockAmplitudeServer(events_per_hour=20) as server:
+            archive = server.export_archive('20170801T00', '20170801T02')
+        path = os.path.join(self.directory, 'export.zip')
+        with open(path, 'wb') as f:
+            f.write(archive)
+
+        stats = convert_export(path, os.path.join(self.directory, 'events'), partition_by=['date', 'hour'])
+        self.assertEqual(stats, {'events': 60, 'files': 3, 'partitions': 3})
+        self.assertEqual(read_table(os.path.join(self.directory, 'events')).num_rows, 60)
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, ExportConverter, self.directory, format='csv')
+        self.assertRaises(ValueError, ExportConverter, self.directory, partition_by=['country'])
+        self.assertRaises(ValueError, ExportConverter, self.directory, batch_size=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
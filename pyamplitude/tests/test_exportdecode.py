@@ -0,0 +1,76 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from pyamplitude import exportdecode
+from pyamplitude.exportapi import AmplitudeExportApi
+from pyamplitude.exportedevents import iter_archive
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.benchmarks import bench_decode
+from pyamplitude.benchmarks.mockserver import MockAmplitudeServer
+
+
+class Test_ExportDecode(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.archive = os.path.join(self.directory, 'export.zip')
+        bench_decode.synthetic_archive(self.archive, events_per_hour=50, hours=6)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_units(self):
+        units = exportdecode.decode_units(self.archive)
+        self.assertEqual(len(units), 6)
+        self.assertEqual(units[0], (self.archive, '123/123_2017-08-01_00#0.json.gz'))
+
+        extracted = os.path.join(self.directory, 'extracted')
+        zipfile.ZipFile(self.archive).extractall(extracted)
+        units = exportdecode.decode_units(extracted)
+        self.assertEqual([member for _, member in units], [None] * 6)
+        self.assertEqual(exportdecode.decode_units(units[0][0]), [(units[0][0], None)])
+
+    def test_events_in_order(self):
+        serial = list(iter_archive(self.archive))
+
+        self.assertEqual(list(exportdecode.iter_events(self.archive, workers=1)), serial)
+        self.assertEqual(list(exportdecode.iter_events(self.archive, workers=2, prefetch=1)), serial)
+
+    def test_arrow_batches(self):
+        batches = list(exportdecode.iter_batches(self.archive, workers=2, format='arrow'))
+
+        self.assertEqual([batch.num_rows for batch in batches], [50] * 6)
+        self.assertEqual(batches[1].column('event_id').to_pylist()[:2], [50, 51])
+        self.assertIn('event_properties.price', batches[0].column_names)
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, list, exportdecode.iter_batches(self.archive, format='csv'))
+        self.assertRaises(ValueError, list, exportdecode.iter_batches(self.archive, prefetch=0))
+
+    def test_export_api_workers(self):
+        export = AmplitudeExportApi(ProjectsHandler('test', 'key', 'secret'), show_logs=False)
+
+        with MockAmplitudeServer(events_per_hour=10) as server:
+            export.api_url = server.export_url
+            serial = list(export.iter_events('20170801T00', '20170801T03'))
+            parallel = list(export.iter_events('20170801T00', '20170801T03', spool_dir=self.directory, workers=2))
+
+        self.assertEqual(len(serial), 40)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['export.zip'])
+
+    def test_benchmark(self):
+        report = bench_decode.run(events_per_hour=20, hours=2, worker_counts=[1, 2])
+
+        self.assertEqual(report['events'], 40)
+        self.assertEqual(sorted(report['results']), ['arrow/1', 'arrow/2', 'events/1', 'events/2', 'serial'])
+        self.assertEqual(report['results']['serial']['speedup'], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from pyamplitude.exportapi import AmplitudeExportApi
+from pyamplitude.exportshards import ShardedExport, ShardManifest, shard_ranges, shard_partition, MANIFEST_NAME
+from pyamplitude.exportedevents import iter_events
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.benchmarks.mockserver import MockAmplitudeServer
+from pyamplitude.benchmarks.stubserver import StubServer
+
+
+class Test_ShardRanges(unittest.TestCase):
+
+    def test_hour_and_day_shards(self):
+        self.assertEqual(shard_ranges('20170801T22', '20170802T01'),
+                         [('20170801T22', '20170801T22'), ('20170801T23', '20170801T23'),
+                          ('20170802T00', '20170802T00'), ('20170802T01', '20170802T01')])
+        self.assertEqual(shard_ranges('20170801T05', '20170803T10', 24),
+                         [('20170801T05', '20170801T23'), ('20170802T00', '20170802T23'),
+                          ('20170803T00', '20170803T10')])
+        self.assertEqual(shard_ranges('20170801T00', '20170801T13', 6),
+                         [('20170801T00', '20170801T05'), ('20170801T06', '20170801T11'),
+                          ('20170801T12', '20170801T13')])
+
+    def test_partitions(self):
+        self.assertEqual(shard_partition('20170801T05', 1), os.path.join('date=2017-08-01', 'hour=05'))
+        self.assertEqual(shard_partition('20170801T00', 24), 'date=2017-08-01')
+
+    def test_invalid_ranges(self):
+        self.assertRaises(ValueError, shard_ranges, '20170801T00', '20170801T05', 5)
+        self.assertRaises(ValueError, shard_ranges, '20170802T00', '20170801T05')
+
+
+class Test_ShardedExport(unittest.TestCase):
+
+    def setUp(self):
+        self.export = AmplitudeExportApi(ProjectsHandler('test', 'key', 'secret'), show_logs=False)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_hour_shards(self):
+        with MockAmplitudeServer(events_per_hour=10, empty_hours=['20170801T02']) as server:
+            self.export.api_url = server.export_url
+            stats = ShardedExport(self.export, self.directory, max_workers=3).run('20170801T00', '20170801T05')
+
+        self.assertEqual(stats['shards'], 6)
+        self.assertEqual(stats['empty'], 1)
+        self.assertEqual(stats['failed'], 0)
+        self.assertEqual(stats['files'], 5)
+        self.assertEqual(stats['events'], 50)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.directory, 'date=2017-08-01'))),
+                         ['hour=00', 'hour=01', 'hour=03', 'hour=04', 'hour=05'])
+        self.assertEqual(len(list(iter_events(self.directory))), 50)
+
+    def test_day_shards(self):
+        with MockAmplitudeServer(events_per_hour=10) as server:
+            self.export.api_url = server.export_url
+            sharded = ShardedExport(self.export, self.directory, shard_hours=24)
+            sharded.run('20170801T12', '20170802T11')
+
+        self.assertEqual(sorted(sharded.shards), [('20170801T12', '20170801T23'), ('20170802T00', '20170802T11')])
+        self.assertEqual(sorted(os.listdir(self.directory)), [MANIFEST_NAME, 'date=2017-08-01', 'date=2017-08-02'])
+        self.assertEqual(len(os.listdir(os.path.join(self.directory, 'date=2017-08-02'))), 12)
+
+    def test_failed_shards_are_collected(self):
+        def responder(path, params):
+            return (500, {'error': 'failed'}) if dict(params)['start'] == '20170801T01' else (404, {})
+
+        with StubServer(responder=responder) as server:
+            self.export.api_url = server.url
+            self.export.retry_policy = None
+            sharded = ShardedExport(self.export, self.directory)
+            stats = sharded.run('20170801T00', '20170801T02')
+
+        self.assertEqual(stats['empty'], 2)
+        self.assertEqual(list(sharded.failed), [('20170801T01', '20170801T01')])
+        self.assertEqual(os.listdir(self.directory), [MANIFEST_NAME])
+
+
+class Test_ShardManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.export = AmplitudeExportApi(ProjectsHandler('test', 'key', 'secret'), show_logs=False)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _run(self, server, **kwargs):
+        self.export.api_url = server.export_url
+        sharded = ShardedExport(self.export, self.directory, **kwargs)
+        sharded.run('20170801T00', '20170801T05')
+        return sharded
+
+    def test_resume_skips_complete_shards(self):
+        with MockAmplitudeServer(events_per_hour=10, empty_hours=['20170801T05']) as server:
+            first = self._run(server)
+            served = server.requests_served
+            second = self._run(server)
+
+            self.assertEqual(server.requests_served, served)
+
+        self.assertEqual(second.stats(), dict(first.stats(), skipped=6))
+        self.assertEqual(second.shards, first.shards)
+
+        record = ShardManifest(os.path.join(self.directory, MANIFEST_NAME)).get('20170801T02', '20170801T02')
+        self.assertEqual(record['path'], shard_partition('20170801T02', 1))
+        self.assertEqual((record['files'], record['events']), (1, 10))
+        self.assertEqual(len(record['sha256']), 64)
+
+    def test_missing_and_corrupt_shards_are_fetched_again(self):
+        with MockAmplitudeServer(events_per_hour=10) as server:
+            self._run(server)
+
+            shutil.rmtree(os.path.join(self.directory, shard_partition('20170801T01', 1)))
+            hour = os.path.join(self.directory, shard_partition('20170801T03', 1))
+            name = os.listdir(hour)[0]
+            with open(os.path.join(hour, name), 'r+b') as f:
+                f.seek(20)
+                f.write(b'x')
+
+            served = server.requests_served
+            stats = self._run(server).stats()
+
+            self.assertEqual(server.requests_served - served, 2)
+            self.assertEqual(stats['skipped'], 4)
+            self.assertEqual(len(list(iter_events(self.directory))), 60)
+
+            # A modified file of the same size is only caught by the checksum.
+            with open(os.path.join(hour, name), 'r+b') as f:
+                f.seek(20)
+                f.write(b'y')
+            self.assertEqual(self._run(server, verify='size').stats()['skipped'], 6)
+            self.assertEqual(self._run(server).stats()['skipped'], 5)
+
+    def test_failed_shards_are_not_recorded(self):
+        with StubServer(responder=lambda path, params: (500, {'error': 'failed'})) as server:
+            self.export.api_url = server.url
+            self.export.retry_policy = None
+            ShardedExport(self.export, self.directory).run('20170801T00', '20170801T01')
+
+        self.assertEqual(len(ShardManifest(os.path.join(self.directory, MANIFEST_NAME))), 0)
+
+    def test_export_shards(self):
+        with MockAmplitudeServer(events_per_hour=10) as server:
+            self.export.api_url = server.export_url
+            self.export.export_shards('20170801T00', '20170801T05', self.directory, shard_hours=6)
+            sharded = self.export.export_shards('20170801T00', '20170801T05', self.directory, shard_hours=6)
+
+        self.assertEqual(sharded.stats()['skipped'], 1)
+        self.assertEqual(sharded.stats()['events'], 60)
+
+    def test_without_manifest(self):
+        with MockAmplitudeServer(events_per_hour=10) as server:
+            self._run(server, manifest=False)
+            self.assertEqual(self._run(server, manifest=False).stats()['skipped'], 0)
+
+        self.assertFalse(os.path.exists(os.path.join(self.directory, MANIFEST_NAME)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import requests
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.ratelimiter import QueryRateLimiter
+from pyamplitude.fanout import ProjectFanOut
+from pyamplitude.benchmarks.stubserver import StubServer
+
+
+class Test_ProjectFanOut(unittest.TestCase):
+
+    def setUp(self):
+        self.projects = [ProjectsHandler(project_name='project %d' % n, api_key='key %d' % n,
+                                         secret_key='secret') for n in range(4)]
+        self.server = StubServer(responder=lambda path, params: {'data': [1, 2, 3]}).start()
+        self.failing = StubServer(responder=lambda path, params: (400, {'error': 'bad request'})).start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.failing.stop()
+
+    def test_run(self):
+        with ProjectFanOut(self.projects, max_workers=2, api_url=self.server.url,
+                           rate_limiter_factory=QueryRateLimiter) as fanout:
+            result = fanout.run('get_annotations')
+            limiters = [api.rate_limiter for api in fanout.apis.values()]
+
+        self.assertTrue(result.ok)
+        self.assertEqual(sorted(result.results), ['project 0', 'project 1', 'project 2', 'project 3'])
+        self.assertEqual(result['project 2'], {'data': [1, 2, 3]})
+        self.assertEqual(self.server.requests_served, 4)
+
+        # Every project draws from its own budget.
+        self.assertEqual(len(set(map(id, limiters))), 4)
+        self.assertEqual([limiter.spent for limiter in limiters], [limiters[0].spent] * 4)
+
+    def test_failures_are_isolated(self):
+        def api_factory(project):
+            url = self.failing.url if project.project_name == 'project 1' else self.server.url
+            return AmplitudeRestApi(project, show_logs=False, log_query_cost=False,
+                                    api_url=url, retry_policy=False)
+
+        with ProjectFanOut(self.projects, api_factory=api_factory) as fanout:
+            result = fanout.run('get_annotations')
+
+        self.assertFalse(result.ok)
+        self.assertEqual(len(result.results), 3)
+        self.assertTrue(isinstance(result.errors['project 1'], requests.HTTPError))
+        self.assertRaises(requests.HTTPError, lambda: result['project 1'])
+        self.assertRaises(requests.HTTPError, result.raise_for_errors)
+
+    def test_invalid_arguments_raise_before_sending(self):
+        with ProjectFanOut(self.projects, api_url=self.server.url) as fanout:
+            self.assertRaises(ValueError, fanout.run, 'get_events', start='20170801',
+                              end='20170802', events=[])
+
+        self.assertEqual(self.server.requests_served, 0)
+
+    def test_duplicated_project_name(self):
+        self.assertRaises(ValueError, ProjectFanOut, self.projects + self.projects[:1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import requests
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.httpsession import build_session
+from pyamplitude.benchmarks.stubserver import StubServer
+
+
+class Test_HttpSession(unittest.TestCase):
+
+    def test_build_session_pool_size(self):
+        session = build_session(pool_size=3)
+        adapter = session.get_adapter('https://amplitude.com/api/2/')
+        self.assertTrue(isinstance(session, requests.Session))
+        self.assertEqual(adapter._pool_maxsize, 3)
+        self.assertTrue('Connection' not in session.headers or
+                        session.headers['Connection'] != 'close')
+
+    def test_build_session_without_keep_alive(self):
+        session = build_session(keep_alive=False)
+        self.assertEqual(session.headers['Connection'], 'close')
+
+    def test_requests_share_the_instance_session(self):
+        project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+
+        with StubServer() as server:
+            api = AmplitudeRestApi(project, show_logs=False, log_query_cost=False,
+                                   api_url=server.url)
+            session = api.session
+            first = api._make_request(server.url + 'events/list', [('n', '1')])
+            second = api._make_request(server.url + 'events/list', [('n', '2')])
+            third = api._make_request(server.url + 'events/list', [('n', '3')])
+            api.close()
+
+            self.assertTrue(api.session is session)
+            self.assertEqual(server.requests_served, 3)
+            # The three requests reuse the connection of the instance session.
+            self.assertEqual(server.connections_accepted, 1)
+
+        self.assertEqual(first, third)
+        self.assertEqual(first, second)
+        self.assertTrue('xValues' in first['data'])
+
+
+if __name__ == '__main__':
+    unittest.main()
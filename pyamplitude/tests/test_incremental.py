@@ -0,0 +1,112 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+from datetime import datetime
+from pyamplitude import incremental
+from pyamplitude.apiresources import Event
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.benchmarks.stubserver import StubServer
+
+
+def _daily_responder(path, params):
+    """ Answers with one value per day: the day of the month."""
+    params = dict(params)
+    days = incremental.date_range(params['start'], params['end'])
+    x_values = [datetime.strptime(d, '%Y%m%d').strftime('%Y-%m-%d') for d in days]
+
+    return {'data': {'series': [[int(d[6:]) for d in days], [1 for d in days]],
+                     'seriesLabels': [0, 1],
+                     'seriesCollapsed': [[{'setId': '', 'value': sum(int(d[6:]) for d in days)}],
+                                         [{'setId': '', 'value': len(days)}]],
+                     'xValues': x_values}}
+
+
+def _histogram_responder(path, params):
+    """ Answers with buckets whatever the dates."""
+    return {'data': {'xValues': ['0', '1-2', '3-5'], 'series': [[4, 2, 1]]}}
+
+
+class Test_Incremental(unittest.TestCase):
+
+    def test_missing_runs(self):
+        days = incremental.date_range('20170829', '20170903')
+        self.assertEqual(len(days), 6)
+        self.assertEqual(incremental.missing_runs(days, {'20170831', '20170901'}),
+                         [('20170829', '20170830'), ('20170902', '20170903')])
+        self.assertEqual(incremental.missing_runs(days, set(days)), [])
+
+    def test_split_and_merge_round_trip(self):
+        response = _daily_responder('/', [('start', '20170801'), ('end', '20170803')])
+        days = incremental.split_daily(response)
+        self.assertEqual(sorted(days), ['20170801', '20170802', '20170803'])
+
+        merged = incremental.merge_daily([days[d] for d in sorted(days)])
+        self.assertEqual(merged['data']['series'], response['data']['series'])
+        self.assertEqual(merged['data']['xValues'], response['data']['xValues'])
+        self.assertEqual(merged['data']['seriesLabels'], [0, 1])
+
+    def test_merge_fills_missing_labels(self):
+        first = {'data': {'xValues': ['2017-08-01'], 'series': [[5]], 'seriesMeta': ['AR']}}
+        second = {'data': {'xValues': ['2017-08-02'], 'series': [[7]], 'seriesMeta': ['BR']}}
+        merged = incremental.merge_daily([first, second])
+        self.assertEqual(merged['data']['seriesMeta'], ['AR', 'BR'])
+        self.assertEqual(merged['data']['series'], [[5, 0], [0, 7]])
+
+    def test_shifted_window_fetches_only_new_days(self):
+        project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+
+        with StubServer(responder=_daily_responder) as server:
+            api = AmplitudeRestApi(project, show_logs=False, log_query_cost=False,
+                                   api_url=server.url, incremental=True)
+            event = Event('open_app')
+
+            first = api.get_events(start='20170801', end='20170830', events=[event])
+            second = api.get_events(start='20170802', end='20170831', events=[event])
+            api.close()
+
+            self.assertEqual(server.requests_served, 2)
+
+        self.assertEqual(first['data']['series'][0], list(range(1, 31)))
+        self.assertEqual(second['data']['series'][0], list(range(2, 32)))
+        self.assertEqual(second['data']['xValues'][-1], '2017-08-31')
+
+    def _api(self, server):
+        project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+        return AmplitudeRestApi(project, show_logs=False, log_query_cost=False,
+                                api_url=server.url, incremental=True)
+
+    def test_series_collapsed_is_kept(self):
+        with StubServer(responder=_daily_responder) as server:
+            api = self._api(server)
+            api.get_events(start='20170801', end='20170810', events=[Event('open_app')])
+            totals = api.get_events(start='20170805', end='20170815', events=[Event('open_app')])
+            uniques = api.get_events(start='20170805', end='20170815', events=[Event('open_app')],
+                                     mode='uniques')
+            api.close()
+
+            self.assertEqual(server.requests_served, 3)
+
+        self.assertEqual(totals['data']['seriesCollapsed'],
+                         [[{'setId': '', 'value': sum(range(5, 16))}], [{'setId': '', 'value': 11}]])
+        # Daily uniques do not add up: the query is not split.
+        self.assertEqual(uniques, _daily_responder('/', [('start', '20170805'), ('end', '20170815')]))
+
+    def test_histogram_is_not_split(self):
+        with StubServer(responder=_histogram_responder) as server:
+            api = self._api(server)
+            histogram = api.get_property_metrics(start='20170801', end='20170803',
+                                                 events=[Event('purchase')], mode='histogram')
+            # A mode that should be daily but is not answered with dates
+            # falls back to the normal response.
+            totals = api.get_events(start='20170801', end='20170803', events=[Event('purchase')])
+            api.close()
+
+        self.assertEqual(histogram, _histogram_responder('/', []))
+        self.assertEqual(totals, _histogram_responder('/', []))
+        self.assertFalse(incremental.is_daily(histogram))
+
+
+if __name__ == '__main__':
+    unittest.main()
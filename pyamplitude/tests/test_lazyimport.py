@@ -0,0 +1,52 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import subprocess
+import sys
+import unittest
+import pyamplitude
+from pyamplitude.lazyimport import LazyModule
+from pyamplitude.benchmarks import bench_importtime
+
+
+class Test_LazyImports(unittest.TestCase):
+
+    def test_lazy_module(self):
+        module = LazyModule('colorsys')
+
+        self.assertEqual(module.rgb_to_hsv(1.0, 0.0, 0.0), (0.0, 1.0, 1.0))
+        self.assertTrue('rgb_to_hsv' in vars(module))
+        self.assertTrue(module.rgb_to_hsv is sys.modules['colorsys'].rgb_to_hsv)
+        self.assertRaises(AttributeError, getattr, module, 'missing')
+
+    def test_facade(self):
+        from pyamplitude.amplituderestapi import AmplitudeRestApi
+        from pyamplitude.apiresources import Segment
+
+        self.assertTrue(pyamplitude.AmplitudeRestApi is AmplitudeRestApi)
+        self.assertTrue(pyamplitude.Segment is Segment)
+        self.assertTrue('ProjectFanOut' in dir(pyamplitude))
+        self.assertRaises(AttributeError, getattr, pyamplitude, 'Missing')
+
+    def test_star_import_without_optional_dependencies(self):
+        code = ("import sys; sys.modules['aiohttp'] = None\n"
+                "from pyamplitude import *\n"
+                "import pyamplitude\n"
+                "try:\n"
+                "    pyamplitude.AsyncAmplitudeRestApi\n"
+                "except ImportError as e:\n"
+                "    print(e)\n")
+        output = subprocess.check_output([sys.executable, '-c', code]).decode('utf-8')
+
+        self.assertTrue('AsyncAmplitudeRestApi' not in pyamplitude.__all__)
+        self.assertTrue('pip install "pyamplitude[async]"' in output)
+
+    def test_deferred_dependencies(self):
+        for module in ['pyamplitude', 'pyamplitude.amplituderestapi', 'pyamplitude.exportapi',
+                       'pyamplitude.behavioralcohortsapi', 'pyamplitude.amplituderedshift']:
+            cumulative, loaded = bench_importtime.import_time(module)
+            self.assertEqual(loaded, [], module)
+
+
+if __name__ == '__main__':
+    unittest.main()
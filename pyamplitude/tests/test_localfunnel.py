@@ -0,0 +1,125 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from pyamplitude.apiresources import Event, Segment
+from pyamplitude.localfunnel import LocalFunnel, local_funnel
+
+
+def _event(user, event_type, day, hour=10, country='Argentina', created='2017-07-01', **properties):
+    return {'amplitude_id': user, 'event_type': event_type, 'country': country,
+            'event_time': '2017-08-%02d %02d:00:00.000000' % (day, hour),
+            'user_creation_time': created + ' 00:00:00.000000', 'event_properties': properties}
+
+
+EVENTS = [_event(1, 'open', 1), _event(1, 'cart', 1, 11), _event(1, 'buy', 1, 12),
+          _event(2, 'open', 1), _event(2, 'buy', 1, 11), _event(2, 'cart', 1, 12),
+          _event(3, 'cart', 2, 9, 'Uruguay', '2017-08-02'), _event(3, 'open', 2, 10, 'Uruguay', '2017-08-02'),
+          _event(3, 'buy', 5, 10, 'Uruguay', '2017-08-02'),
+          _event(4, 'open', 3, created='2017-08-03'), _event(4, 'cart', 9, created='2017-08-03'),
+          _event(4, 'buy', 9, 11, created='2017-08-03')]
+
+STEPS = [Event('open'), Event('cart'), Event('buy')]
+
+
+class Test_LocalFunnel(unittest.TestCase):
+
+    def test_ordered(self):
+        response = local_funnel(EVENTS, STEPS, '20170801', '20170803')
+
+        # User 2 buys before adding to cart, user 3 adds to cart before opening.
+        data = response['data'][0]
+        self.assertEqual(data['meta'], {'segmentIndex': 0})
+        self.assertEqual(data['events'], ['open', 'cart', 'buy'])
+        self.assertEqual(data['cumulativeRaw'], [4, 3, 2])
+        self.assertEqual(data['cumulative'], [1.0, 0.75, 0.5])
+        self.assertEqual(data['stepByStep'], [1.0, 0.75, 2.0 / 3])
+        self.assertEqual(data['dayFunnels']['xValues'], ['2017-08-01', '2017-08-02', '2017-08-03'])
+        self.assertEqual(data['dayFunnels']['series'], [[2, 2, 1], [1, 0, 0], [1, 1, 1]])
+        self.assertEqual(data['medianTransTimes'], [0, 7200000, 3600000])
+
+    def test_conversion_window(self):
+        # User 4 adds to cart 6 days after opening.
+        data = local_funnel(EVENTS, STEPS, '20170801', '20170803', cs=5 * 86400)['data'][0]
+        self.assertEqual(data['cumulativeRaw'], [4, 2, 1])
+
+        data = local_funnel(EVENTS, STEPS, '20170801', '20170803', cs=7200)['data'][0]
+        self.assertEqual(data['cumulativeRaw'], [4, 2, 1])
+
+        data = local_funnel(EVENTS, STEPS, '20170801', '20170803', cs=3600)['data'][0]
+        self.assertEqual(data['cumulativeRaw'], [4, 1, 0])
+
+    def test_unordered(self):
+        data = local_funnel(EVENTS, STEPS, '20170801', '20170803', mode='unordered')['data'][0]
+        self.assertEqual(data['cumulativeRaw'], [4, 4, 4])
+
+        # Rounded down to 1 day, from the entry day: users 3 and 4 buy later.
+        data = local_funnel(EVENTS, STEPS, '20170801', '20170803', mode='unordered', cs=7200)['data'][0]
+        self.assertEqual(data['cumulativeRaw'], [4, 3, 2])
+
+    def test_segments_group_by_and_new_users(self):
+        segment = Segment().add_filter('country', 'is', ['Argentina'])
+        data = local_funnel(EVENTS, STEPS, '20170801', '20170803', segment_definitions=[segment])['data']
+        self.assertEqual(data[0]['cumulativeRaw'], [3, 3, 2])
+
+        data = local_funnel(EVENTS, STEPS, '20170801', '20170803', group_by='country')['data']
+        self.assertEqual([d['meta']['groupBy'] for d in data], ['Argentina', 'Uruguay'])
+        self.assertEqual([d['cumulativeRaw'] for d in data], [[3, 3, 2], [1, 0, 0]])
+
+        data = local_funnel(EVENTS, STEPS, '20170801', '20170803', n='new')['data']
+        self.assertEqual(data[0]['cumulativeRaw'], [2, 1, 1])
+
+    def test_events_matching_several_steps(self):
+        events = [_event(1, 'open', 1), _event(2, 'open', 1), _event(2, 'open', 1, 11)]
+
+        data = local_funnel(events, [Event('open'), Event('open')], '20170801', '20170801')['data'][0]
+        self.assertEqual(data['cumulativeRaw'], [2, 1])
+
+        data = local_funnel(events, [Event('open'), Event('_active')], '20170801', '20170801')['data'][0]
+        self.assertEqual(data['cumulativeRaw'], [2, 1])
+
+    def test_chunks_and_batches_give_the_same_result(self):
+        rng = random.Random(11)
+        events = [_event(rng.randint(0, 200), rng.choice(['open', 'cart', 'buy']),
+                         rng.randint(1, 12), rng.randint(0, 23))
+                  for _ in range(5000)]
+
+        for mode in ['ordered', 'unordered']:
+            whole = local_funnel(events, STEPS, '20170801', '20170807', mode=mode, cs=3 * 86400)
+            chunked = local_funnel(events, STEPS, '20170801', '20170807', mode=mode, cs=3 * 86400,
+                                   chunk_size=300, batch_size=7)
+            unpartitioned = local_funnel(events, STEPS, '20170801', '20170807', mode=mode, cs=3 * 86400,
+                                         chunk_size=300, partitions=1)
+            self.assertEqual(whole, chunked)
+            self.assertEqual(whole, unpartitioned)
+            self.assertEqual(len(whole['data'][0]['dayFunnels']['series']), 7)
+
+    def test_rows_are_spilled_by_partition(self):
+        directory = tempfile.mkdtemp()
+        try:
+            funnel = LocalFunnel(STEPS, '20170801', '20170803', chunk_size=5, partitions=3,
+                                 spill_dir=directory)
+            with funnel:
+                funnel.add_events(EVENTS)
+                spill = os.path.join(directory, os.listdir(directory)[0])
+                self.assertEqual(sorted(set(name[:9] for name in os.listdir(spill))),
+                                 ['part-0000', 'part-0001', 'part-0002'])
+                self.assertEqual(funnel.result(), local_funnel(EVENTS, STEPS, '20170801', '20170803'))
+
+            self.assertEqual(os.listdir(directory), [])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, LocalFunnel, [], '20170801', '20170802')
+        self.assertRaises(ValueError, LocalFunnel, STEPS, '20170801', '20170802', mode='any')
+        self.assertRaises(ValueError, LocalFunnel, STEPS, '20170801', '20170802', n='all')
+        self.assertRaises(ValueError, LocalFunnel, STEPS, '20170801', '20170802', partitions=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
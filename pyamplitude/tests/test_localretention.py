@@ -0,0 +1,123 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from pyamplitude.apiresources import Event, Segment
+from pyamplitude.localretention import LocalRetention, local_retention
+from pyamplitude import columnar
+from pyamplitude.benchmarks.mockserver import MockAmplitudeServer
+
+
+def _event(user, event_type, day, country='Argentina', **properties):
+    return {'amplitude_id': user, 'event_type': event_type, 'country': country,
+            'event_time': '2017-08-%02d 10:00:00.000000' % day, 'event_properties': properties}
+
+
+EVENTS = [_event(1, 'open', 1), _event(1, 'buy', 2), _event(1, 'buy', 4),
+          _event(2, 'open', 1), _event(2, 'buy', 3, price=5),
+          _event(3, 'open', 2, 'Uruguay'), _event(3, 'buy', 3, 'Uruguay'),
+          _event(4, 'other', 5)]
+
+
+def _counts(response, day, series=0):
+    return [(cell['count'], cell['outof']) for cell in response['data']['series'][series]['values'][day]]
+
+
+class Test_LocalRetention(unittest.TestCase):
+
+    def test_n_day(self):
+        response = local_retention(EVENTS, Event('open'), Event('buy'), '20170801', '20170802')
+
+        # Shaped like the get_retention response documented by Amplitude.
+        series = response['data']['series'][0]
+        self.assertEqual(response['data']['seriesMeta'], [{'segmentIndex': 0}])
+        self.assertEqual(series['dates'], ['2017-08-01', '2017-08-02'])
+        self.assertEqual(_counts(response, '2017-08-01'), [(2, 2), (1, 2), (1, 2), (1, 2), (0, 2)])
+        self.assertEqual(_counts(response, '2017-08-02'), [(1, 1), (1, 1), (0, 1), (0, 1)])
+        self.assertEqual(series['combined'][1], {'count': 2, 'outof': 3})
+
+        result = columnar.decode(response, columnar.RETENTION)
+        self.assertEqual(result.values.shape, (1, 2, 6))
+        self.assertEqual(list(result.values[0, 0]), [2, 2, 1, 1, 1, 0])
+
+    def test_new_users(self):
+        created = {1: '2017-08-01', 2: '2017-07-01', 3: '2017-08-02', 4: '2017-08-05'}
+        events = [dict(event, user_creation_time=created[event['amplitude_id']] + ' 09:00:00.000000')
+                  for event in EVENTS]
+        response = local_retention(events, Event('_new'), Event('buy'), '20170801', '20170802')
+
+        # User 2 was created before the first day: only users 1 and 3 are new.
+        self.assertEqual(_counts(response, '2017-08-01'), [(1, 1), (1, 1), (0, 1), (1, 1), (0, 1)])
+        self.assertEqual(_counts(response, '2017-08-02'), [(1, 1), (1, 1), (0, 1), (0, 1)])
+
+    def test_rolling_and_bracket(self):
+        rolling = local_retention(EVENTS, Event('open'), Event('buy'), '20170801', '20170802', rm='rolling')
+        self.assertEqual(_counts(rolling, '2017-08-01'), [(2, 2), (2, 2), (2, 2), (1, 2), (0, 2)])
+
+        bracket = local_retention(EVENTS, Event('open'), Event('buy'), '20170801', '20170802',
+                                  rm='bracket', rb='[[1,2],[2,4]]')
+        self.assertEqual(_counts(bracket, '2017-08-01'), [(1, 2), (2, 2)])
+        self.assertEqual(_counts(bracket, '2017-08-02'), [(1, 1), (0, 1)])
+
+    def test_filters_segments_and_group_by(self):
+        priced = Event('buy').add_filter('event', 'price', 'greater', ['1'])
+        response = local_retention(EVENTS, Event('open'), priced, '20170801', '20170801')
+        self.assertEqual(_counts(response, '2017-08-01'), [(2, 2), (0, 2), (1, 2), (0, 2), (0, 2)])
+
+        segment = Segment().add_filter('country', 'is', ['Uruguay'])
+        response = local_retention(EVENTS, Event('open'), Event('buy'), '20170801', '20170802',
+                                   segment_definitions=[segment])
+        self.assertEqual(_counts(response, '2017-08-01')[0], (0, 0))
+        self.assertEqual(_counts(response, '2017-08-02')[:2], [(1, 1), (1, 1)])
+
+        response = local_retention(EVENTS, Event('open'), Event('buy'), '20170801', '20170802',
+                                   group_by=['country'])
+        self.assertEqual([meta['groupBy'] for meta in response['data']['seriesMeta']],
+                         ['Argentina', 'Uruguay'])
+        self.assertEqual(_counts(response, '2017-08-02', series=1)[:2], [(1, 1), (1, 1)])
+
+    def test_chunks_give_the_same_result(self):
+        rng = random.Random(7)
+        events = [_event(rng.randint(0, 50), rng.choice(['open', 'buy']), rng.randint(1, 20))
+                  for _ in range(3000)]
+
+        for rm in ['n-day', 'rolling']:
+            whole = local_retention(events, Event('open'), Event('buy'), '20170801', '20170807',
+                                    rm=rm, interval=7)
+            chunked = local_retention(events, Event('open'), Event('_active'), '20170801', '20170807',
+                                      rm=rm, interval=7, chunk_size=100)
+            self.assertEqual(whole['data']['series'][0]['dates'], chunked['data']['series'][0]['dates'])
+
+            chunked = local_retention(events, Event('open'), Event('buy'), '20170801', '20170807',
+                                      rm=rm, interval=7, chunk_size=100)
+            self.assertEqual(whole, chunked)
+
+    def test_export_sources(self):
+        directory = tempfile.mkdtemp()
+        try:
+            with MockAmplitudeServer(events_per_hour=50) as server:
+                archive = server.export_archive('20170801T00', '20170802T23')
+            path = os.path.join(directory, 'export.zip')
+            with open(path, 'wb') as f:
+                f.write(archive)
+
+            retention = LocalRetention(Event('_active'), Event('event 1'), '20170801', '20170802')
+            response = retention.add_events(path).result()
+        finally:
+            shutil.rmtree(directory)
+
+        # The 50 mock users are active every hour, 3 of them send 'event 1'.
+        self.assertEqual(_counts(response, '2017-08-01'), [(50, 50), (3, 50)])
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, LocalRetention, Event('a'), Event('b'), '20170801', '20170802', rm='weekly')
+        self.assertRaises(ValueError, LocalRetention, Event('a'), Event('b'), '20170801', '20170802', rm='bracket')
+        self.assertRaises(ValueError, LocalRetention, Event('a'), Event('b'), '20170801', '20170802', interval=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
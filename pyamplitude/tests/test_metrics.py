@@ -0,0 +1,148 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import io
+import unittest
+from pyamplitude.metrics import MetricsHook, InMemoryCollector, prometheus_text
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.asyncamplituderestapi import AsyncAmplitudeRestApi
+from pyamplitude.behavioralcohortsapi import BehavioralCohortsApi
+from pyamplitude.exportapi import AmplitudeExportApi
+from pyamplitude.retry import RetryPolicy
+from pyamplitude.benchmarks.stubserver import StubServer
+
+
+def _throttled_responder(throttled):
+    state = {'left': throttled}
+
+    def responder(path, params):
+        if state['left'] > 0:
+            state['left'] -= 1
+            return 429, {'error': 'throttled'}, {'Retry-After': '0'}
+        return {'data': [1, 2, 3]}
+
+    return responder
+
+
+class Test_InMemoryCollector(unittest.TestCase):
+
+    def test_counters_and_histograms(self):
+        metrics = InMemoryCollector(buckets=[0.1, 1.0])
+        metrics.increment('responses', client='rest', endpoint='users', status=200)
+        metrics.increment('responses', 2, client='rest', endpoint='users', status=429)
+        metrics.observe('latency_seconds', 0.05, endpoint='users', phase='network')
+        metrics.observe('latency_seconds', 0.5, endpoint='users', phase='network')
+        metrics.observe('latency_seconds', 5, endpoint='funnels', phase='network')
+
+        self.assertEqual(metrics.value('responses'), 3)
+        self.assertEqual(metrics.value('responses', status=429), 2)
+        self.assertEqual(metrics.value('responses', endpoint='funnels'), 0)
+
+        users = metrics.histogram('latency_seconds', endpoint='users')
+        self.assertEqual(users['count'], 2)
+        self.assertAlmostEqual(users['sum'], 0.55)
+        self.assertEqual(users['buckets'], {0.1: 1, 1.0: 2})
+        self.assertEqual(metrics.histogram('latency_seconds')['count'], 3)
+
+        metrics.reset()
+        self.assertEqual(metrics.value('responses'), 0)
+
+    def test_timer(self):
+        metrics = InMemoryCollector()
+
+        with self.assertRaises(KeyError):
+            with metrics.timer('latency_seconds', phase='decode'):
+                raise KeyError('timed blocks that fail are observed too')
+
+        self.assertEqual(metrics.histogram('latency_seconds', phase='decode')['count'], 1)
+
+        with MetricsHook().timer('latency_seconds'):
+            pass
+
+    def test_prometheus_text(self):
+        metrics = InMemoryCollector(buckets=[0.1, 1.0])
+        metrics.increment('cost_spent', 4, client='rest', endpoint='users')
+        metrics.observe('latency_seconds', 0.5, client='rest', endpoint='us"ers')
+
+        self.assertEqual(prometheus_text(metrics).splitlines(), [
+            '# TYPE pyamplitude_cost_spent_total counter',
+            'pyamplitude_cost_spent_total{client="rest",endpoint="users"} 4',
+            '# TYPE pyamplitude_latency_seconds histogram',
+            'pyamplitude_latency_seconds_bucket{client="rest",endpoint="us\\"ers",le="0.1"} 0',
+            'pyamplitude_latency_seconds_bucket{client="rest",endpoint="us\\"ers",le="1"} 1',
+            'pyamplitude_latency_seconds_bucket{client="rest",endpoint="us\\"ers",le="+Inf"} 1',
+            'pyamplitude_latency_seconds_sum{client="rest",endpoint="us\\"ers"} 0.5',
+            'pyamplitude_latency_seconds_count{client="rest",endpoint="us\\"ers"} 1'])
+
+
+class Test_ApiMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+        self.metrics = InMemoryCollector()
+        self.policy = RetryPolicy(base_delay=0.01)
+
+    def test_rest_api_metrics(self):
+        with StubServer(responder=_throttled_responder(1)) as server:
+            api = AmplitudeRestApi(self.project, show_logs=False, log_query_cost=False,
+                                   api_url=server.url, retry_policy=self.policy, metrics=self.metrics)
+            api.get_annotations()
+            api.get_annotations()
+            cost = api.prepare('get_annotations').cost
+            api.close()
+
+        metrics = self.metrics
+        self.assertEqual(metrics.value('responses', endpoint='annotations', status=429), 1)
+        self.assertEqual(metrics.value('responses', endpoint='annotations', status=200), 1)
+        self.assertEqual(metrics.value('retries', endpoint='annotations', status=429), 1)
+        self.assertEqual(metrics.histogram('backoff_seconds', endpoint='annotations', status=429)['count'], 1)
+        self.assertEqual(metrics.value('cache_misses', endpoint='annotations', cache='memory'), 1)
+        self.assertEqual(metrics.value('cache_hits', endpoint='annotations', cache='memory'), 1)
+        self.assertEqual(metrics.value('cost_spent', client='rest'), cost)
+        self.assertEqual(metrics.value('bytes_received', endpoint='annotations'), len(b'{"data": [1, 2, 3]}'))
+
+        for phase, count in [('network', 1), ('decode', 1), ('total', 2)]:
+            self.assertEqual(metrics.histogram('latency_seconds', endpoint='annotations', phase=phase)['count'], count)
+
+    def test_async_rest_api_metrics(self):
+        async def run(api):
+            await api.get_annotations()
+            await api.close()
+
+        with StubServer(responder=_throttled_responder(1)) as server:
+            api = AsyncAmplitudeRestApi(self.project, show_logs=False, log_query_cost=False,
+                                        api_url=server.url, retry_policy=self.policy,
+                                        metrics=self.metrics)
+            asyncio.run(run(api))
+
+        self.assertEqual(self.metrics.value('retries', status=429), 1)
+        self.assertEqual(self.metrics.histogram('backoff_seconds', status=429)['count'], 1)
+        self.assertEqual(self.metrics.value('responses'), 2)
+        self.assertEqual(self.metrics.histogram('latency_seconds', phase='total')['count'], 1)
+
+    def test_cohorts_api_metrics(self):
+        with StubServer(responder=_throttled_responder(1)) as server:
+            cohorts = BehavioralCohortsApi(self.project, retry_policy=self.policy, metrics=self.metrics)
+            cohorts.api_url = server.url + 'cohorts'
+            cohorts.get_cohort('abc')
+
+        self.assertEqual(self.metrics.value('responses', client='cohorts', endpoint='cohorts/get'), 2)
+        self.assertEqual(self.metrics.value('retries', client='cohorts'), 1)
+        self.assertEqual(self.metrics.histogram('backoff_seconds', client='cohorts')['count'], 1)
+        self.assertEqual(self.metrics.histogram('latency_seconds', client='cohorts', phase='decode')['count'], 1)
+
+    def test_export_api_metrics(self):
+        with StubServer(responder=_throttled_responder(1)) as server:
+            export = AmplitudeExportApi(self.project, show_logs=False, retry_policy=self.policy,
+                                        metrics=self.metrics)
+            export.api_url = server.url + 'export'
+            export.download('20170801T00', '20170801T01', io.BytesIO())
+
+        self.assertEqual(self.metrics.value('retries', client='export', status=429), 1)
+        self.assertEqual(self.metrics.histogram('backoff_seconds', client='export', status=429)['count'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
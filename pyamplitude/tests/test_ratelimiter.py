@@ -0,0 +1,91 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+import unittest
+from pyamplitude.apiresources import Event
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.ratelimiter import QueryRateLimiter, RateLimitExceeded
+from pyamplitude.benchmarks.stubserver import StubServer
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Test_QueryRateLimiter(unittest.TestCase):
+
+    def test_raise_mode_and_remaining_budget(self):
+        clock = _Clock()
+        limiter = QueryRateLimiter(cost_budget=100, user_budget=2, mode='raise', timer=clock)
+
+        limiter.acquire('funnels', 60)
+        self.assertEqual(limiter.remaining()['cost'], 40)
+        self.assertRaises(RateLimitExceeded, limiter.acquire, 'funnels', 60)
+
+        clock.now = 36 * 20
+        self.assertAlmostEqual(limiter.remaining()['cost'], 60)
+        limiter.acquire('funnels', 60)
+
+        limiter.acquire('useractivity', 500)
+        limiter.acquire('usersearch', 500)
+        self.assertRaises(RateLimitExceeded, limiter.acquire, 'useractivity', 1)
+        self.assertEqual(limiter.remaining()['user_queries'], 0)
+        self.assertEqual(limiter.rejected, 2)
+
+    def test_cost_larger_than_budget_is_rejected(self):
+        limiter = QueryRateLimiter(cost_budget=10)
+        self.assertRaises(ValueError, limiter.acquire, 'retention', 11)
+
+    def test_block_mode_waits_for_refill(self):
+        limiter = QueryRateLimiter(cost_budget=10, period=0.5)
+        limiter.acquire('users', 10)
+
+        started = time.monotonic()
+        limiter.acquire('users', 5)
+        self.assertTrue(time.monotonic() - started >= 0.2)
+
+    def test_queue_mode_serves_in_arrival_order(self):
+        limiter = QueryRateLimiter(cost_budget=10, period=0.5, mode='queue')
+        limiter.acquire('users', 10)
+        served = []
+
+        def worker(name, cost):
+            limiter.acquire('users', cost)
+            served.append(name)
+
+        expensive = threading.Thread(target=worker, args=('expensive', 8))
+        expensive.start()
+        time.sleep(0.05)
+        cheap = threading.Thread(target=worker, args=('cheap', 1))
+        cheap.start()
+        expensive.join()
+        cheap.join()
+
+        self.assertEqual(served, ['expensive', 'cheap'])
+
+    def test_api_debits_computed_cost_on_cache_misses_only(self):
+        project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+        limiter = QueryRateLimiter(cost_budget=1000, timer=_Clock())
+
+        with StubServer() as server:
+            api = AmplitudeRestApi(project, show_logs=False, log_query_cost=False,
+                                   api_url=server.url, rate_limiter=limiter)
+            for _ in range(3):
+                api.get_events(start='20170801', end='20170811', events=[Event('open_app')])
+            api.get_user_search(user='12345')
+            api.close()
+
+        self.assertEqual(limiter.spent, 10)
+        self.assertEqual(limiter.remaining()['user_queries'], 359)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import threading
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.responsecache import ResponseCache
+from pyamplitude.benchmarks.stubserver import StubServer
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Test_ResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = _Clock()
+
+    def test_hits_and_misses(self):
+        cache = ResponseCache(timer=self.clock)
+        self.assertTrue(cache.get('a') is None)
+        cache.set('a', {'data': 1}, 10)
+        self.assertEqual(cache.get('a'), {'data': 1})
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_alternating_queries_both_hit(self):
+        cache = ResponseCache(timer=self.clock)
+        cache.set('a', 1, 10)
+        cache.set('b', 2, 10)
+        for _ in range(3):
+            self.assertEqual(cache.get('a'), 1)
+            self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(cache.stats()['hits'], 6)
+
+    def test_lru_eviction_by_entries(self):
+        cache = ResponseCache(max_entries=2, timer=self.clock)
+        cache.set('a', 1, 10)
+        cache.set('b', 2, 10)
+        cache.get('a')
+        cache.set('c', 3, 10)
+        self.assertTrue(cache.get('b') is None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_eviction_by_bytes(self):
+        cache = ResponseCache(max_bytes=100, timer=self.clock)
+        cache.set('a', 1, 60)
+        cache.set('b', 2, 60)
+        self.assertTrue(cache.get('a') is None)
+        self.assertEqual(cache.stats()['bytes'], 60)
+        cache.set('huge', 3, 101)
+        self.assertTrue(cache.get('huge') is None)
+
+    def test_endpoint_ttls(self):
+        cache = ResponseCache(ttl=60, endpoint_ttls={'realtime': 5, 'sessions': 600},
+                              timer=self.clock)
+        cache.set('rt', 1, 10, endpoint='realtime')
+        cache.set('len', 2, 10, endpoint='sessions/length')
+        cache.set('ev', 3, 10, endpoint='events/list')
+        self.clock.now = 10
+        self.assertTrue(cache.get('rt') is None)
+        self.assertEqual(cache.get('ev'), 3)
+        self.clock.now = 100
+        self.assertTrue(cache.get('ev') is None)
+        self.assertEqual(cache.get('len'), 2)
+        self.assertEqual(cache.expirations, 2)
+
+    def test_thread_safety(self):
+        cache = ResponseCache(max_entries=50, timer=self.clock)
+
+        def worker(n):
+            for i in range(500):
+                cache.set((n, i % 80), i, 1)
+                cache.get((n, (i * 7) % 80))
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = cache.stats()
+        self.assertEqual(stats['entries'], 50)
+        self.assertEqual(stats['bytes'], 50)
+        self.assertEqual(stats['hits'] + stats['misses'], 8 * 500)
+
+    def test_cache_is_project_aware(self):
+        first = ProjectsHandler(project_name='first', api_key='key1', secret_key='secret')
+        second = ProjectsHandler(project_name='second', api_key='key2', secret_key='secret')
+        cache = ResponseCache()
+
+        with StubServer() as server:
+            apis = [AmplitudeRestApi(project, show_logs=False, log_query_cost=False,
+                                     api_url=server.url, cache=cache)
+                    for project in (first, second)]
+            for api in apis + apis:
+                api._make_request(server.url + 'events/list')
+
+        self.assertEqual(cache.stats()['misses'], 2)
+        self.assertEqual(cache.stats()['hits'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
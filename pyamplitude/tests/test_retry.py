@@ -0,0 +1,164 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+import aiohttp
+import requests
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.behavioralcohortsapi import BehavioralCohortsApi
+from pyamplitude.retry import RetryPolicy
+from pyamplitude.benchmarks.stubserver import StubServer
+
+
+class _Response(object):
+
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Test_RetryPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = _Clock()
+
+    def _policy(self, **kwargs):
+        return RetryPolicy(timer=self.clock, sleep=self.clock.sleep, **kwargs)
+
+    def _sender(self, statuses):
+        responses = [_Response(*s) if isinstance(s, tuple) else _Response(s) for s in statuses]
+        return lambda: responses.pop(0)
+
+    def test_retries_until_success(self):
+        policy = self._policy(base_delay=1, max_delay=4)
+        response = policy.call('users', self._sender([429, 503, 200]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(policy.retries, 2)
+        self.assertEqual(policy.statuses, {429: 1, 503: 1})
+        self.assertTrue(0 <= self.clock.sleeps[0] <= 1 and 0 <= self.clock.sleeps[1] <= 2)
+        self.assertAlmostEqual(policy.backoff_seconds, sum(self.clock.sleeps))
+
+    def test_never_retries_client_errors(self):
+        policy = self._policy(retry_statuses=[400, 401, 429])
+        self.assertEqual(policy.call('users', self._sender([401])).status_code, 401)
+        self.assertEqual(policy.call('users', self._sender([400])).status_code, 400)
+        self.assertEqual(policy.retries, 0)
+
+    def test_honors_retry_after(self):
+        policy = self._policy()
+        policy.call('users', self._sender([(429, {'Retry-After': '7'}), 200]))
+        self.assertEqual(self.clock.sleeps, [7.0])
+
+    def test_endpoint_max_attempts_and_deadline(self):
+        policy = self._policy(max_attempts=2, endpoint_max_attempts={'funnels': 3})
+        self.assertEqual(policy.call('users', self._sender([500, 500, 200])).status_code, 500)
+        self.assertEqual(policy.call('funnels', self._sender([500, 500, 200])).status_code, 200)
+
+        self.clock = _Clock()
+        policy = self._policy(max_attempts=10, deadline=10)
+        response = policy.call('users', self._sender([(429, {'Retry-After': '6'}),
+                                                      (429, {'Retry-After': '6'}), 200]))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.clock.sleeps, [6.0])
+
+    def test_connection_errors(self):
+        policy = self._policy()
+        attempts = []
+
+        def send():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise requests.ConnectionError('reset')
+            return _Response(200)
+
+        self.assertEqual(policy.call('users', send).status_code, 200)
+        self.assertEqual(policy.statuses, {None: 2})
+        self.assertRaises(requests.ConnectionError, policy.call, 'users',
+                          lambda: (_ for _ in ()).throw(requests.ConnectionError('down')), False)
+
+    def test_transient_errors(self):
+        policy = self._policy(transient_errors=(ValueError,))
+        attempts = []
+
+        def send():
+            attempts.append(1)
+            if len(attempts) < 2:
+                raise ValueError('truncated')
+            return _Response(200)
+
+        self.assertEqual(policy.call('users', send).status_code, 200)
+        self.assertRaises(requests.ConnectionError, policy.call, 'users',
+                          lambda: (_ for _ in ()).throw(requests.ConnectionError('down')))
+
+    def test_async_retries_aiohttp_errors(self):
+        policy = RetryPolicy(base_delay=0.001)
+        errors = [aiohttp.ServerDisconnectedError(), aiohttp.ClientPayloadError('truncated')]
+
+        async def send():
+            if errors:
+                raise errors.pop(0)
+            return _Response(200)
+
+        self.assertEqual(asyncio.run(policy.call_async('users', send)).status_code, 200)
+        self.assertEqual(policy.statuses, {None: 2})
+
+    def test_non_idempotent_requests_only_retry_429(self):
+        policy = self._policy()
+        self.assertEqual(policy.call('cohorts', self._sender([500, 200]), idempotent=False).status_code, 500)
+        self.assertEqual(policy.call('cohorts', self._sender([429, 200]), idempotent=False).status_code, 200)
+
+
+class Test_RetryIntegration(unittest.TestCase):
+
+    def setUp(self):
+        self.project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+        self.policy = RetryPolicy(base_delay=0.01)
+
+    def _throttled_responder(self, throttled):
+        state = {'left': throttled}
+
+        def responder(path, params):
+            if state['left'] > 0:
+                state['left'] -= 1
+                return 429, {'error': 'throttled'}, {'Retry-After': '0'}
+            return {'path': path}
+
+        return responder
+
+    def test_rest_api_retries_throttled_requests(self):
+        with StubServer(responder=self._throttled_responder(2)) as server:
+            api = AmplitudeRestApi(self.project, show_logs=False, log_query_cost=False,
+                                   api_url=server.url, retry_policy=self.policy)
+            self.assertEqual(api.get_annotations()['path'], '/annotations')
+            api.close()
+
+        self.assertEqual(self.policy.statuses, {429: 2})
+
+    def test_cohorts_api_retries_throttled_requests(self):
+        with StubServer(responder=self._throttled_responder(1)) as server:
+            cohorts = BehavioralCohortsApi(self.project, retry_policy=self.policy)
+            cohorts.api_url = server.url + 'cohorts'
+            self.assertEqual(cohorts.get_cohort('abc')['path'], '/cohorts/abc')
+
+        self.assertEqual(self.policy.retries, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
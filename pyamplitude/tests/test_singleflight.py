@@ -0,0 +1,82 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+import unittest
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.singleflight import SingleFlight
+from pyamplitude.benchmarks.stubserver import StubServer
+
+
+def _run_threads(count, target):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(n):
+        barrier.wait()
+        try:
+            results[n] = target()
+        except Exception as e:
+            results[n] = e
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+class Test_SingleFlight(unittest.TestCase):
+
+    def test_concurrent_calls_share_one_run(self):
+        flight = SingleFlight()
+        runs = []
+
+        def slow():
+            runs.append(1)
+            time.sleep(0.1)
+            return {'data': 1}
+
+        results = _run_threads(8, lambda: flight.do('key', slow))
+
+        self.assertEqual(len(runs), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+        self.assertEqual(flight.stats(), {'calls': 8, 'coalesced': 7, 'in_flight': 0})
+
+    def test_errors_are_shared(self):
+        flight = SingleFlight()
+
+        def failing():
+            time.sleep(0.1)
+            raise ValueError('boom')
+
+        results = _run_threads(4, lambda: flight.do('key', failing))
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(flight.do('key', lambda: 2), 2)
+
+    def test_api_coalesces_identical_requests(self):
+        project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+
+        def slow_responder(path, params):
+            time.sleep(0.1)
+            return {'data': params}
+
+        with StubServer(responder=slow_responder) as server:
+            api = AmplitudeRestApi(project, show_logs=False, log_query_cost=False,
+                                   api_url=server.url)
+            results = _run_threads(10, lambda: api.get_average_session_length(start='20170801',
+                                                                              end='20170802'))
+            api.close()
+
+            self.assertEqual(server.requests_served, 1)
+
+        self.assertEqual(api.single_flight.coalesced + api.cache.hits, 9)
+        self.assertTrue(all(r == results[0] for r in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+# !/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+import simplejson as json
+from pyamplitude import streamjson
+from pyamplitude.projectshandler import ProjectsHandler
+from pyamplitude.amplituderestapi import AmplitudeRestApi
+from pyamplitude.asyncamplituderestapi import AsyncAmplitudeRestApi
+from pyamplitude.behavioralcohortsapi import BehavioralCohortsApi
+from pyamplitude.retry import RetryPolicy
+from pyamplitude.benchmarks.stubserver import StubServer
+
+ACTIVITY = {'userData': {'user_id': 'u1', 'num_events': 3},
+            'events': [{'event_type': 'open_app', 'event_properties': {'text': u'caf\xe9 "]},'}},
+                       {'event_type': 'purchase', 'revenue': 1500.25},
+                       {'event_type': 'close_app', 'revenue': -3e-5}]}
+
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class Test_MemberParser(unittest.TestCase):
+
+    def test_members_do_not_depend_on_chunking(self):
+        text = json.dumps(ACTIVITY, ensure_ascii=False).encode('utf-8')
+        expected = [('userData', ACTIVITY['userData'])] + [('events', e) for e in ACTIVITY['events']]
+
+        for size in [1, 2, 5, 64, len(text)]:
+            self.assertEqual(list(streamjson.iter_members(_chunks(text, size))), expected)
+
+    def test_scalars_and_empty_arrays(self):
+        text = b'{"cohort": {"id": "abc"}, "user_ids": [], "amplitude_ids": [12, 3456], "size": 2}'
+        members = list(streamjson.iter_members(_chunks(text, 3)))
+
+        self.assertEqual(members, [('cohort', {'id': 'abc'}), ('amplitude_ids', 12),
+                                   ('amplitude_ids', 3456), ('size', 2)])
+
+    def test_invalid_responses_raise(self):
+        text = json.dumps(ACTIVITY).encode('utf-8')
+
+        for invalid in [text[:-3], text + b'{}', b'[1, 2]']:
+            with self.assertRaises(ValueError):
+                list(streamjson.iter_members(_chunks(invalid, 16)))
+
+
+class Test_StreamingApis(unittest.TestCase):
+
+    def setUp(self):
+        self.project = ProjectsHandler(project_name='test', api_key='key', secret_key='secret')
+        self.requests = []
+
+    def _responder(self, path, params):
+        self.requests.append((path, params))
+        return ACTIVITY
+
+    def test_iter_user_activity(self):
+        with StubServer(responder=self._responder) as server:
+            api = AmplitudeRestApi(self.project, show_logs=False, log_query_cost=False,
+                                   api_url=server.url)
+            members = list(api.iter_user_activity(user='123', limit=2))
+            api.close()
+
+        self.assertEqual([key for key, value in members], ['userData', 'events', 'events', 'events'])
+        self.assertEqual(members[2][1]['revenue'], 1500.25)
+        self.assertEqual(self.requests, [('/useractivity', [('user', '123'), ('limit', '2')])])
+
+    def test_iter_user_activity_retries(self):
+        state = {'throttled': 1}
+
+        def responder(path, params):
+            if state['throttled']:
+                state['throttled'] -= 1
+                return 429, {'error': 'throttled'}, {'Retry-After': '0'}
+            return ACTIVITY
+
+        policy = RetryPolicy(base_delay=0.01)
+
+        with StubServer(responder=responder) as server:
+            api = AmplitudeRestApi(self.project, show_logs=False, log_query_cost=False,
+                                   api_url=server.url, retry_policy=policy)
+            self.assertEqual(len(list(api.iter_user_activity(user='123'))), 4)
+            api.close()
+
+        self.assertEqual(policy.retries, 1)
+
+    def test_async_iter_user_activity(self):
+        async def collect(api):
+            members = [member async for member in api.iter_user_activity(user='123')]
+            await api.close()
+            return members
+
+        with StubServer(payload=ACTIVITY) as server:
+            api = AsyncAmplitudeRestApi(self.project, show_logs=False, log_query_cost=False,
+                                        api_url=server.url)
+            members = asyncio.run(collect(api))
+
+        self.assertEqual(members[0], ('userData', ACTIVITY['userData']))
+        self.assertEqual(len(members), 4)
+
+    def test_iter_cohort(self):
+        cohort = {'cohort': {'id': 'abc', 'size': 2}, 'user_ids': ['a', 'b'], 'amplitude_ids': [1, 2]}
+
+        with StubServer(payload=cohort) as server:
+            cohorts = BehavioralCohortsApi(self.project)
+            cohorts.api_url = server.url + 'cohorts'
+            members = list(cohorts.iter_cohort('abc'))
+
+        self.assertEqual(members, [('cohort', {'id': 'abc', 'size': 2}), ('user_ids', 'a'), ('user_ids', 'b'),
+                                   ('amplitude_ids', 1), ('amplitude_ids', 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
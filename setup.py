@@ -16,9 +16,17 @@ setup(
     author_email='mmmuraro@gmail.com',
     license='MIT',
     install_requires=[
+        'requests',
         'simplejson',
-        'cachetools',
     ],
+    extras_require={
+        'async': ['aiohttp'],
+        'http2': ['httpx[http2]'],
+        'numpy': ['numpy'],
+        'pandas': ['numpy', 'pandas'],
+        'arrow': ['pyarrow'],
+        'redshift': ['psycopg2'],
+    },
     classifiers=[
         'Intended Audience :: Developers',
         'Topic :: Software Development :: Build Tools',